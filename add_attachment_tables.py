@@ -1,6 +1,9 @@
-﻿from app import app, db
+﻿from app import create_cli_app
+from db import db
 from models import ServiceAttachment, RepairAttachment
 
+app = create_cli_app()
+
 
 def create_attachment_tables():
     """Create attachment tables without dropping existing data."""
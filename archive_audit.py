@@ -0,0 +1,40 @@
+import argparse
+import datetime as dt
+
+from app import create_cli_app
+from audit import archive_audit_log, audit_settings, replay_spools
+from db import db
+
+app = create_cli_app()
+
+
+def parse_args():
+    settings = audit_settings()
+    parser = argparse.ArgumentParser(description="Replay spooled audit entries and archive old audit log rows.")
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=settings["retention_days"],
+        help="Archive rows older than this many days (default AUDIT_RETENTION_DAYS).",
+    )
+    parser.add_argument("--archive-dir", default=settings["archive_dir"])
+    parser.add_argument("--replay-only", action="store_true", help="Only insert entries left in spool files.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    settings = audit_settings()
+    with app.app_context():
+        db.create_all()
+        replayed = replay_spools(settings["spool_dir"], settings["batch_size"])
+        print(f"Replayed {replayed} spooled audit entr{'y' if replayed == 1 else 'ies'}.")
+        if args.replay_only:
+            return
+        before = dt.datetime.utcnow() - dt.timedelta(days=args.days)
+        archived = archive_audit_log(before, args.archive_dir)
+        print(f"Archived {archived} audit row(s) older than {before:%Y-%m-%d} to {args.archive_dir}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+import datetime as dt
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+
+from sqlalchemy import delete, select, update
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from db import db
+from models import AttachmentBlob, ServiceAttachment, RepairAttachment, Service, Repair
+
+CHUNK_SIZE = 1024 * 1024
+# Blob files written more recently than this may belong to an upload whose transaction is still open.
+BLOB_GRACE_SECONDS = 3600
+
+_BLOB_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+class FileTooLarge(RequestEntityTooLarge):
+    def __init__(self, limit):
+        super().__init__(f"Each file must be at most {limit // (1024 * 1024)} MB.")
+
+
+def blob_path(sha256):
+    """Relative path of a blob, sharded two levels deep so no directory grows large."""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def blob_key(stored_name):
+    """The blob hash behind an attachment, or None for a pre-migration flat file."""
+    if "/" not in stored_name:
+        return None
+    return stored_name.rsplit("/", 1)[1]
+
+
+def save_blob(stream, root, chunk_size=CHUNK_SIZE):
+    """Copy ``stream`` into the store, hashing as it is written.
+
+    The data goes to a temporary file beside the store and is renamed into
+    place, so a blob path only ever holds complete content. Returns
+    ``(sha256, size)``.
+    """
+    tmp_dir = os.path.join(root, "tmp")
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    except FileNotFoundError:
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                handle.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        final_path = os.path.join(root, blob_path(sha256))
+        # Replacing an existing blob is harmless: the content is identical by construction.
+        try:
+            os.replace(tmp_path, final_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return sha256, size
+
+
+# Leading bytes of each accepted type; PDF and "text" are checked separately.
+SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "ole"),
+    (b"PK\x03\x04", "zip"),
+)
+
+# What each allowed extension must actually contain.
+EXTENSION_KINDS = {
+    "pdf": "pdf",
+    "png": "png",
+    "jpg": "jpeg",
+    "jpeg": "jpeg",
+    "gif": "gif",
+    "doc": "ole",
+    "xls": "ole",
+    "docx": "zip",
+    "xlsx": "zip",
+    "txt": "text",
+}
+
+SNIFF_BYTES = 1024
+
+
+def sniff_type(head):
+    # Readers accept the PDF header anywhere in the first kilobyte.
+    if b"%PDF-" in head:
+        return "pdf"
+    for signature, kind in SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    # UTF-16 text is full of NUL bytes, so its byte order mark is what identifies it.
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "text"
+    # UTF-8 and single-byte encodings such as cp1252 never contain NUL; executables and other
+    # binary formats almost always do within their first kilobyte.
+    if b"\x00" not in head:
+        return "text"
+    return None
+
+
+def content_matches_extension(head, ext):
+    return EXTENSION_KINDS.get(ext) is not None and sniff_type(head) == EXTENSION_KINDS[ext]
+
+
+class UploadBlob:
+    """Writable upload stream that lands in the store's temp directory.
+
+    Used as the multipart parser's file stream, so each uploaded part is
+    hashed, size-checked and sniffed while it is written once to disk;
+    ``commit`` then only renames it into place.
+    """
+
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+        tmp_dir = os.path.join(root, "tmp")
+        try:
+            fd, self.tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        except FileNotFoundError:
+            os.makedirs(tmp_dir, exist_ok=True)
+            fd, self.tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        self.file = os.fdopen(fd, "w+b")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self.committed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise FileTooLarge(self.max_size)
+        if len(self.head) < SNIFF_BYTES:
+            self.head += data[: SNIFF_BYTES - len(self.head)]
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def commit(self):
+        """Move the upload to its blob path; returns ``(sha256, size)``."""
+        self.file.close()
+        sha256 = self.digest.hexdigest()
+        final_path = os.path.join(self.root, blob_path(sha256))
+        try:
+            os.replace(self.tmp_path, final_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(self.tmp_path, final_path)
+        self.committed = True
+        return sha256, self.size
+
+    def discard(self):
+        self.file.close()
+        if not self.committed:
+            try:
+                os.remove(self.tmp_path)
+            except FileNotFoundError:
+                pass
+
+
+def add_blob_reference(sha256, size):
+    result = db.session.execute(
+        update(AttachmentBlob)
+        .where(AttachmentBlob.sha256 == sha256)
+        .values(ref_count=AttachmentBlob.ref_count + 1),
+        execution_options={"synchronize_session": False},
+    )
+    if result.rowcount == 0:
+        # Added to the session, so the next UPDATE's autoflush makes a second upload of the same content find it.
+        db.session.add(AttachmentBlob(sha256=sha256, size=size, ref_count=1, created_at=dt.datetime.utcnow()))
+
+
+def release_blobs(stored_names):
+    """Drop one reference per stored name; returns what to delete from disk after commit.
+
+    Blobs that reach zero references keep their row as a tombstone, so an
+    upload of the same content revives it instead of racing the delete.
+    Pre-migration flat files were never shared, so they are returned as-is.
+    """
+    counts = Counter()
+    unreferenced = []
+    for stored_name in stored_names:
+        sha256 = blob_key(stored_name)
+        if sha256 is None:
+            unreferenced.append(stored_name)
+        else:
+            counts[sha256] += 1
+    for sha256, count in counts.items():
+        db.session.execute(
+            update(AttachmentBlob)
+            .where(AttachmentBlob.sha256 == sha256)
+            .values(ref_count=AttachmentBlob.ref_count - count),
+            execution_options={"synchronize_session": False},
+        )
+    if counts:
+        orphaned = db.session.execute(
+            select(AttachmentBlob.sha256).where(
+                AttachmentBlob.sha256.in_(list(counts)),
+                AttachmentBlob.ref_count <= 0,
+            )
+        ).scalars().all()
+        unreferenced += [blob_path(sha256) for sha256 in orphaned]
+    return unreferenced
+
+
+def _discard_file(root, stored_name, cutoff):
+    """Delete a stored file and its thumbnails unless it was written after ``cutoff``; returns whether it went.
+
+    The file is first renamed aside, so an upload that lands the same
+    content meanwhile keeps its own copy. A recently written file is put
+    back: with identical content that is always safe.
+    """
+    # thumbnails imports this module for blob_key.
+    from thumbnails import remove_thumbnails
+
+    path = os.path.join(root, stored_name)
+    tmp_dir = os.path.join(root, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    aside = os.path.join(tmp_dir, f"{os.path.basename(stored_name)}.deleting")
+    try:
+        os.replace(path, aside)
+    except FileNotFoundError:
+        return False
+    try:
+        if os.stat(aside).st_mtime > cutoff:
+            os.replace(aside, path)
+            return False
+        os.remove(aside)
+    except FileNotFoundError:
+        # Another sweep got to it first.
+        return False
+    remove_thumbnails(root, stored_name)
+    return True
+
+
+def delete_blob(root, sha256, grace=BLOB_GRACE_SECONDS):
+    """Delete an unreferenced blob's row and then its file; returns whether the file went.
+
+    The row is only deleted while its count is still zero, in a write that
+    waits for any open transaction adding a reference to it.
+    """
+    result = db.session.execute(
+        delete(AttachmentBlob).where(AttachmentBlob.sha256 == sha256, AttachmentBlob.ref_count <= 0),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.commit()
+    if result.rowcount == 0:
+        return False
+    return _discard_file(root, blob_path(sha256), time.time() - grace)
+
+
+def remove_files(root, stored_names, grace=BLOB_GRACE_SECONDS):
+    """Delete released files and their thumbnails once the release has committed.
+
+    A blob that was re-uploaded since it was released keeps its row and file.
+    """
+    for stored_name in stored_names:
+        sha256 = blob_key(stored_name)
+        if sha256 is None:
+            _discard_file(root, stored_name, float("inf"))
+        else:
+            delete_blob(root, sha256, grace)
+
+
+def sweep_blobs(root, grace=BLOB_GRACE_SECONDS, batch_size=500):
+    """Delete tombstoned blobs, blob files without a row, and abandoned upload temp files.
+
+    Anything written within ``grace`` seconds is left alone, since its
+    upload may not have committed yet. Returns counts per kind.
+    """
+    counts = {"released": 0, "unreferenced": 0, "temporary": 0}
+    tombstones = db.session.execute(
+        select(AttachmentBlob.sha256).where(AttachmentBlob.ref_count <= 0)
+    ).scalars().all()
+    for sha256 in tombstones:
+        counts["released"] += delete_blob(root, sha256, grace)
+
+    cutoff = time.time() - grace
+    batch = []
+
+    def discard_unreferenced(batch):
+        known = set(db.session.execute(
+            select(AttachmentBlob.sha256).where(AttachmentBlob.sha256.in_(batch))
+        ).scalars())
+        db.session.rollback()
+        return sum(_discard_file(root, blob_path(sha256), cutoff) for sha256 in batch if sha256 not in known)
+
+    for directory, subdirectories, names in os.walk(root):
+        if directory == root:
+            # Only the two-level hash shards hold blobs; tmp/, thumbs/ and flat files are left out.
+            subdirectories[:] = [name for name in subdirectories if re.fullmatch(r"[0-9a-f]{2}", name)]
+            continue
+        batch += [name for name in names if _BLOB_NAME.match(name)]
+        if len(batch) >= batch_size:
+            counts["unreferenced"] += discard_unreferenced(batch)
+            batch = []
+    if batch:
+        counts["unreferenced"] += discard_unreferenced(batch)
+
+    tmp_dir = os.path.join(root, "tmp")
+    for name in os.listdir(tmp_dir) if os.path.isdir(tmp_dir) else []:
+        path = os.path.join(tmp_dir, name)
+        try:
+            if os.stat(path).st_mtime <= cutoff:
+                os.remove(path)
+                counts["temporary"] += 1
+        except FileNotFoundError:
+            pass
+    return counts
+
+
+def delete_equipment_attachments(equipment_id):
+    """Delete attachment rows for a machine's services and repairs and release their blobs."""
+    service_ids = select(Service.id).where(Service.equipment_id == equipment_id)
+    repair_ids = select(Repair.id).where(Repair.equipment_id == equipment_id)
+    stored_names = db.session.execute(
+        select(ServiceAttachment.stored_name).where(ServiceAttachment.service_id.in_(service_ids))
+    ).scalars().all()
+    stored_names += db.session.execute(
+        select(RepairAttachment.stored_name).where(RepairAttachment.repair_id.in_(repair_ids))
+    ).scalars().all()
+    ServiceAttachment.query.filter(ServiceAttachment.service_id.in_(service_ids)).delete(synchronize_session=False)
+    RepairAttachment.query.filter(RepairAttachment.repair_id.in_(repair_ids)).delete(synchronize_session=False)
+    return release_blobs(stored_names)
@@ -0,0 +1,491 @@
+import atexit
+import csv
+import datetime as dt
+import gzip
+import json
+import os
+import re
+import threading
+
+from flask import current_app
+from sqlalchemy import delete, event, func, insert, select, tuple_
+
+from db import basedir, db
+from history import encode_cursor
+from models import AdminUser, AuditLog
+from reports import _Echo, sanitize_csv_value
+
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 2.0
+AUDIT_RETENTION_DAYS = 400
+ARCHIVE_BATCH_SIZE = 5000
+AUDIT_PAGE_SIZE = 50
+AUDIT_EXPORT_BATCH_SIZE = 2000
+
+AUDIT_ENTITIES = ("admin_user", "audit_log", "equipment", "repair", "service")
+AUDIT_ACTIONS = ("login", "create", "update", "delete", "export", "checkin")
+AUDIT_EXPORT_COLUMNS = ["id", "created_at", "user_id", "user_email", "action", "entity", "entity_id", "details"]
+
+_SPOOL_NAME = re.compile(r"^audit-(\d+)\.spool(?:\.\d+\.sealed)?(?:\.claimed-(\d+))?$")
+
+
+def audit_settings():
+    return {
+        "mode": os.environ.get("AUDIT_MODE", "inline").lower(),
+        "spool_dir": os.environ.get("AUDIT_SPOOL_DIR") or os.path.join(basedir, "instance", "audit-spool"),
+        "archive_dir": os.environ.get("AUDIT_ARCHIVE_DIR") or os.path.join(basedir, "instance", "audit-archive"),
+        "batch_size": int(os.environ.get("AUDIT_BATCH_SIZE", AUDIT_BATCH_SIZE)),
+        "flush_interval": float(os.environ.get("AUDIT_FLUSH_INTERVAL", AUDIT_FLUSH_INTERVAL)),
+        "fsync": os.environ.get("AUDIT_SPOOL_FSYNC", "false").lower() == "true",
+        "retention_days": int(os.environ.get("AUDIT_RETENTION_DAYS", AUDIT_RETENTION_DAYS)),
+    }
+
+
+def audit_entry(user_id, action, entity, entity_id=None, details=None, created_at=None, owner_id=None):
+    return {
+        "user_id": user_id,
+        "owner_id": owner_id,
+        "action": action,
+        "entity": entity,
+        "entity_id": entity_id,
+        "details": details,
+        "created_at": (created_at or dt.datetime.utcnow()).isoformat(),
+    }
+
+
+def _rows(entries):
+    # Entries spooled before owner_id existed belong to the user who made them.
+    return [
+        dict(entry, owner_id=entry.get("owner_id", entry["user_id"]), created_at=dt.datetime.fromisoformat(entry["created_at"]))
+        for entry in entries
+    ]
+
+
+def insert_entries(entries):
+    """Bulk insert spooled entries in one transaction; needs an app context."""
+    if entries:
+        db.session.execute(insert(AuditLog).execution_options(render_nulls=True), _rows(entries))
+        db.session.commit()
+    return len(entries)
+
+
+class AuditSpool:
+    """Append-only JSON-lines file of committed entries that are not in the database yet.
+
+    Each process writes its own ``audit-<pid>.spool``. Before a flush the
+    file is sealed (renamed) and a fresh one started; the sealed file is
+    removed only once its entries are committed, so whatever a crash leaves
+    behind is replayed by ``replay_spools``. Lines are written through to
+    the OS on every append, which survives a process crash; AUDIT_SPOOL_FSYNC
+    also fsyncs them, for power loss.
+    """
+
+    def __init__(self, directory, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+        self.handle = None
+        self.path = None
+
+    def append(self, entries):
+        if self.handle is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, f"audit-{os.getpid()}.spool")
+            self.handle = open(self.path, "ab")
+        self.handle.write(b"".join(json.dumps(entry).encode() + b"\n" for entry in entries))
+        self.handle.flush()
+        if self.fsync:
+            os.fsync(self.handle.fileno())
+
+    def seal(self):
+        """Close the current file and move it aside; returns its new path, or None if nothing was written."""
+        if self.handle is None:
+            return None
+        self.handle.close()
+        self.handle = None
+        sealed = f"{self.path}.{dt.datetime.utcnow():%Y%m%d%H%M%S%f}.sealed"
+        os.replace(self.path, sealed)
+        return sealed
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        # Replay runs before this process opens its own spool, so a file under
+        # our pid was left by an earlier process (containers reuse pids).
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_spool(path):
+    entries = []
+    with open(path, "rb") as handle:
+        lines = handle.read().split(b"\n")
+    for number, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            # Only the last line can be cut short by a crash mid-write.
+            if number != len(lines) - 1:
+                raise
+    return entries
+
+
+def claim_spools(directory):
+    """Rename the spool files of processes that are gone to claim them; returns the claimed paths.
+
+    Claiming by rename means concurrent replays never take the same file.
+    """
+    if not os.path.isdir(directory):
+        return []
+    claimed = []
+    for name in sorted(os.listdir(directory)):
+        match = _SPOOL_NAME.match(name)
+        if not match or _pid_alive(int(match.group(2) or match.group(1))):
+            continue
+        path = os.path.join(directory, f"{name.split('.claimed-')[0]}.claimed-{os.getpid()}")
+        try:
+            os.replace(os.path.join(directory, name), path)
+        except FileNotFoundError:
+            continue
+        claimed.append(path)
+    return claimed
+
+
+def insert_spool_files(paths, batch_size=AUDIT_BATCH_SIZE):
+    """Insert and remove claimed spool files; needs an app context.
+
+    A crash after a file's insert but before its removal replays it again,
+    so delivery is at least once.
+    """
+    inserted = 0
+    for path in paths:
+        entries = read_spool(path)
+        for start in range(0, len(entries), batch_size):
+            inserted += insert_entries(entries[start : start + batch_size])
+        os.remove(path)
+    return inserted
+
+
+def replay_spools(directory, batch_size=AUDIT_BATCH_SIZE):
+    """Insert whatever crashed or stopped processes left spooled; needs an app context."""
+    return insert_spool_files(claim_spools(directory), batch_size)
+
+
+class AuditWriter:
+    """Write-behind audit sink: committed entries are spooled, then bulk inserted by a background thread.
+
+    The thread flushes when AUDIT_BATCH_SIZE entries are waiting or every
+    AUDIT_FLUSH_INTERVAL seconds, and once more at interpreter exit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.settings = None
+        self.spool = None
+        self.claimed = []
+        self.entries = []
+        self.batches = []
+
+    def _start(self):
+        settings = audit_settings()
+        self.settings = settings
+        # Files left by stopped processes are claimed before this one opens its
+        # own spool, which may reuse a dead process's pid; the thread inserts them.
+        self.claimed = claim_spools(settings["spool_dir"])
+        self.spool = AuditSpool(settings["spool_dir"], settings["fsync"])
+        self.thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def add(self, entries):
+        with self.lock:
+            if self.thread is None:
+                self._start()
+            self.spool.append(entries)
+            self.entries.extend(entries)
+            if len(self.entries) >= self.settings["batch_size"]:
+                self.wake.set()
+
+    def _run(self):
+        try:
+            with self.app.app_context():
+                replayed = insert_spool_files(self.claimed, self.settings["batch_size"])
+                db.session.remove()
+            if replayed:
+                self.app.logger.info("Replayed %s audit entries from earlier spool files", replayed)
+        except Exception:
+            self.app.logger.exception("Replaying audit spool files failed; run archive_audit.py --replay-only")
+        while True:
+            self.wake.wait(timeout=self.settings["flush_interval"])
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Audit log flush failed; entries stay spooled")
+
+    def flush(self):
+        """Insert everything buffered so far; returns the number of entries written."""
+        with self.flush_lock:
+            with self.lock:
+                if self.entries:
+                    self.batches.append((self.spool.seal(), self.entries))
+                    self.entries = []
+            written = 0
+            with self.app.app_context():
+                try:
+                    while self.batches:
+                        path, entries = self.batches[0]
+                        insert_entries(entries)
+                        os.remove(path)
+                        self.batches.pop(0)
+                        written += len(entries)
+                finally:
+                    db.session.remove()
+            return written
+
+
+def _hand_to_writer(committed):
+    entries = committed.info.pop("audit_pending", None)
+    if entries:
+        current_app.extensions["audit_writer"].add(entries)
+
+
+def _drop_staged(ended, transaction):
+    if transaction.parent is None:
+        ended.info.pop("audit_pending", None)
+
+
+def install_write_behind(session):
+    """Hand staged entries to the current app's audit writer when ``session`` commits and drop them on rollback.
+
+    Safe to call once per app: the listeners are only registered the first time.
+    """
+    if not event.contains(session, "after_commit", _hand_to_writer):
+        event.listen(session, "after_commit", _hand_to_writer)
+        event.listen(session, "after_transaction_end", _drop_staged)
+
+
+def stage_entry(session, entry):
+    session.info.setdefault("audit_pending", []).append(entry)
+
+
+def log_action(user, action, entity, entity_id=None, details=None, owner_id=None):
+    """Add an audit row to the current transaction, or stage it for the audit writer in write-behind mode.
+
+    The entry is shown to ``owner_id``, by default the acting user; anonymous
+    actions such as check-ins pass the machine's owner.
+    """
+    if owner_id is None and user is not None:
+        owner_id = user.id
+    if current_app.config["AUDIT_MODE"] == "write-behind":
+        # Handed to the audit writer only if this transaction commits.
+        stage_entry(
+            db.session, audit_entry(user.id if user else None, action, entity, entity_id, details, owner_id=owner_id)
+        )
+        return
+    entry = AuditLog(
+        user_id=user.id if user else None,
+        owner_id=owner_id,
+        action=action,
+        entity=entity,
+        entity_id=entity_id,
+        details=details,
+    )
+    db.session.add(entry)
+
+
+def archive_path(archive_dir, month):
+    return os.path.join(archive_dir, f"audit-{month:%Y-%m}.ndjson.gz")
+
+
+def archive_audit_log(before, archive_dir, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move rows older than ``before`` into monthly gzipped NDJSON files; needs an app context.
+
+    Rows are copied and deleted a batch at a time in id order, so the live
+    table shrinks without one long transaction. Appending to a month's file
+    adds a gzip member, which gzip readers concatenate transparently.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = 0
+    while True:
+        rows = db.session.execute(
+            select(AuditLog).where(AuditLog.created_at < before).order_by(AuditLog.id).limit(batch_size)
+        ).scalars().all()
+        if not rows:
+            return archived
+        by_month = {}
+        for row in rows:
+            record = audit_entry(
+                row.user_id, row.action, row.entity, row.entity_id, row.details, row.created_at, row.owner_id
+            )
+            by_month.setdefault(row.created_at.replace(day=1).date(), []).append(dict(record, id=row.id))
+        for month, records in by_month.items():
+            with gzip.open(archive_path(archive_dir, month), "ab") as handle:
+                handle.write(b"".join(json.dumps(record).encode() + b"\n" for record in records))
+        db.session.execute(
+            delete(AuditLog).where(AuditLog.id <= rows[-1].id, AuditLog.created_at < before),
+            execution_options={"synchronize_session": False},
+        )
+        db.session.commit()
+        archived += len(rows)
+
+
+def parse_audit_filters(args):
+    """Audit log filters from query arguments; raises ValueError for a malformed value.
+
+    ``start`` and ``end`` are dates and both days are included.
+    """
+    filters = {}
+    for key in ("action", "entity"):
+        value = (args.get(key) or "").strip()
+        if value:
+            filters[key] = value
+    for key in ("user_id", "entity_id"):
+        value = (args.get(key) or "").strip()
+        if value:
+            try:
+                filters[key] = int(value)
+            except ValueError:
+                raise ValueError(f"{key} must be a whole number.") from None
+    for key in ("start", "end"):
+        value = (args.get(key) or "").strip()
+        if value:
+            try:
+                filters[key] = dt.date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"{key} must be a date (YYYY-MM-DD).") from None
+    if "start" in filters and "end" in filters and filters["start"] > filters["end"]:
+        raise ValueError("start must not be after end.")
+    return filters
+
+
+def audit_users(owner_id):
+    """Accounts that appear in the owner's entries, for the user filter.
+
+    Each step seeks the (owner_id, user_id, created_at) index past the
+    previous user, so the cost grows with the number of users, not entries.
+    """
+    user_ids = {owner_id}
+    last = None
+    while True:
+        query = select(func.min(AuditLog.user_id)).where(AuditLog.owner_id == owner_id)
+        query = query.where(AuditLog.user_id > last) if last is not None else query.where(AuditLog.user_id.is_not(None))
+        last = db.session.scalar(query)
+        if last is None:
+            break
+        user_ids.add(last)
+    return db.session.scalars(select(AdminUser).where(AdminUser.id.in_(user_ids)).order_by(AdminUser.email)).all()
+
+
+def audit_conditions(filters, owner_id):
+    """WHERE clauses for ``filters`` within ``owner_id``'s entries.
+
+    Every query is pinned to one owner: with no other filter it walks the
+    (owner_id, created_at, id) index in order, a user filter walks
+    (owner_id, user_id, created_at), and one record uses
+    (entity, entity_id, created_at).
+    """
+    conditions = [AuditLog.owner_id == owner_id]
+    conditions += [
+        getattr(AuditLog, key) == filters[key] for key in ("user_id", "action", "entity", "entity_id") if key in filters
+    ]
+    if "start" in filters:
+        conditions.append(AuditLog.created_at >= dt.datetime.combine(filters["start"], dt.time.min))
+    if "end" in filters:
+        conditions.append(AuditLog.created_at < dt.datetime.combine(filters["end"] + dt.timedelta(days=1), dt.time.min))
+    return conditions
+
+
+def decode_audit_cursor(cursor):
+    """The (created_at, id) a page starts after; raises ValueError for a malformed cursor."""
+    value, _, row_id = cursor.rpartition("|")
+    return dt.datetime.fromisoformat(value), int(row_id)
+
+
+def audit_page(filters, owner_id, cursor=None, page_size=AUDIT_PAGE_SIZE):
+    """One page of the owner's matching entries, newest first, and the cursor of the next page or None."""
+    query = select(AuditLog).where(*audit_conditions(filters, owner_id))
+    if cursor:
+        created_at, row_id = decode_audit_cursor(cursor)
+        # A row-value comparison is a single index seek, unlike the equivalent OR.
+        query = query.where(tuple_(AuditLog.created_at, AuditLog.id) < (created_at, row_id))
+    rows = db.session.execute(
+        query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(page_size + 1)
+    ).scalars().all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def user_emails(user_ids, known=None):
+    """Emails of ``user_ids``, added to ``known``; only ids not already there are queried."""
+    known = {} if known is None else known
+    missing = {user_id for user_id in user_ids if user_id is not None and user_id not in known}
+    if missing:
+        known.update(db.session.execute(select(AdminUser.id, AdminUser.email).where(AdminUser.id.in_(missing))).all())
+    return known
+
+
+def _export_batches(filters, owner_id, batch_size):
+    conditions = audit_conditions(filters, owner_id)
+    columns = [getattr(AuditLog, column) for column in AUDIT_EXPORT_COLUMNS if column != "user_email"]
+    after = None
+    while True:
+        query = select(*columns).where(*conditions)
+        if after is not None:
+            query = query.where(tuple_(AuditLog.created_at, AuditLog.id) > after)
+        rows = db.session.execute(query.order_by(AuditLog.created_at, AuditLog.id).limit(batch_size)).all()
+        if not rows:
+            return
+        yield rows
+        after = (rows[-1].created_at, rows[-1].id)
+
+
+def audit_record(row, emails):
+    return {
+        "id": row.id,
+        "created_at": row.created_at.isoformat(),
+        "user_id": row.user_id,
+        "user_email": emails.get(row.user_id),
+        "action": row.action,
+        "entity": row.entity,
+        "entity_id": row.entity_id,
+        "details": row.details,
+    }
+
+
+def iter_audit_export(filters, owner_id, fmt, batch_size=AUDIT_EXPORT_BATCH_SIZE):
+    """Stream the owner's matching entries, oldest first, as NDJSON or CSV; needs an app context.
+
+    Rows are read a batch at a time by seeking past the previous batch's
+    last (created_at, id), so memory stays flat however long the range is.
+    """
+    emails = {}
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(AUDIT_EXPORT_COLUMNS)
+    for rows in _export_batches(filters, owner_id, batch_size):
+        user_emails((row.user_id for row in rows), emails)
+        records = [audit_record(row, emails) for row in rows]
+        # Plain rows survive the rollback, which ends the read transaction so
+        # a long download does not hold back WAL checkpoints between batches.
+        db.session.rollback()
+        if fmt == "csv":
+            yield "".join(
+                writer.writerow([sanitize_csv_value(record[column]) for column in AUDIT_EXPORT_COLUMNS])
+                for record in records
+            )
+        else:
+            yield "".join(json.dumps(record) + "\n" for record in records)
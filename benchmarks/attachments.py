@@ -0,0 +1,125 @@
+"""Attachment upload and lookup throughput: flat upload directory versus the content-addressed store.
+
+Usage: python -m benchmarks.attachments [--files 500000] [--duplicates 0.2] [--lookups 20000]
+"""
+import argparse
+import datetime as dt
+import io
+import os
+import random
+import secrets
+import shutil
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+from app import create_app  # noqa: E402
+from attachments import add_blob_reference, blob_path, save_blob  # noqa: E402
+from db import db  # noqa: E402
+from models import AdminUser, Equipment, Service, ServiceAttachment  # noqa: E402
+
+app = create_app()
+
+
+def seed():
+    db.create_all()
+    user = AdminUser(email="admin@example.com", password_hash="x", role="admin")
+    db.session.add(user)
+    db.session.flush()
+    equipment = Equipment(admin_user_id=user.id, type="Truck", vin_number="VIN1", code="EQ-1", make="Make", model="Model")
+    db.session.add(equipment)
+    db.session.flush()
+    service = Service(equipment_id=equipment.id, date=dt.date(2024, 1, 1), performed_by="tech")
+    db.session.add(service)
+    db.session.commit()
+    return service.id
+
+
+def payloads(count, duplicates, size):
+    """Yield upload bodies where roughly ``duplicates`` of them repeat an earlier one.
+
+    Bodies are regenerated from their seed rather than kept, so memory stays flat at 500k files.
+    """
+    rng = random.Random(11)
+    distinct = 0
+    for _ in range(count):
+        if distinct and rng.random() < duplicates:
+            seed = rng.randrange(distinct)
+        else:
+            seed = distinct
+            distinct += 1
+        yield random.Random(seed).randbytes(size)
+
+
+def disk_usage(root):
+    files = total = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            files += 1
+            total += os.path.getsize(os.path.join(directory, name))
+    return files, total
+
+
+def store_flat(upload, root):
+    """The original layout: a random name per upload in one directory."""
+    stored_name = f"{secrets.token_hex(16)}.pdf"
+    upload.save(os.path.join(root, stored_name))
+    return stored_name
+
+
+def store_blob(upload, root):
+    sha256, size = save_blob(upload.stream, root)
+    add_blob_reference(sha256, size)
+    return blob_path(sha256)
+
+
+def run(store, root, service_id, args):
+    """Store every upload and commit its attachment row, one transaction per upload as in the routes."""
+    os.makedirs(root)
+    names = []
+    started = time.perf_counter()
+    for body in payloads(args.files, args.duplicates, args.size):
+        stored_name = store(FileStorage(io.BytesIO(body), filename="receipt.pdf"), root)
+        db.session.add(ServiceAttachment(service_id=service_id, original_name="receipt.pdf", stored_name=stored_name))
+        db.session.commit()
+        names.append(stored_name)
+    return names, time.perf_counter() - started
+
+
+def lookups(root, names, count):
+    rng = random.Random(5)
+    started = time.perf_counter()
+    for _ in range(count):
+        with open(os.path.join(root, rng.choice(names)), "rb") as handle:
+            handle.read()
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500_000)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="Share of uploads that repeat earlier content.")
+    parser.add_argument("--size", type=int, default=4096, help="Bytes per upload.")
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        service_id = seed()
+        for label, store in (("flat", store_flat), ("sharded", store_blob)):
+            root = os.path.join(workdir, label)
+            names, elapsed = run(store, root, service_id, args)
+            files, total = disk_usage(root)
+            print(
+                f"{label:<8} uploads/s {args.files / elapsed:9.1f}  lookups/s {lookups(root, names, args.lookups):9.1f}  "
+                f"files {files}  MiB {total / 1024 / 1024:.1f}"
+            )
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
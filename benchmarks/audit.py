@@ -0,0 +1,105 @@
+"""Audited write transactions per second: audit rows written inline versus the write-behind spool.
+
+Usage: python -m benchmarks.audit [--writes 5000] [--threads 4] [--rows 1000000]
+"""
+import argparse
+import datetime as dt
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+os.environ["DROPBOX_WORKER"] = "off"
+os.environ["AUDIT_SPOOL_DIR"] = os.path.join(workdir, "spool")
+
+from sqlalchemy import insert, update  # noqa: E402
+
+from app import create_app  # noqa: E402
+from audit import install_write_behind, log_action  # noqa: E402
+from db import db  # noqa: E402
+from models import AdminUser, AuditLog, Equipment  # noqa: E402
+
+app = create_app()
+audit_writer = app.extensions["audit_writer"]
+
+
+def seed(rows):
+    db.create_all()
+    user = AdminUser(email="admin@example.com", password_hash="x", role="admin")
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all(
+        Equipment(admin_user_id=user.id, type="Truck", vin_number=f"VIN{number}", code=f"EQ-{number}", make="Make",
+                  model="Model", mileage=0)
+        for number in range(100)
+    )
+    # A large audit table, as in production, so every inline insert pays for deep indexes.
+    start = dt.datetime(2020, 1, 1)
+    for offset in range(0, rows, 50000):
+        db.session.execute(
+            insert(AuditLog),
+            [{"user_id": user.id, "action": "update", "entity": "equipment", "entity_id": number % 100,
+              "details": "seed", "created_at": start + dt.timedelta(seconds=number * 60)}
+             for number in range(offset, min(rows, offset + 50000))],
+        )
+    db.session.commit()
+    return user
+
+
+def run(writes, threads, user):
+    latencies = []
+
+    def worker(count, offset):
+        with app.app_context():
+            for number in range(count):
+                started = time.perf_counter()
+                equipment_id = (offset + number) % 100 + 1
+                db.session.execute(update(Equipment).where(Equipment.id == equipment_id).values(mileage=number))
+                log_action(user, "update", "equipment", equipment_id, "mileage")
+                db.session.commit()
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(writes // threads, index * 1000)) for index in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Audit rows already in the table.")
+    args = parser.parse_args()
+
+    with app.app_context():
+        user = seed(args.rows)
+        user = type("User", (), {"id": user.id})
+
+    app.config["AUDIT_MODE"] = "inline"
+    rate, p50, p99 = run(args.writes, args.threads, user)
+    print(f"inline        writes/s {rate:8.1f}  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+
+    app.config["AUDIT_MODE"] = "write-behind"
+    install_write_behind(db.session)
+    rate, p50, p99 = run(args.writes, args.threads, user)
+    started = time.perf_counter()
+    flushed = audit_writer.flush()
+    print(f"write-behind  writes/s {rate:8.1f}  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms  "
+          f"(final flush of {flushed} in {(time.perf_counter() - started) * 1000:.0f} ms)")
+    with app.app_context():
+        print(f"audit rows written {AuditLog.query.filter_by(details='mileage').count()} of {2 * (args.writes // args.threads) * args.threads}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
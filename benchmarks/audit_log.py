@@ -0,0 +1,117 @@
+"""Audit log viewer and export: filtered page time with and without the composite indexes, and export memory.
+
+Usage: python -m benchmarks.audit_log [--rows 1000000] [--requests 20]
+"""
+import argparse
+import datetime as dt
+import os
+import re
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+os.environ["DROPBOX_WORKER"] = "off"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from db import db  # noqa: E402
+from models import AdminUser, AuditLog  # noqa: E402
+from utils import hash_password  # noqa: E402
+
+app = create_app()
+
+USERS = 20
+ACTIONS = ("create", "update", "delete", "export", "checkin")
+ENTITIES = ("equipment", "service", "repair")
+FILTERS = {
+    "user, last 30 days": "user_id=7&start=2025-12-01&end=2025-12-31",
+    "one machine": "entity=equipment&entity_id=321",
+    "one machine, 2025": "entity=equipment&entity_id=321&start=2025-01-01&end=2025-12-31",
+    "action only": "action=delete",
+}
+
+
+def seed(rows):
+    db.create_all()
+    users = [AdminUser(email="admin@example.com", password_hash=hash_password("password123"), role="admin")]
+    users += [AdminUser(email=f"tech{number}@example.com", password_hash="x", role="tech") for number in range(USERS - 1)]
+    db.session.add_all(users)
+    db.session.flush()
+    # Two years of entries, spread evenly; half belong to the benchmark's admin and half to another account.
+    start = dt.datetime(2024, 1, 1)
+    step = dt.timedelta(days=730) / rows
+    for offset in range(0, rows, 50000):
+        db.session.execute(
+            insert(AuditLog),
+            [{"user_id": users[number % USERS].id, "owner_id": users[number % 2].id,
+              "action": ACTIONS[number % len(ACTIONS)], "entity": ENTITIES[number % len(ENTITIES)], "entity_id": number % 1000 + 1, "details": f"row {number}",
+              "created_at": start + step * number}
+             for number in range(offset, min(rows, offset + 50000))],
+        )
+    db.session.commit()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+
+def timed(count, call):
+    started = time.perf_counter()
+    for _ in range(count):
+        call()
+    return (time.perf_counter() - started) / count * 1000
+
+
+def page_times(client, requests):
+    return {label: timed(requests, lambda: client.get(f"/audit?{query}")) for label, query in FILTERS.items()}
+
+
+def export(client, query):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(f"/audit/export?{query}")
+    size = lines = 0
+    for chunk in response.response:
+        size += len(chunk)
+        lines += chunk.count("\n") if isinstance(chunk, str) else chunk.count(b"\n")
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return lines, elapsed, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed(args.rows)
+    client = app.test_client()
+    page = client.get("/login").get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    client.post("/login", data={"email": "admin@example.com", "password": "password123", "csrf_token": token})
+
+    indexed = page_times(client, args.requests)
+    with app.app_context(), db.engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_audit_log_entity_entity_id_created_at")
+        connection.exec_driver_sql("DROP INDEX ix_audit_log_owner_id_created_at_id")
+        connection.exec_driver_sql("DROP INDEX ix_audit_log_owner_id_user_id_created_at")
+    created_at_only = page_times(client, max(1, args.requests // 10))
+    for label in FILTERS:
+        print(f"{label:<20} created_at index {created_at_only[label]:8.1f} ms  composite indexes {indexed[label]:6.1f} ms")
+
+    for label, query in (("one month", "start=2025-06-01&end=2025-06-30"), ("one year", "start=2025-01-01&end=2025-12-31")):
+        for fmt in ("ndjson", "csv"):
+            lines, elapsed, size, peak = export(client, f"format={fmt}&{query}")
+            print(f"export {label:<9} {fmt:<6} {lines:>8} lines  {lines / elapsed:9.0f} rows/s  "
+                  f"{size / 1e6:6.1f} MB  peak Python memory {peak / 1e6:5.1f} MB")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
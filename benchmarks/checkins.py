@@ -0,0 +1,94 @@
+"""Check-ins per second: one form POST per reading versus batched JSON uploads from offline devices.
+
+Usage: python -m benchmarks.checkins [--machines 200] [--checkins 2000] [--batch 500]
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+os.environ["DROPBOX_WORKER"] = "off"
+
+from app import create_app  # noqa: E402
+from db import db  # noqa: E402
+from due import rebuild_due_index  # noqa: E402
+from models import AdminUser, Equipment, EquipmentCheckIn  # noqa: E402
+
+app = create_app()
+
+
+def seed(machines):
+    db.create_all()
+    user = AdminUser(email="admin@example.com", password_hash="x", role="admin")
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all(
+        Equipment(admin_user_id=user.id, type="Truck", vin_number=f"VIN{number}", code=f"EQ-{number}", make="Make",
+                  model="Model", qr_token=f"token-{number}", mileage=0, service_required="every 5,000 km")
+        for number in range(machines)
+    )
+    db.session.commit()
+    rebuild_due_index()
+
+
+def readings(machines, count):
+    rng = random.Random(3)
+    return [(f"token-{rng.randrange(machines)}", number * 10, f"Reading {number}") for number in range(count)]
+
+
+def run_form(client, readings):
+    page = client.get(f"/checkin/{readings[0][0]}").get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    started = time.perf_counter()
+    for qr_token, mileage, issues in readings:
+        client.post(f"/checkin/{qr_token}", data={"csrf_token": token, "mileage": mileage, "issues": issues})
+    return time.perf_counter() - started
+
+
+def run_api(client, readings, batch_size):
+    items = [
+        {"client_id": str(uuid.uuid4()), "token": qr_token, "mileage": mileage, "issues": issues}
+        for qr_token, mileage, issues in readings
+    ]
+    started = time.perf_counter()
+    for start in range(0, len(items), batch_size):
+        response = client.post("/api/checkins", json={"checkins": items[start : start + batch_size]})
+        assert response.json["created"] == len(items[start : start + batch_size])
+    elapsed = time.perf_counter() - started
+    # Re-sending everything, as a device does after a lost response, must not add rows.
+    for start in range(0, len(items), batch_size):
+        client.post("/api/checkins", json={"checkins": items[start : start + batch_size]})
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=200)
+    parser.add_argument("--checkins", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed(args.machines)
+    client = app.test_client()
+    data = readings(args.machines, args.checkins)
+
+    elapsed = run_form(client, data)
+    print(f"form POST      check-ins/s {args.checkins / elapsed:9.1f}")
+    elapsed = run_api(client, data, args.batch)
+    print(f"api batch {args.batch:<4} check-ins/s {args.checkins / elapsed:9.1f}")
+    with app.app_context():
+        stored = EquipmentCheckIn.query.count()
+    print(f"rows after re-sending every batch {stored} (expected {2 * args.checkins})")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Check-in writes per second while dashboard/history reads run in parallel.
+
+Compares SQLite's defaults with the connection settings from db.py.
+
+Usage: python -m benchmarks.concurrency [--writers 4] [--readers 8] [--seconds 10]
+"""
+import argparse
+import datetime as dt
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from db import db, engine_options, listen_sqlite_pragmas, sqlite_pragmas
+import models  # noqa: F401  (registers the tables on db.metadata)
+
+MACHINES = 500
+
+
+def build_engine(path, tuned):
+    url = f"sqlite:///{path}"
+    if not tuned:
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    listen_sqlite_pragmas(engine, sqlite_pragmas())
+    return engine
+
+
+def seed(path, services):
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    rng = random.Random(7)
+    with engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO admin_user (id, email, password_hash, role, registration_date) VALUES (1, 'a@example.com', 'x', 'admin', '2024-01-01')")
+        )
+        connection.execute(
+            text("INSERT INTO equipment (id, admin_user_id, type, vin_number, code, make, model) VALUES (:id, 1, 'Truck', :vin, :code, 'Make', 'Model')"),
+            [{"id": machine, "vin": f"VIN{machine}", "code": f"EQ-{machine}"} for machine in range(1, MACHINES + 1)],
+        )
+        connection.execute(
+            text("INSERT INTO service (equipment_id, date, performed_by) VALUES (:equipment_id, :date, 'tech')"),
+            [
+                {"equipment_id": rng.randint(1, MACHINES), "date": dt.date(2020, 1, 1) + dt.timedelta(days=rng.randint(0, 1500))}
+                for _ in range(services)
+            ],
+        )
+    engine.dispose()
+
+
+def writer(path, tuned, deadline, results):
+    engine = build_engine(path, tuned)
+    rng = random.Random(os.getpid())
+    written = locked = 0
+    while time.time() < deadline:
+        equipment_id = rng.randint(1, MACHINES)
+        mileage = rng.randint(0, 500000)
+        try:
+            with engine.begin() as connection:
+                connection.execute(
+                    text("INSERT INTO equipment_check_in (equipment_id, mileage, created_at) VALUES (:id, :mileage, :now)"),
+                    {"id": equipment_id, "mileage": mileage, "now": dt.datetime.utcnow()},
+                )
+                connection.execute(text("UPDATE equipment SET mileage = :mileage WHERE id = :id"), {"id": equipment_id, "mileage": mileage})
+                connection.execute(
+                    text("INSERT INTO audit_log (action, entity, entity_id, details, created_at) VALUES ('checkin', 'equipment', :id, 'qr', :now)"),
+                    {"id": equipment_id, "now": dt.datetime.utcnow()},
+                )
+            written += 1
+        except OperationalError:
+            locked += 1
+    results.put(("writer", written, locked))
+
+
+def reader(path, tuned, deadline, results):
+    engine = build_engine(path, tuned)
+    rng = random.Random(os.getpid())
+    reads = locked = 0
+    while time.time() < deadline:
+        try:
+            with engine.connect() as connection:
+                connection.execute(
+                    text("SELECT COUNT(*) FROM service JOIN equipment ON service.equipment_id = equipment.id WHERE equipment.admin_user_id = 1")
+                ).scalar()
+                connection.execute(
+                    text("SELECT * FROM equipment_check_in WHERE equipment_id = :id ORDER BY created_at DESC LIMIT 50"),
+                    {"id": rng.randint(1, MACHINES)},
+                ).fetchall()
+            reads += 1
+        except OperationalError:
+            locked += 1
+    results.put(("reader", reads, locked))
+
+
+def run(label, tuned, args, workdir):
+    path = os.path.join(workdir, f"{label}.db")
+    seed(path, args.services)
+    # Journal mode is stored in the file, so each run sets it up front.
+    build_engine(path, tuned).connect().close()
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + args.seconds
+    processes = [
+        multiprocessing.Process(target=writer, args=(path, tuned, deadline, results)) for _ in range(args.writers)
+    ] + [
+        multiprocessing.Process(target=reader, args=(path, tuned, deadline, results)) for _ in range(args.readers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {"writer": [0, 0], "reader": [0, 0]}
+    for _ in processes:
+        role, count, locked = results.get()
+        totals[role][0] += count
+        totals[role][1] += locked
+    for process in processes:
+        process.join()
+
+    print(
+        f"{label:<8} writes/s {totals['writer'][0] / args.seconds:9.1f}  "
+        f"reads/s {totals['reader'][0] / args.seconds:9.1f}  "
+        f"locked errors {totals['writer'][1] + totals['reader'][1]}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--services", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        run("default", False, args, workdir)
+        run("tuned", True, args, workdir)
+
+
+if __name__ == "__main__":
+    main()
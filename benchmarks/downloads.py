@@ -0,0 +1,96 @@
+"""Attachment downloads per second a single worker can serve: streaming through Flask versus X-Accel-Redirect offload.
+
+Usage: python -m benchmarks.downloads [--size-mb 20] [--requests 200]
+"""
+import argparse
+import datetime as dt
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from attachments import add_blob_reference, blob_path, save_blob  # noqa: E402
+from db import db  # noqa: E402
+from models import AdminUser, Equipment, Service, ServiceAttachment  # noqa: E402
+from utils import hash_password  # noqa: E402
+
+app = create_app()
+
+
+def seed(size):
+    app.config["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+    db.create_all()
+    user = AdminUser(email="admin@example.com", password_hash=hash_password("password123"), role="admin")
+    db.session.add(user)
+    db.session.flush()
+    equipment = Equipment(admin_user_id=user.id, type="Truck", vin_number="VIN1", code="EQ-1", make="Make", model="Model")
+    db.session.add(equipment)
+    db.session.flush()
+    service = Service(equipment_id=equipment.id, date=dt.date(2024, 1, 1), performed_by="tech")
+    db.session.add(service)
+    db.session.flush()
+    sha256, length = save_blob(io.BytesIO(os.urandom(size)), app.config["UPLOAD_FOLDER"])
+    add_blob_reference(sha256, length)
+    attachment = ServiceAttachment(service_id=service.id, original_name="manual.pdf", stored_name=blob_path(sha256))
+    db.session.add(attachment)
+    db.session.commit()
+    return attachment.id
+
+
+def measure(label, client, url, count, headers=None):
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", listener)
+    sent = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.get(url, headers=headers)
+        for chunk in response.response:
+            sent += len(chunk)
+        response.close()
+    elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", listener)
+    print(
+        f"{label:<12} status {response.status_code}  requests/s {count / elapsed:9.1f}  "
+        f"MiB through worker {sent / 1024 / 1024:9.1f}  queries/request {len(statements) / count:.1f}"
+    )
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        attachment_id = seed(args.size_mb * 1024 * 1024)
+
+    client = app.test_client()
+    page = client.get("/login").get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    client.post("/login", data={"email": "admin@example.com", "password": "password123", "csrf_token": token})
+    url = f"/service-attachment/{attachment_id}"
+
+    app.config["ATTACHMENT_OFFLOAD"] = ""
+    response = measure("flask", client, url, args.requests)
+    measure("revalidate", client, url, args.requests, {"If-None-Match": response.headers["ETag"]})
+    measure("range 1 MiB", client, url, args.requests, {"Range": "bytes=0-1048575"})
+    app.config["ATTACHMENT_OFFLOAD"] = "x-accel"
+    measure("x-accel", client, url, args.requests)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
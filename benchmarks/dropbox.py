@@ -0,0 +1,132 @@
+"""Adding equipment with inline Dropbox calls versus the outbox worker, against a fake Dropbox API.
+
+Usage: python -m benchmarks.dropbox [--machines 200] [--latency 0.5]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+os.environ["DROPBOX_ACCESS_TOKEN"] = "benchmark"
+os.environ["DROPBOX_WORKER"] = "off"
+
+import httpx  # noqa: E402
+
+from app import create_app  # noqa: E402
+from db import db  # noqa: E402
+from dropbox_folders import close_client, process_outbox  # noqa: E402
+from models import AdminUser, DropboxFolderJob  # noqa: E402
+from utils import hash_password  # noqa: E402
+
+app = create_app()
+
+
+class FakeDropbox(BaseHTTPRequestHandler):
+    latency = 0.0
+    calls = []
+    folders = set()
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+        self.calls.append(self.path)
+        time.sleep(self.latency)
+        if self.path.endswith("/files/create_folder_v2"):
+            if payload["path"] in self.folders:
+                return self._reply(409, {"error_summary": "path/conflict/folder/"})
+            self.folders.add(payload["path"])
+            return self._reply(200, {"metadata": {"path_display": payload["path"]}})
+        if self.path.endswith("/files/create_folder_batch"):
+            entries = []
+            for path in payload["paths"]:
+                if path in self.folders:
+                    entries.append({".tag": "failure", "failure": {".tag": "path", "path": {".tag": "conflict", "conflict": {".tag": "folder"}}}})
+                else:
+                    self.folders.add(path)
+                    entries.append({".tag": "success", "metadata": {"path_display": path}})
+            return self._reply(200, {".tag": "complete", "entries": entries})
+        self._reply(404, {})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def legacy_create_folder(base, path):
+    """The original request-path call: a fresh connection per folder."""
+    return httpx.post(
+        f"{base}/files/create_folder_v2",
+        json={"path": path, "autorename": False},
+        headers={"Authorization": "Bearer benchmark"},
+        timeout=10,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds the fake API takes per call.")
+    args = parser.parse_args()
+
+    FakeDropbox.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDropbox)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/2"
+    os.environ["DROPBOX_API_BASE"] = base
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(AdminUser(email="admin@example.com", password_hash=hash_password("password123"), role="admin"))
+        db.session.commit()
+
+    started = time.perf_counter()
+    for machine in range(args.machines):
+        legacy_create_folder(base, f"/legacy/{machine}")
+    legacy = time.perf_counter() - started
+    legacy_calls = len(FakeDropbox.calls)
+    print(f"legacy   add_equipment {legacy / args.machines * 1000:8.1f} ms/request  api calls {legacy_calls}")
+
+    client = app.test_client()
+    page = client.get("/login").get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    client.post("/login", data={"email": "admin@example.com", "password": "password123", "csrf_token": token})
+    started = time.perf_counter()
+    for machine in range(args.machines):
+        client.post(
+            "/add_equipment",
+            data={"csrf_token": token, "type": "Truck", "vin_number": f"VIN{machine}", "code": f"EQ-{machine}", "make": "Make", "model": "Model"},
+        )
+    requests = time.perf_counter() - started
+
+    FakeDropbox.calls.clear()
+    with app.app_context():
+        started = time.perf_counter()
+        counts = process_outbox()
+        drain = time.perf_counter() - started
+        pending = DropboxFolderJob.query.filter(DropboxFolderJob.status != "done").count()
+    print(
+        f"outbox   add_equipment {requests / args.machines * 1000:8.1f} ms/request  api calls {len(FakeDropbox.calls)}  "
+        f"drain {drain:.2f} s  created {counts['created']}  not done {pending}"
+    )
+
+    close_client()
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""History page response time as a machine's service and check-in history grows: full load versus keyset pages.
+
+Usage: python -m benchmarks.history [--sizes 1000 10000 100000] [--requests 20]
+"""
+import argparse
+import datetime as dt
+import os
+import re
+import shutil
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+os.environ["DROPBOX_WORKER"] = "off"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from db import db  # noqa: E402
+from models import AdminUser, Equipment, EquipmentCheckIn, Service, ServiceCostItem  # noqa: E402
+from reports import cost_items_by_parent  # noqa: E402
+from utils import hash_password  # noqa: E402
+
+app = create_app()
+
+
+def seed(sizes):
+    db.create_all()
+    user = AdminUser(email="admin@example.com", password_hash=hash_password("password123"), role="admin")
+    db.session.add(user)
+    db.session.flush()
+    machines = []
+    for number, size in enumerate(sizes):
+        equipment = Equipment(admin_user_id=user.id, type="Truck", vin_number=f"VIN{number}", code=f"EQ-{number}",
+                              make="Make", model="Model")
+        db.session.add(equipment)
+        db.session.flush()
+        start = dt.date(2000, 1, 1)
+        db.session.execute(
+            insert(Service),
+            [{"equipment_id": equipment.id, "date": start + dt.timedelta(days=day // 3), "performed_by": "tech",
+              "service_cost": 120.0} for day in range(size)],
+        )
+        service_ids = [row.id for row in Service.query.filter_by(equipment_id=equipment.id).with_entities(Service.id)]
+        db.session.execute(
+            insert(ServiceCostItem),
+            [{"service_id": service_id, "description": "Oil", "amount": 120.0} for service_id in service_ids],
+        )
+        db.session.execute(
+            insert(EquipmentCheckIn),
+            [{"equipment_id": equipment.id, "mileage": day * 40,
+              "created_at": dt.datetime(2000, 1, 1) + dt.timedelta(hours=day * 6)} for day in range(size)],
+        )
+        machines.append((equipment.id, size))
+    db.session.commit()
+    return machines
+
+
+def full_load(equipment_id):
+    """The queries the service page ran before, without rendering them."""
+    services = Service.query.filter_by(equipment_id=equipment_id).order_by(Service.date.desc()).all()
+    cost_items_by_parent(ServiceCostItem, ServiceCostItem.service_id, [service.id for service in services])
+    EquipmentCheckIn.query.filter_by(equipment_id=equipment_id).order_by(EquipmentCheckIn.created_at.desc()).all()
+
+
+def timed(count, call):
+    started = time.perf_counter()
+    for _ in range(count):
+        call()
+    return (time.perf_counter() - started) / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        machines = seed(args.sizes)
+    client = app.test_client()
+    page = client.get("/login").get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    client.post("/login", data={"email": "admin@example.com", "password": "password123", "csrf_token": token})
+
+    for equipment_id, size in machines:
+        with app.app_context():
+            full = timed(max(1, args.requests // 10), lambda: full_load(equipment_id))
+        first = timed(args.requests, lambda: client.get(f"/new_service/{equipment_id}"))
+        html = client.get(f"/new_service/{equipment_id}").get_data(as_text=True)
+        fragment = re.search(r'data-load-more="([^"]+)"', html).group(1).replace("&amp;", "&")
+        for _ in range(20):
+            fragment = client.get(fragment).headers["X-Next-Fragment"]
+        deep = timed(args.requests, lambda: client.get(fragment))
+        checkins = timed(args.requests, lambda: client.get(f"/equipment/{equipment_id}/checkins"))
+        print(f"{size:>7} rows  full load queries {full:8.1f} ms  service page {first:6.1f} ms  "
+              f"page 22 fragment {deep:6.1f} ms  check-ins page {checkins:6.1f} ms")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Query plans and timings for the hot lookups, before and after the model indexes.
+
+Usage: python -m benchmarks.indexes [--services 1000000] [--db path]
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+from db import db
+import models  # noqa: F401  (registers the tables on db.metadata)
+
+QUERIES = {
+    "service history": "SELECT * FROM service WHERE equipment_id = :equipment_id ORDER BY date DESC, id DESC LIMIT 50",
+    "latest service": "SELECT next_service FROM service WHERE equipment_id = :equipment_id ORDER BY date DESC LIMIT 1",
+    "service cost items": (
+        "SELECT * FROM service_cost_item WHERE service_id IN "
+        "(SELECT id FROM service WHERE equipment_id = :equipment_id ORDER BY date DESC LIMIT 50)"
+    ),
+    "dashboard service count": (
+        "SELECT COUNT(*) FROM service JOIN equipment ON service.equipment_id = equipment.id "
+        "WHERE equipment.admin_user_id = :admin_user_id"
+    ),
+    "equipment list": "SELECT * FROM equipment WHERE admin_user_id = :admin_user_id ORDER BY type, code",
+    "recent check-ins": "SELECT * FROM equipment_check_in WHERE equipment_id = :equipment_id ORDER BY created_at DESC LIMIT 5",
+    "audit window": "SELECT COUNT(*) FROM audit_log WHERE created_at >= :since",
+}
+
+
+def model_indexes():
+    return [index for table in db.metadata.sorted_tables for index in table.indexes]
+
+
+def seed(path, services, owners=10, machines=2000):
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    for index in model_indexes():
+        index.drop(engine)
+    engine.dispose()
+
+    rng = random.Random(42)
+    start = dt.date(2015, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO admin_user (id, email, password_hash, role, registration_date) VALUES (?, ?, 'x', 'admin', ?)",
+        [(owner, f"owner{owner}@example.com", "2024-01-01 00:00:00") for owner in range(1, owners + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO equipment (id, admin_user_id, type, vin_number, code, make, model) VALUES (?, ?, ?, ?, ?, 'Make', 'Model')",
+        [
+            (machine, machine % owners + 1, f"Type {machine % 12}", f"VIN{machine:08d}", f"EQ-{machine:05d}")
+            for machine in range(1, machines + 1)
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO service (id, equipment_id, date, performed_by, next_service, service_cost) VALUES (?, ?, ?, 'tech', ?, 100.0)",
+        (
+            (
+                row,
+                rng.randint(1, machines),
+                (start + dt.timedelta(days=rng.randint(0, 3650))).isoformat(),
+                (start + dt.timedelta(days=rng.randint(0, 3800))).isoformat(),
+            )
+            for row in range(1, services + 1)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO service_cost_item (service_id, description, amount) VALUES (?, 'Parts', 50.0)",
+        ((row,) for row in range(1, services + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO equipment_check_in (equipment_id, mileage, created_at) VALUES (?, ?, ?)",
+        (
+            (rng.randint(1, machines), rng.randint(0, 500000), f"{start + dt.timedelta(days=rng.randint(0, 3650))} 08:00:00")
+            for _ in range(services // 5)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO audit_log (user_id, action, entity, entity_id, created_at) VALUES (?, 'create', 'service', ?, ?)",
+        (
+            (rng.randint(1, owners), row, f"{start + dt.timedelta(days=rng.randint(0, 3650))} 08:00:00")
+            for row in range(1, services // 5 + 1)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_queries(conn, repeat):
+    params = {"equipment_id": 777, "admin_user_id": 3, "since": "2024-06-01 00:00:00"}
+    results = {}
+    for name, sql in QUERIES.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        started = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        elapsed = (time.perf_counter() - started) / repeat
+        results[name] = (elapsed, plan)
+    return results
+
+
+def report(label, results):
+    print(f"\n== {label} ==")
+    for name, (elapsed, plan) in results.items():
+        print(f"{name:<26} {elapsed * 1000:9.2f} ms  {' | '.join(plan)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--services", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", help="Reuse or keep the seeded database at this path.")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    if not os.path.exists(path):
+        print(f"Seeding {args.services} services into {path}...")
+        seed(path, args.services)
+
+    engine = create_engine(f"sqlite:///{path}")
+    for index in model_indexes():
+        index.drop(engine, checkfirst=True)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    before = run_queries(conn, args.repeat)
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    started = time.perf_counter()
+    for index in model_indexes():
+        index.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+    engine.dispose()
+    build_time = time.perf_counter() - started
+
+    conn = sqlite3.connect(path)
+    after = run_queries(conn, args.repeat)
+    conn.close()
+
+    report("without indexes", before)
+    report(f"with indexes (built in {build_time:.1f} s)", after)
+    print()
+    for name in QUERIES:
+        speedup = before[name][0] / after[name][0] if after[name][0] else float("inf")
+        print(f"{name:<26} {speedup:8.1f}x")
+
+    if not args.db:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
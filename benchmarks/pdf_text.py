@@ -0,0 +1,111 @@
+"""PDF text extraction on large vendor quotes: the old concatenating loop versus the streaming, parallel, cached engine.
+
+Usage: python -m benchmarks.pdf_text [--pages 200] [--documents 3] [--workers 2 4]
+"""
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from pypdf import PdfReader
+
+from pdf_text import extract_text, iter_page_text
+
+
+def text_pdf(pages):
+    """A text PDF with one page per list of lines, written by hand so no PDF library is needed."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        escaped = (line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines)
+        stream = "BT /F1 9 Tf 11 TL 36 806 Td " + " ".join(f"({text}) '" for text in escaped) + " ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode("latin-1")))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def quote_pdf(pages, seed):
+    return text_pdf(
+        [f"Quote {seed}-{page} line {line}: part P{page * 60 + line:06d} qty {line % 9 + 1} "
+         f"unit price ${(page + line) % 500 + 0.99:.2f}" for line in range(60)]
+        for page in range(pages)
+    )
+
+
+def legacy_pdfs(data):
+    """utils.pdfs before the extraction engine."""
+    reader = PdfReader(data)
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    return text
+
+
+def timed(call):
+    started = time.perf_counter()
+    result = call()
+    return time.perf_counter() - started, result
+
+
+def first_page(data, workers):
+    started = time.perf_counter()
+    next(iter_page_text(data, workers))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    documents = [quote_pdf(args.pages, seed) for seed in range(args.documents)]
+    print(f"{args.documents} documents of {args.pages} pages, {len(documents[0]) / 1e6:.1f} MB each, "
+          f"{os.cpu_count()} CPU(s)")
+
+    legacy, expected = 0.0, []
+    for data in documents:
+        elapsed, text = timed(lambda: legacy_pdfs(io.BytesIO(data)))
+        legacy += elapsed
+        expected.append(text)
+    print(f"legacy concatenation      {legacy / args.documents * 1000:8.1f} ms per document")
+
+    for workers in [1] + args.workers:
+        total = 0.0
+        for data, text in zip(documents, expected):
+            elapsed, result = timed(lambda: extract_text(data, workers))
+            assert result == text
+            total += elapsed
+        latency = first_page(documents[0], workers)
+        print(f"engine, {workers} worker(s)       {total / args.documents * 1000:8.1f} ms per document  "
+              f"first page after {latency * 1000:6.1f} ms")
+
+    workdir = tempfile.mkdtemp()
+    cache_dir = os.path.join(workdir, "cache")
+    for data in documents:
+        extract_text(data, 1, cache_dir)
+    hits = 0.0
+    for data in documents:
+        elapsed, _ = timed(lambda: extract_text(data, 1, cache_dir))
+        hits += elapsed
+    print(f"engine, cached re-upload  {hits / args.documents * 1000:8.1f} ms per document")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
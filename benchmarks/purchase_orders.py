@@ -0,0 +1,73 @@
+"""Purchase-order generation: opening the template with openpyxl per PO versus the cached, pre-split template.
+
+Usage: python -m benchmarks.purchase_orders [--count 200] [--batch 2000] [--workers 1 2]
+"""
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from openpyxl import load_workbook
+
+from purchase_orders import DEFAULT_PO_TEMPLATE, PO_TEMPLATE_DIR, PO_TEMPLATES, get_po_template, render_po, write_pos
+
+
+def sample_po(number):
+    return {
+        "vendor": f"Vendor {number} Ltd.",
+        "equipment": f"EQ-{number} - Caterpillar 320 (VIN VIN{number:08d})",
+        "po_number": f"R-{number:06d}",
+        "date": "2026-01-05",
+        "lines": [(f"Part {number}-{line} supply and install", 25.0 + line) for line in range(8)],
+    }
+
+
+def openpyxl_po(template_name, po):
+    """Fill the form the way it was done before: open the workbook from disk, set cells, save."""
+    filename, _, rows = PO_TEMPLATES[template_name]
+    workbook = load_workbook(os.path.join(PO_TEMPLATE_DIR, filename))
+    sheet = workbook.active
+    sheet["C14"], sheet["C8"], sheet["I9"], sheet["I8"] = po["vendor"], po["equipment"], po["po_number"], po["date"]
+    for row, (description, amount) in zip(rows, po["lines"]):
+        sheet[f"A{row}"], sheet[f"C{row}"], sheet[f"I{row}"] = 1, description, amount
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def per_po(count, call):
+    started = time.perf_counter()
+    for number in range(count):
+        call(sample_po(number))
+    return (time.perf_counter() - started) / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    args = parser.parse_args()
+    template = DEFAULT_PO_TEMPLATE
+
+    started = time.perf_counter()
+    get_po_template(template)
+    print(f"parse template once          {(time.perf_counter() - started) * 1000:7.2f} ms")
+    print(f"openpyxl load, fill, save    {per_po(max(1, args.count // 10), lambda po: openpyxl_po(template, po)):7.2f} ms per PO")
+    print(f"cached template render       {per_po(args.count, lambda po: render_po(template, po)):7.2f} ms per PO")
+
+    workdir = tempfile.mkdtemp()
+    for workers in args.workers:
+        jobs = [(template, sample_po(number), os.path.join(workdir, f"po-{workers}-{number}.xlsx"))
+                for number in range(args.batch)]
+        started = time.perf_counter()
+        written = sum(1 for _ in write_pos(jobs, workers))
+        elapsed = time.perf_counter() - started
+        print(f"batch, {workers} worker(s)           {written / elapsed:7.0f} POs/s ({written} files)")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
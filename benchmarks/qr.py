@@ -0,0 +1,92 @@
+"""QR image requests per second rendered per request versus cached with ETags, and label sheet rendering serial versus the process pool.
+
+Usage: python -m benchmarks.qr [--requests 500] [--machines 600] [--workers 4]
+"""
+import argparse
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+
+import qrcode  # noqa: E402
+
+from app import create_app  # noqa: E402
+from db import db  # noqa: E402
+from models import AdminUser, Equipment  # noqa: E402
+from qr_codes import render_sheet_pdf  # noqa: E402
+from utils import hash_password  # noqa: E402
+
+app = create_app()
+
+
+def seed(machines):
+    db.create_all()
+    user = AdminUser(email="admin@example.com", password_hash=hash_password("password123"), role="admin")
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all(
+        Equipment(admin_user_id=user.id, type="Truck", vin_number=f"VIN{number}", code=f"EQ-{number}",
+                  make="Make", model="Model", qr_token=f"token-{number:06d}-abcdefghij")
+        for number in range(machines)
+    )
+    db.session.commit()
+
+
+def uncached(url):
+    """What the route did before: encode and rasterise on every request."""
+    buffer = io.BytesIO()
+    qrcode.make(url).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def rate(count, request):
+    started = time.perf_counter()
+    for _ in range(count):
+        response = request()
+    return response, count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--machines", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    app.config["QR_CACHE_FOLDER"] = os.path.join(workdir, "qr")
+    with app.app_context():
+        seed(args.machines)
+
+    client = app.test_client()
+    page = client.get("/login").get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    client.post("/login", data={"email": "admin@example.com", "password": "password123", "csrf_token": token})
+
+    checkin_url = "http://localhost/checkin/token-000001-abcdefghij"
+    _, render_rate = rate(args.requests, lambda: uncached(checkin_url))
+    response, cached_rate = rate(args.requests, lambda: client.get("/equipment/1/qr.png"))
+    etag = response.headers["ETag"]
+    _, revalidate_rate = rate(args.requests, lambda: client.get("/equipment/1/qr.png", headers={"If-None-Match": etag}))
+    print(f"qr.png requests/s  render only {render_rate:8.1f}  cached route {cached_rate:8.1f}  "
+          f"304 route {revalidate_rate:8.1f}")
+
+    labels = [(f"http://localhost/checkin/token-{number:06d}-abcdefghij", f"EQ-{number} - Truck")
+              for number in range(args.machines)]
+    timings = []
+    for workers in (1, args.workers):
+        started = time.perf_counter()
+        pdf = render_sheet_pdf(labels, workers)
+        timings.append(time.perf_counter() - started)
+    print(f"{args.machines} labels PDF  serial {timings[0]:6.2f}s  pool of {args.workers} {timings[1]:6.2f}s  "
+          f"size {len(pdf) / 1024:8.1f} KiB")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""SQL statements issued per route for a logged-in admin.
+
+Usage: python -m benchmarks.queries
+"""
+import datetime as dt
+import os
+import re
+import shutil
+import tempfile
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from db import db  # noqa: E402
+from models import AdminUser, Equipment, Service, Repair  # noqa: E402
+from utils import hash_password  # noqa: E402
+
+app = create_app()
+
+ROUTES = [
+    "/dashboard",
+    "/add_equipment",
+    "/new_service/1",
+    "/new_repair/1",
+    "/equipment/1/checkins",
+    "/equipment/1/report.csv",
+    "/team",
+]
+
+
+def seed():
+    db.create_all()
+    user = AdminUser(email="admin@example.com", password_hash=hash_password("password123"), role="admin")
+    db.session.add(user)
+    db.session.flush()
+    equipment = Equipment(
+        admin_user_id=user.id, type="Truck", vin_number="VIN1", code="EQ-1", make="Make", model="Model", qr_token="token"
+    )
+    db.session.add(equipment)
+    db.session.flush()
+    for day in range(20):
+        db.session.add(Service(equipment_id=equipment.id, date=dt.date(2024, 1, 1 + day), performed_by="tech"))
+        db.session.add(Repair(equipment_id=equipment.id, date=dt.date(2024, 2, 1 + day), performed_by="tech"))
+    db.session.commit()
+
+
+def main():
+    with app.app_context():
+        seed()
+        engine = db.engine
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    client = app.test_client()
+    page = client.get("/login").get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    client.post("/login", data={"email": "admin@example.com", "password": "password123", "csrf_token": token})
+
+    for _ in range(2):
+        # The second pass shows steady state once any per-process caches are warm.
+        for route in ROUTES:
+            statements.clear()
+            response = client.get(route)
+            response.get_data()
+            user_lookups = sum(1 for sql in statements if "FROM admin_user" in sql)
+            print(f"{route:<28} status {response.status_code}  queries {len(statements):3d}  user lookups {user_lookups}")
+        print()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Quote import throughput in files per second: parsing workbooks and PDFs in worker processes, then bulk storing cost items.
+
+Usage: python -m benchmarks.quotes [--files 3000] [--workers 1 2 4]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+os.environ["DROPBOX_WORKER"] = "off"
+
+from openpyxl import load_workbook  # noqa: E402
+
+from app import create_cli_app  # noqa: E402
+from benchmarks.pdf_text import text_pdf  # noqa: E402
+from db import basedir, db  # noqa: E402
+from models import AdminUser, Equipment, RepairCostItem  # noqa: E402
+from quotes import find_quote_files, iter_parsed_quotes, store_quotes  # noqa: E402
+
+app = create_cli_app()
+
+VENDOR_TEMPLATE = os.path.join(basedir, "static", "AVS Line Painting LTD..xlsx")
+VARIANTS = 40
+
+
+def workbook_variant(path, seed):
+    """The vendor PO form with 1-19 random lines, saved as a new workbook."""
+    rng = random.Random(seed)
+    workbook = load_workbook(VENDOR_TEMPLATE)
+    sheet = workbook.active
+    for row in range(19, 38):
+        for column in ("A", "B", "C", "I", "J"):
+            sheet[f"{column}{row}"] = None
+    for row in range(19, 19 + rng.randint(1, 19)):
+        quantity, price = rng.randint(1, 50), rng.randint(10, 5000) + 0.5
+        sheet[f"A{row}"], sheet[f"B{row}"] = quantity, rng.choice(["EA", "LS", "m", "t"])
+        sheet[f"C{row}"] = f"Supply and install item {seed}-{row} per drawings"
+        sheet[f"I{row}"], sheet[f"J{row}"] = f"${price:,.2f}", f"${quantity * price:,.2f}"
+    workbook.save(path)
+
+
+def pdf_variant(path, seed):
+    rng = random.Random(seed)
+    lines = [f"Quote #Q{seed:05d}", "Qty Description Unit price Total"]
+    for number in range(rng.randint(3, 40)):
+        quantity, price = rng.randint(1, 20), rng.randint(5, 900) + 0.25
+        lines.append(f"{quantity} Asphalt patch material lot {number} ${price:,.2f} ${quantity * price:,.2f}")
+    lines += ["Subtotal $1.00", "HST 13% $0.13", "Total $1.13", "Thank you for your business"]
+    with open(path, "wb") as handle:
+        handle.write(text_pdf([lines]))
+
+
+def build_corpus(count):
+    variants = os.path.join(workdir, "variants")
+    corpus = os.path.join(workdir, "quotes")
+    os.makedirs(variants)
+    os.makedirs(corpus)
+    workbooks, pdfs = [], []
+    for seed in range(VARIANTS):
+        workbooks.append(os.path.join(variants, f"variant-{seed}.xlsx"))
+        workbook_variant(workbooks[-1], seed)
+        pdfs.append(os.path.join(variants, f"variant-{seed}.pdf"))
+        pdf_variant(pdfs[-1], seed)
+    # Two workbooks for every PDF, as in the shared drive these imports come from.
+    for number in range(count):
+        source = (pdfs if number % 3 == 2 else workbooks)[number % VARIANTS]
+        shutil.copy(source, os.path.join(corpus, f"quote-{number:05d}{os.path.splitext(source)[1]}"))
+    return corpus
+
+
+def seed_equipment():
+    db.create_all()
+    user = AdminUser(email="admin@example.com", password_hash="x", role="admin")
+    db.session.add(user)
+    db.session.flush()
+    equipment = Equipment(admin_user_id=user.id, type="Paver", vin_number="VIN1", code="PV-1", make="Make",
+                          model="Model")
+    db.session.add(equipment)
+    db.session.commit()
+    return equipment.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    paths = find_quote_files([build_corpus(args.files)])
+    print(f"{len(paths)} files, {os.cpu_count()} CPU(s)")
+    for workers in args.workers:
+        started = time.perf_counter()
+        parsed = list(iter_parsed_quotes(paths, workers))
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for quote in parsed if "error" in quote)
+        print(f"parse, {workers} worker(s)  {len(paths) / elapsed:7.1f} files/s  ({failed} without line items)")
+
+    with app.app_context():
+        equipment = db.session.get(Equipment, seed_equipment())
+        quotes = [quote for quote in parsed if "error" not in quote]
+        started = time.perf_counter()
+        for start in range(0, len(quotes), 200):
+            store_quotes(quotes[start : start + 200], equipment, "repair")
+            db.session.commit()
+        elapsed = time.perf_counter() - started
+        items = RepairCostItem.query.count()
+        print(f"store                {len(quotes) / elapsed:7.1f} files/s  ({items} cost items)")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Nightly reminder query: per-machine N+1 loop versus the equipment_due range scan.
+
+Usage: python -m benchmarks.reminders [--machines 100000] [--services-per-machine 3]
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+
+from sqlalchemy import event  # noqa: E402
+
+from db import db  # noqa: E402
+from models import AdminUser, Equipment, Service  # noqa: E402
+from send_reminders import app, iter_reminders, reminder_cutoff  # noqa: E402
+
+
+def legacy_build_reminders(cutoff):
+    """The original implementation: one query per machine, one per owner."""
+    reminders = {}
+    for equipment in Equipment.query.all():
+        latest_service = (
+            Service.query.filter_by(equipment_id=equipment.id)
+            .order_by(Service.date.desc())
+            .first()
+        )
+        if not latest_service or not latest_service.next_service:
+            continue
+        if latest_service.next_service > cutoff:
+            continue
+        reminders.setdefault(equipment.admin_user_id, []).append(equipment.code)
+    return {AdminUser.query.filter_by(id=user_id).first().email: items for user_id, items in reminders.items()}
+
+
+def seed(path, machines, services_per_machine, owners):
+    rng = random.Random(3)
+    today = dt.date.today()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO admin_user (id, email, password_hash, role, registration_date) VALUES (?, ?, 'x', 'admin', '2024-01-01')",
+        [(owner, f"owner{owner}@example.com") for owner in range(1, owners + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO equipment (id, admin_user_id, type, vin_number, code, make, model) VALUES (?, ?, 'Truck', ?, ?, 'Make', 'Model')",
+        [(machine, machine % owners + 1, f"VIN{machine}", f"EQ-{machine}") for machine in range(1, machines + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO service (equipment_id, date, performed_by, next_service) VALUES (?, ?, 'tech', ?)",
+        (
+            (
+                machine,
+                (today - dt.timedelta(days=rng.randint(30, 900))).isoformat(),
+                (today + dt.timedelta(days=rng.randint(-30, 180))).isoformat(),
+            )
+            for machine in range(1, machines + 1)
+            for _ in range(services_per_machine)
+        ),
+    )
+    # Stand in for the incrementally maintained index: latest service per machine.
+    conn.execute(
+        """
+        INSERT INTO equipment_due (equipment_id, admin_user_id, due_date, next_service_date, reading_count,
+                                   sum_days, sum_mileage, sum_days_sq, sum_days_mileage, updated_at)
+        SELECT equipment.id, equipment.admin_user_id, latest.next_service, latest.next_service, 0, 0, 0, 0, 0, ?
+        FROM equipment
+        JOIN (
+            SELECT equipment_id, next_service,
+                   ROW_NUMBER() OVER (PARTITION BY equipment_id ORDER BY date DESC, id DESC) AS position
+            FROM service
+        ) AS latest ON latest.equipment_id = equipment.id AND latest.position = 1
+        """,
+        (dt.datetime.utcnow().isoformat(" "),),
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(label, build):
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(db.engine, "before_cursor_execute", listener)
+    started = time.perf_counter()
+    reminders = build()
+    elapsed = time.perf_counter() - started
+    event.remove(db.engine, "before_cursor_execute", listener)
+    machines = sum(len(items) for items in reminders.values())
+    print(f"{label:<10} {elapsed:8.2f} s  queries {len(statements):7d}  owners {len(reminders):5d}  machines due {machines}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=100_000)
+    parser.add_argument("--services-per-machine", type=int, default=3)
+    parser.add_argument("--owners", type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        seed(db.engine.url.database, args.machines, args.services_per_machine, args.owners)
+        cutoff = reminder_cutoff()
+        measure("due index", lambda: dict(iter_reminders(cutoff)))
+        db.session.expunge_all()
+        measure("legacy", lambda: legacy_build_reminders(cutoff))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Equipment page response time with the response cache off, in memory and on disk, under a read-heavy mix.
+
+Usage: python -m benchmarks.response_cache [--machines 2000] [--requests 300] [--write-every 50]
+
+Every ``--write-every`` page views a service is saved, which invalidates the owner's cached pages.
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+os.environ["DROPBOX_WORKER"] = "off"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from db import db  # noqa: E402
+from models import AdminUser, Equipment  # noqa: E402
+from response_cache import create_response_cache, response_cache_settings  # noqa: E402
+from utils import hash_password  # noqa: E402
+
+app = create_app()
+
+TYPES = ("Excavator", "Loader", "Truck", "Paver", "Roller")
+# What people actually open: the plain list, a type filter, another sort, a search.
+VIEWS = ("/add_equipment", "/add_equipment?type=Truck", "/add_equipment?sort=code", "/add_equipment?search=cat")
+
+
+def seed(machines):
+    db.create_all()
+    user = AdminUser(email="admin@example.com", password_hash=hash_password("password123"), role="admin")
+    db.session.add(user)
+    db.session.flush()
+    db.session.execute(
+        insert(Equipment),
+        [{"admin_user_id": user.id, "type": TYPES[number % len(TYPES)], "vin_number": f"VIN{number}",
+          "code": f"EQ-{number:05d}", "make": "Cat" if number % 7 == 0 else "Volvo", "model": f"M{number % 40}"}
+         for number in range(machines)],
+    )
+    db.session.commit()
+    return db.session.query(Equipment.id).first()[0]
+
+
+def run(client, token, equipment_id, requests, write_every):
+    """Mean and p95 page time in ms over ``requests`` page views, saving a service every ``write_every``."""
+    samples = []
+    for number in range(requests):
+        if write_every and number and number % write_every == 0:
+            client.post(f"/new_service/{equipment_id}", data={
+                "date": "2024-01-01", "performed_by": "tech", "csrf_token": token,
+                "cost_item_desc": "Oil", "cost_item_amount": "10",
+            })
+        started = time.perf_counter()
+        client.get(VIEWS[number % len(VIEWS)])
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return sum(samples) / len(samples), samples[int(len(samples) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--write-every", type=int, default=50)
+    args = parser.parse_args()
+
+    with app.app_context():
+        equipment_id = seed(args.machines)
+    client = app.test_client()
+    page = client.get("/login").get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    client.post("/login", data={"email": "admin@example.com", "password": "password123", "csrf_token": token})
+
+    for backend in ("off", "memory", "disk"):
+        settings = dict(response_cache_settings(), backend=backend, dir=os.path.join(workdir, "cache"))
+        app.config["RESPONSE_CACHE"] = backend
+        app.extensions["response_cache"] = create_response_cache(settings)
+        mean, p95 = run(client, token, equipment_id, args.requests, args.write_every)
+        fragments = client.get("/equipment/cache-stats").get_json()["fragments"]
+        rate = fragments.get("equipment_list", {}).get("hit_rate")
+        print(f"{backend:<7} mean {mean:7.1f} ms  p95 {p95:7.1f} ms  "
+              f"list hit rate {'-' if rate is None else f'{rate:.0%}'}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Search latency over a million notes: the LIKE scan versus the FTS5 index, plus what the sync triggers cost on insert.
+
+Usage: python -m benchmarks.search [--rows 1000000] [--owners 20] [--queries 20]
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import shutil
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+os.environ["DROPBOX_WORKER"] = "off"
+
+from sqlalchemy import insert, or_  # noqa: E402
+
+from app import create_app  # noqa: E402
+from db import db  # noqa: E402
+from models import AdminUser, Equipment, Service  # noqa: E402
+from search import matching_equipment_ids, rebuild_search_index, search_hits  # noqa: E402
+
+app = create_app()
+
+WORDS = (
+    "oil filter hydraulic pump seal hose leak brake pad rotor tire tread belt coolant radiator battery alternator "
+    "starter injector grease bearing bushing track idler sprocket bucket tooth boom cylinder valve gasket wiper "
+    "mirror light fuse relay sensor harness clamp bolt weld crack paint rust inspection adjusted replaced topped "
+    "checked cleaned torqued lubricated calibrated"
+).split()
+# Rare enough to sit in about one note in ten thousand.
+RARE = "turbocharger"
+
+
+def note(rng):
+    words = rng.choices(WORDS, k=rng.randint(6, 16))
+    if rng.random() < 0.0001:
+        words.insert(rng.randrange(len(words)), RARE)
+    return " ".join(words)
+
+
+def seed(rows, owners):
+    db.create_all()
+    users = [AdminUser(email=f"owner{number}@example.com", password_hash="x", role="admin") for number in range(owners)]
+    db.session.add_all(users)
+    db.session.flush()
+    machines = []
+    for number in range(owners * 50):
+        machines.append(
+            Equipment(admin_user_id=users[number % owners].id, type="Excavator", vin_number=f"VIN{number}",
+                      code=f"EX-{number}", make="Make", model="Model")
+        )
+    db.session.add_all(machines)
+    db.session.commit()
+    ids = [machine.id for machine in machines]
+
+    rng = random.Random(7)
+    started = time.perf_counter()
+    start = dt.date(2015, 1, 1)
+    for offset in range(0, rows, 20000):
+        db.session.execute(
+            insert(Service),
+            [{"equipment_id": rng.choice(ids), "date": start + dt.timedelta(days=rng.randrange(3650)),
+              "performed_by": "tech", "notes": note(rng)} for _ in range(min(20000, rows - offset))],
+        )
+    db.session.commit()
+    return users[0].id, time.perf_counter() - started
+
+
+def timed(count, call):
+    started = time.perf_counter()
+    for _ in range(count):
+        result = call()
+    return (time.perf_counter() - started) / count * 1000, result
+
+
+def like_search(admin_user_id, term, limit=None):
+    query = (
+        db.session.query(Service.id)
+        .join(Equipment, Equipment.id == Service.equipment_id)
+        .filter(Equipment.admin_user_id == admin_user_id)
+        .filter(or_(Service.notes.ilike(f"%{term}%"), Service.performed_by.ilike(f"%{term}%")))
+    )
+    return query.limit(limit).all() if limit else query.all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--owners", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        owner_id, elapsed = seed(args.rows, args.owners)
+        print(f"insert with sync triggers  {args.rows / elapsed:9.0f} rows/s")
+        started = time.perf_counter()
+        documents = rebuild_search_index()
+        print(f"rebuild                    {time.perf_counter() - started:9.1f} s for {documents} documents")
+
+        for label, term in (("rare word", RARE), ("common word", "hydraulic"), ("prefix", "lubric")):
+            like_ms, like_rows = timed(max(1, args.queries // 5), lambda: like_search(owner_id, term, 10))
+            fts_ms, hits = timed(args.queries, lambda: search_hits(owner_id, term, 10))
+            print(f"{label:<12} top 10  LIKE {like_ms:8.1f} ms  FTS5 ranked {fts_ms:7.2f} ms  ({len(like_rows)}/{len(hits)} hits)")
+        for label, term in (("rare word", RARE), ("common word", "hydraulic")):
+            # What the equipment list needs: every machine with a match.
+            like_ms, like_rows = timed(1, lambda: {row.id for row in like_search(owner_id, term)})
+            fts_ms, machines = timed(
+                max(1, args.queries // 5),
+                lambda: set(db.session.scalars(matching_equipment_ids(owner_id, term))),
+            )
+            print(f"{label:<12} all     LIKE {like_ms:8.1f} ms  FTS5 machines {fts_ms:5.1f} ms  "
+                  f"({len(like_rows)} notes, {len(machines)} machines)")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Reminder delivery throughput against a local aiosmtpd server.
+
+Compares a fresh connection per message with the pooled, persistent
+connections in mailer.py. Requires ``pip install aiosmtpd``.
+
+Usage: python -m benchmarks.smtp [--messages 500] [--workers 4] [--latency-ms 5]
+"""
+import argparse
+import asyncio
+import smtplib
+import time
+
+from mailer import build_message, deliver
+
+
+class CountingHandler:
+    def __init__(self, latency):
+        self.latency = latency
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.received += 1
+        return "250 OK"
+
+
+def per_message_connections(settings, messages):
+    for _, message in messages:
+        with smtplib.SMTP(settings["host"], settings["port"]) as server:
+            server.send_message(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated server processing time per message.")
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        raise SystemExit("aiosmtpd is required for this benchmark: pip install aiosmtpd")
+
+    handler = CountingHandler(args.latency_ms / 1000)
+    controller = Controller(handler, hostname="127.0.0.1", port=8025)
+    controller.start()
+    settings = {
+        "host": "127.0.0.1",
+        "port": 8025,
+        "username": None,
+        "password": None,
+        "use_tls": False,
+        "timeout": 10,
+        "sender": "reminders@example.com",
+    }
+    messages = [
+        (index, build_message(settings, f"owner{index}@example.com", "Service reminders", "- EQ-1 due"))
+        for index in range(args.messages)
+    ]
+    try:
+        started = time.perf_counter()
+        per_message_connections(settings, messages)
+        legacy = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = list(deliver(messages, settings, workers=args.workers, retries=0))
+        pooled = time.perf_counter() - started
+    finally:
+        controller.stop()
+
+    failures = sum(1 for result in results if not result.ok)
+    print(f"connection per message    {args.messages / legacy:8.1f} messages/s")
+    print(f"pooled ({args.workers} connections)    {args.messages / pooled:8.1f} messages/s  failures {failures}")
+    print(f"server received {handler.received} messages")
+
+
+if __name__ == "__main__":
+    main()
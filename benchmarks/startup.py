@@ -0,0 +1,66 @@
+"""Cold-start cost of the web app and the batch scripts, from ``python -X importtime`` in fresh processes.
+
+Usage: python -m benchmarks.startup [--runs 15] [--targets web send_reminders ...]
+
+Start-up on a shared machine is noisy, so the best run is reported next to the median.
+"""
+import argparse
+import os
+import resource
+import statistics
+import subprocess
+import sys
+
+from db import basedir
+
+TARGETS = {
+    "web": "from app import create_app; create_app()",
+    "send_reminders": "import send_reminders",
+    "migrate_features": "import migrate_features",
+    "create_db": "import create_db",
+    "add_attachment_tables": "import add_attachment_tables",
+    "dropbox_worker": "import dropbox_worker",
+}
+
+
+def startup(code):
+    """Total import time and CPU time, both in milliseconds, of a fresh interpreter running ``code``."""
+    env = dict(os.environ, DROPBOX_WORKER="off")
+    # Batch scripts must start without it; only the web app needs a secret key.
+    env.pop("SECRET_KEY", None)
+    if "create_app()" in code:
+        env["SECRET_KEY"] = "benchmark"
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=basedir, env=env, capture_output=True, text=True, check=True,
+    )
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime) * 1000
+    total = 0
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        # Top-level imports only; their cumulative times already include everything they pulled in.
+        if len(fields) == 3 and fields[1].strip().isdigit() and not fields[2].startswith("  "):
+            total += int(fields[1])
+    return total / 1000, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=list(TARGETS))
+    args = parser.parse_args()
+
+    for name in args.targets:
+        samples = [startup(TARGETS[name]) for _ in range(args.runs)]
+        imports = [sample[0] for sample in samples]
+        cpu = [sample[1] for sample in samples]
+        print(
+            f"{name:<22} imports best {min(imports):6.1f} ms  median {statistics.median(imports):6.1f} ms   "
+            f"process CPU best {min(cpu):6.1f} ms  median {statistics.median(cpu):6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
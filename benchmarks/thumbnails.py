@@ -0,0 +1,58 @@
+"""Bytes a history page pulls for its images, and thumbnail rendering throughput serial versus the process pool.
+
+Usage: python -m benchmarks.thumbnails [--images 24] [--workers 4]
+"""
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from attachments import blob_path, save_blob
+from thumbnails import render_thumbnails, thumbnail_path
+
+
+def phone_photo(seed):
+    """A 12 MP JPEG roughly the size phones upload."""
+    image = Image.effect_noise((4000, 3000), 40 + seed % 20).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=92)
+    buffer.seek(0)
+    return buffer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        stored_names = [blob_path(save_blob(phone_photo(seed), root)[0]) for seed in range(args.images)]
+        original = sum(os.path.getsize(os.path.join(root, name)) for name in stored_names)
+
+        started = time.perf_counter()
+        for name in stored_names[: len(stored_names) // 2]:
+            render_thumbnails(root, name, "webp")
+        serial = (len(stored_names) // 2) / (time.perf_counter() - started)
+        shutil.rmtree(os.path.join(root, "thumbs"))
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(render_thumbnails, [root] * len(stored_names), stored_names, ["webp"] * len(stored_names)))
+        pooled = len(stored_names) / (time.perf_counter() - started)
+
+        thumbs = sum(os.path.getsize(thumbnail_path(root, name, "thumb", "webp")) for name in stored_names)
+        print(f"history page images  originals {original / 1024 / 1024:8.1f} MiB  thumbnails {thumbs / 1024:8.1f} KiB")
+        print(f"render images/s      serial {serial:6.2f}  pool of {args.workers} {pooled:6.2f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Concurrent 15 MB attachment uploads: Werkzeug's spooled temp files versus streaming into the store.
+
+The app runs in a child process per mode so its peak memory and bytes written
+are measured without the load generator.
+
+Usage: python -m benchmarks.uploads [--uploads 64] [--concurrency 16] [--size-mb 15]
+"""
+import argparse
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+
+def written_bytes():
+    """Bytes this process passed to write() (Linux only)."""
+    try:
+        with open("/proc/self/io") as handle:
+            for line in handle:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def peak_rss_kib():
+    """High-water RSS from /proc; ru_maxrss would include the parent's peak inherited across exec."""
+    try:
+        with open("/proc/self/status") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def serve(mode, workdir):
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+    os.environ["MAX_UPLOAD_FILE_MB"] = "16"
+    os.environ["DROPBOX_WORKER"] = "off"
+    sys.path.insert(0, os.getcwd())
+
+    import datetime as dt
+    import logging
+
+    from flask import Request
+    from werkzeug.serving import make_server
+
+    from app import create_app
+    from db import db
+    from models import AdminUser, Equipment
+    from utils import hash_password
+
+    app = create_app()
+    app.config["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+    if mode == "spooled":
+        app.request_class = Request
+    with app.app_context():
+        db.create_all()
+        user = AdminUser(email="admin@example.com", password_hash=hash_password("password123"), role="admin")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(
+            Equipment(admin_user_id=user.id, type="Truck", vin_number="VIN1", code="EQ-1", make="Make", model="Model",
+                      last_service_date=dt.datetime(2024, 1, 1))
+        )
+        db.session.commit()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    baseline = written_bytes()
+    print(server.server_port, flush=True)
+    sys.stdin.readline()
+    server.shutdown()
+    peak_kib = peak_rss_kib()
+    print(f"{peak_kib} {written_bytes() - baseline}", flush=True)
+
+
+def run(mode, args):
+    workdir = tempfile.mkdtemp()
+    child = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.uploads", "--serve", mode, "--workdir", workdir],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        base = f"http://127.0.0.1:{child.stdout.readline().strip()}"
+        body = b"%PDF-1.7\n" + os.urandom(args.size_mb * 1024 * 1024 - 9)
+        with httpx.Client(base_url=base, timeout=120) as client:
+            page = client.get("/login").text
+            token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+            client.post("/login", data={"email": "admin@example.com", "password": "password123", "csrf_token": token})
+
+            def upload(number):
+                response = client.post(
+                    "/new_service/1",
+                    data={"csrf_token": token, "date": "2024-05-01", "performed_by": "tech"},
+                    # Vary one byte so every upload is a distinct blob.
+                    files={"attachments": (f"manual{number}.pdf", body[:-4] + number.to_bytes(4, "big"), "application/pdf")},
+                )
+                return response.status_code
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                statuses = list(pool.map(upload, range(args.uploads)))
+            elapsed = time.perf_counter() - started
+        child.stdin.write("stop\n")
+        child.stdin.flush()
+        peak_kib, written = map(int, child.stdout.readline().split())
+        stored = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for directory, _, names in os.walk(os.path.join(workdir, "uploads"))
+            for name in names
+        )
+        print(
+            f"{mode:<9} uploads/s {args.uploads / elapsed:6.2f}  MiB/s {args.uploads * args.size_mb / elapsed:7.1f}  "
+            f"peak RSS {peak_kib / 1024:7.1f} MiB  written {written / 1024 / 1024:8.1f} MiB  "
+            f"stored {stored / 1024 / 1024:8.1f} MiB  ok {statuses.count(302)}/{args.uploads}"
+        )
+    finally:
+        child.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--size-mb", type=int, default=15)
+    parser.add_argument("--serve", choices=("spooled", "streamed"), help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.workdir)
+        return
+    for mode in ("spooled", "streamed"):
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
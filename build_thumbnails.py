@@ -0,0 +1,40 @@
+import argparse
+from concurrent.futures import as_completed
+
+from app import create_cli_app
+from models import ServiceAttachment, RepairAttachment
+from thumbnails import is_image_filename, prune_thumbnails, queue_thumbnails, thumbnail_format
+
+app = create_cli_app()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Render missing thumbnails for existing image attachments and remove those of deleted ones."
+    )
+    parser.add_argument("--format", choices=("webp", "jpeg"), default=thumbnail_format())
+    parser.add_argument("--no-prune", action="store_true", help="Keep thumbnails whose attachment is gone.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with app.app_context():
+        attachments = [
+            row
+            for model in (ServiceAttachment, RepairAttachment)
+            for row in model.query.with_entities(model.stored_name, model.original_name)
+        ]
+    stored_names = {stored_name for stored_name, original_name in attachments if is_image_filename(original_name)}
+    if not args.no_prune:
+        pruned = prune_thumbnails(app.config["UPLOAD_FOLDER"], [stored_name for stored_name, _ in attachments])
+        print(f"Removed {pruned} thumbnail(s) of deleted attachments.")
+    failed = 0
+    for future in as_completed(queue_thumbnails(app.config["UPLOAD_FOLDER"], sorted(stored_names), args.format)):
+        if future.exception() is not None:
+            failed += 1
+    print(f"Thumbnails checked for {len(stored_names)} image(s), {failed} failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import datetime as dt
+from collections import Counter
+
+from sqlalchemy import insert, select
+
+from db import db
+from due import record_checkins
+from models import Equipment, EquipmentCheckIn
+
+CHECKIN_BATCH_LIMIT = 1000
+MAX_CLIENT_ID_LENGTH = 64
+
+
+def parse_recorded_at(value, now):
+    """When the device took the reading, as naive UTC; future clocks are clamped to now."""
+    if value is None:
+        return now
+    if not isinstance(value, str):
+        raise ValueError("recorded_at must be an ISO 8601 string.")
+    try:
+        recorded_at = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("recorded_at must be an ISO 8601 string.") from None
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return min(recorded_at, now)
+
+
+def parse_checkin(item, now):
+    if not isinstance(item, dict):
+        raise ValueError("Each check-in must be an object.")
+    client_id = item.get("client_id")
+    if not isinstance(client_id, str) or not client_id.strip() or len(client_id) > MAX_CLIENT_ID_LENGTH:
+        raise ValueError(f"client_id must be a non-empty string of at most {MAX_CLIENT_ID_LENGTH} characters.")
+    token = item.get("token")
+    if not isinstance(token, str) or not token:
+        raise ValueError("token is required.")
+    mileage = item.get("mileage")
+    if mileage is not None:
+        if isinstance(mileage, bool) or not isinstance(mileage, (int, str)):
+            raise ValueError("mileage must be a whole number.")
+        try:
+            mileage = int(mileage)
+        except ValueError:
+            raise ValueError("mileage must be a whole number.") from None
+        if mileage < 0:
+            raise ValueError("mileage cannot be negative.")
+    issues = item.get("issues")
+    if issues is not None and not isinstance(issues, str):
+        raise ValueError("issues must be a string.")
+    return {
+        "client_id": client_id.strip(),
+        "token": token,
+        "mileage": mileage,
+        "issues": (issues or "").strip() or None,
+        "created_at": parse_recorded_at(item.get("recorded_at"), now),
+    }
+
+
+def ingest_checkins(items, now=None):
+    """Validate and store a batch of device check-ins without committing.
+
+    Tokens and already-stored client ids are each resolved in one query and
+    the new rows go in as one bulk insert. Returns a result per item, in
+    order, and a Counter of created check-ins per machine.
+    """
+    now = now or dt.datetime.utcnow()
+    results = [None] * len(items)
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, parse_checkin(item, now)))
+        except ValueError as exc:
+            client_id = item.get("client_id") if isinstance(item, dict) else None
+            results[index] = {"client_id": client_id, "status": "rejected", "error": str(exc)}
+
+    tokens = {checkin["token"] for _, checkin in parsed}
+    equipment_by_token = {
+        equipment.qr_token: equipment
+        for equipment in Equipment.query.filter(Equipment.qr_token.in_(tokens))
+    } if tokens else {}
+    client_ids = {checkin["client_id"] for _, checkin in parsed}
+    stored = set(
+        db.session.execute(
+            select(EquipmentCheckIn.client_id, EquipmentCheckIn.equipment_id)
+            .where(EquipmentCheckIn.client_id.in_(client_ids))
+        ).all()
+    ) if client_ids else set()
+
+    rows = []
+    readings = []
+    created = Counter()
+    for index, checkin in parsed:
+        client_id = checkin["client_id"]
+        equipment = equipment_by_token.get(checkin["token"])
+        if equipment is None:
+            results[index] = {"client_id": client_id, "status": "rejected", "error": "Unknown check-in token."}
+            continue
+        key = (client_id, equipment.id)
+        if key in stored:
+            results[index] = {"client_id": client_id, "status": "duplicate"}
+            continue
+        stored.add(key)
+        rows.append(
+            {
+                "equipment_id": equipment.id,
+                "client_id": client_id,
+                "mileage": checkin["mileage"],
+                "issues": checkin["issues"],
+                "created_at": checkin["created_at"],
+            }
+        )
+        if checkin["mileage"] is not None:
+            readings.append((equipment, checkin["mileage"], checkin["created_at"]))
+        created[equipment] += 1
+        results[index] = {"client_id": client_id, "status": "created"}
+
+    if readings:
+        equipment_by_id = {equipment.id: equipment for equipment, _, _ in readings}
+        for equipment_id, due in record_checkins(readings).items():
+            # The latest reading by time wins, even when an offline backlog arrives after newer check-ins.
+            equipment_by_id[equipment_id].mileage = due.last_mileage
+    if rows:
+        # render_nulls keeps every row the same shape, so this is one executemany rather than a statement per shape.
+        db.session.execute(insert(EquipmentCheckIn).execution_options(render_nulls=True), rows)
+    return results, created
@@ -1,4 +1,5 @@
-from app import app, db
+from app import create_cli_app
+from db import db
 from models import (
     AdminUser,
     Equipment,
@@ -13,6 +14,8 @@ from models import (
 )
 import os
 
+app = create_cli_app()
+
 # Ensure instance directory exists
 instance_dir = os.path.join(os.path.dirname(__file__), 'instance')
 os.makedirs(instance_dir, exist_ok=True)
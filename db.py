@@ -1,7 +1,80 @@
 # db.py
-from flask_sqlalchemy import SQLAlchemy
+from functools import partial
 import os
 
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 db = SQLAlchemy()
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def database_uri():
+    return os.environ.get("DATABASE_URL") or "sqlite:///" + os.path.join(basedir, "db.db")
+
+
+def sqlite_pragmas():
+    """PRAGMAs applied to every new SQLite connection, overridable from the environment.
+
+    WAL lets QR check-ins write while dashboards and reports read, and
+    synchronous=NORMAL is durable under WAL while skipping the per-commit fsync.
+    """
+    return [
+        ("journal_mode", os.environ.get("SQLITE_JOURNAL_MODE", "WAL")),
+        ("synchronous", os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")),
+        ("busy_timeout", _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        # Negative values are KiB rather than pages.
+        ("cache_size", -_env_int("SQLITE_CACHE_SIZE_KB", 64 * 1024)),
+        ("mmap_size", _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        ("temp_store", "MEMORY"),
+    ]
+
+
+def apply_sqlite_pragmas(pragmas, dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def engine_options(uri=None):
+    """SQLAlchemy engine/pool options read from DB_POOL_* environment variables."""
+    options = {
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "false").lower() == "true",
+    }
+    for option, env_name in (
+        ("pool_size", "DB_POOL_SIZE"),
+        ("max_overflow", "DB_MAX_OVERFLOW"),
+        ("pool_timeout", "DB_POOL_TIMEOUT"),
+        ("pool_recycle", "DB_POOL_RECYCLE"),
+    ):
+        value = _env_int(env_name, None)
+        if value is not None:
+            options[option] = value
+    if (uri or database_uri()).startswith("sqlite"):
+        # Matches busy_timeout so the driver's own lock wait never gives up first.
+        options["connect_args"] = {"timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000}
+    return options
+
+
+def listen_sqlite_pragmas(engine, pragmas=None):
+    if engine.dialect.name != "sqlite":
+        return
+    event.listen(engine, "connect", partial(apply_sqlite_pragmas, pragmas or sqlite_pragmas()))
+
+
+def configure_database(app):
+    app.config.setdefault("SQLALCHEMY_DATABASE_URI", database_uri())
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            listen_sqlite_pragmas(engine)
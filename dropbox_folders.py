@@ -0,0 +1,265 @@
+import datetime as dt
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+
+from db import db
+from models import DropboxFolderJob
+
+DROPBOX_API_BASE = "https://api.dropboxapi.com/2"
+
+# Outcome of one folder creation; ``retry_after`` is the server's hint in seconds.
+FolderOutcome = namedtuple("FolderOutcome", ["ok", "error", "transient", "retry_after"])
+
+CREATED = FolderOutcome(True, None, False, None)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def dropbox_settings():
+    return {
+        "token": os.environ.get("DROPBOX_ACCESS_TOKEN"),
+        "api_base": (os.environ.get("DROPBOX_API_BASE") or DROPBOX_API_BASE).rstrip("/"),
+        "timeout": float(os.environ.get("DROPBOX_TIMEOUT", "10")),
+        "batch_size": int(os.environ.get("DROPBOX_BATCH_SIZE", "100")),
+        "max_retries": int(os.environ.get("DROPBOX_MAX_RETRIES", "5")),
+        "backoff": float(os.environ.get("DROPBOX_RETRY_BACKOFF", "2.0")),
+        "poll_interval": float(os.environ.get("DROPBOX_POLL_INTERVAL", "30")),
+    }
+
+
+def _sanitize_dropbox_component(value):
+    text = (value or "").strip()
+    if not text:
+        return ""
+    text = re.sub(r"[\\/]+", "-", text)
+    text = re.sub(r"[\x00-\x1f\x7f]+", "", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text[:150].strip()
+
+
+def build_folder_path(equipment):
+    base_path = (os.environ.get("DROPBOX_BASE_PATH") or "").strip()
+    if base_path and not base_path.startswith("/"):
+        base_path = "/" + base_path
+    base_path = base_path.rstrip("/")
+    project_name = _sanitize_dropbox_component(equipment.code or "")
+    if not project_name:
+        project_name = f"Equipment {equipment.id}"
+    folder_name = f"{equipment.id} - {project_name}"
+    if base_path:
+        return f"{base_path}/{folder_name}"
+    return f"/{folder_name}"
+
+
+def get_client(settings):
+    """One pooled client per process so keep-alive connections are reused."""
+    # httpx is imported here rather than at module level: only the outbox drain talks to Dropbox.
+    import httpx
+
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                base_url=settings["api_base"],
+                timeout=settings["timeout"],
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+            )
+        return _client
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def _post(client, settings, endpoint, payload):
+    return client.post(endpoint, json=payload, headers={"Authorization": f"Bearer {settings['token']}"})
+
+
+def _status_outcome(response):
+    """429 and 5xx are worth retrying; other 4xx responses are not."""
+    retry_after = None
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            pass
+    transient = response.status_code == 429 or response.status_code >= 500
+    return FolderOutcome(False, f"status:{response.status_code}", transient, retry_after)
+
+
+def _write_error_outcome(error):
+    """Map a Dropbox WriteError; an existing folder counts as created."""
+    tag = error.get(".tag")
+    if tag == "conflict" and (error.get("conflict") or {}).get(".tag") == "folder":
+        return CREATED
+    return FolderOutcome(False, f"failure:{tag}", tag == "too_many_write_operations", None)
+
+
+def create_folder(client, settings, path):
+    import httpx
+
+    try:
+        response = _post(client, settings, "/files/create_folder_v2", {"path": path, "autorename": False})
+    except httpx.HTTPError as exc:
+        return FolderOutcome(False, f"request_failed:{exc}", True, None)
+
+    if response.status_code == 409:
+        try:
+            data = response.json()
+        except ValueError:
+            return FolderOutcome(False, "conflict_unknown", False, None)
+        error_summary = (data.get("error_summary") or "").lower()
+        if "path/conflict/folder" in error_summary:
+            return CREATED
+        return FolderOutcome(False, f"conflict:{error_summary}", False, None)
+
+    if response.status_code >= 400:
+        return _status_outcome(response)
+
+    return CREATED
+
+
+def create_folder_batch(client, settings, paths, check_interval=1.0, max_checks=30):
+    """Create several folders in one call, following up on an async job if Dropbox starts one."""
+    import httpx
+
+    try:
+        response = _post(
+            client,
+            settings,
+            "/files/create_folder_batch",
+            {"paths": paths, "autorename": False, "force_async": False},
+        )
+        checks = 0
+        job_id = None
+        while True:
+            if response.status_code >= 400:
+                return [_status_outcome(response)] * len(paths)
+            data = response.json()
+            tag = data.get(".tag")
+            if tag == "complete":
+                break
+            if tag == "failed":
+                error = (data.get("failed") or {}).get(".tag")
+                return [FolderOutcome(False, f"batch_failed:{error}", False, None)] * len(paths)
+            if tag == "async_job_id":
+                job_id = data["async_job_id"]
+            elif tag != "in_progress" or job_id is None:
+                return [FolderOutcome(False, f"unexpected:{tag}", True, None)] * len(paths)
+            if checks >= max_checks:
+                return [FolderOutcome(False, "batch_timeout", True, None)] * len(paths)
+            checks += 1
+            time.sleep(check_interval)
+            response = _post(client, settings, "/files/create_folder_batch/check", {"async_job_id": job_id})
+    except httpx.HTTPError as exc:
+        return [FolderOutcome(False, f"request_failed:{exc}", True, None)] * len(paths)
+    except (ValueError, KeyError):
+        return [FolderOutcome(False, "bad_response", True, None)] * len(paths)
+
+    entries = data.get("entries") or []
+    if len(entries) != len(paths):
+        return [FolderOutcome(False, "bad_response", True, None)] * len(paths)
+    return [
+        CREATED if entry.get(".tag") == "success" else _write_error_outcome((entry.get("failure") or {}).get("path") or {})
+        for entry in entries
+    ]
+
+
+def enqueue_folder(equipment):
+    """Queue folder creation in the caller's transaction; the worker picks it up after commit."""
+    job = DropboxFolderJob(equipment_id=equipment.id, path=build_folder_path(equipment), status="pending", attempts=0)
+    db.session.add(job)
+    return job
+
+
+def _apply_outcome(job, outcome, settings, now):
+    job.attempts += 1
+    job.error = outcome.error
+    if outcome.ok:
+        job.status = "done"
+    elif outcome.transient and job.attempts <= settings["max_retries"]:
+        delay = max(settings["backoff"] * 2 ** (job.attempts - 1), outcome.retry_after or 0)
+        job.next_attempt_at = now + dt.timedelta(seconds=delay)
+    else:
+        job.status = "failed"
+        current_app.logger.warning("Dropbox folder not created for equipment %s (%s): %s", job.equipment_id, job.path, job.error)
+
+
+def process_outbox(settings=None, client=None):
+    """Drain every due job, ``batch_size`` paths per API call.
+
+    Returns counts of folders created, jobs rescheduled and jobs given up on.
+    """
+    settings = settings or dropbox_settings()
+    counts = {"created": 0, "retrying": 0, "failed": 0}
+    if not settings["token"]:
+        return counts
+    client = client or get_client(settings)
+    while True:
+        now = dt.datetime.utcnow()
+        jobs = (
+            DropboxFolderJob.query.filter(
+                DropboxFolderJob.status == "pending",
+                DropboxFolderJob.next_attempt_at <= now,
+            )
+            .order_by(DropboxFolderJob.next_attempt_at, DropboxFolderJob.id)
+            .limit(settings["batch_size"])
+            .all()
+        )
+        if not jobs:
+            return counts
+        if len(jobs) == 1:
+            outcomes = [create_folder(client, settings, jobs[0].path)]
+        else:
+            outcomes = create_folder_batch(client, settings, [job.path for job in jobs])
+        for job, outcome in zip(jobs, outcomes):
+            _apply_outcome(job, outcome, settings, now)
+            if job.status == "done":
+                counts["created"] += 1
+            elif job.status == "failed":
+                counts["failed"] += 1
+            else:
+                counts["retrying"] += 1
+        db.session.commit()
+
+
+class OutboxWorker:
+    """Background thread that drains the outbox when woken and every poll interval."""
+
+    def __init__(self, app):
+        self.app = app
+        self.wake = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the thread if it is not running; it drains once straight away, then every poll interval."""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.wake.set()
+                self.thread = threading.Thread(target=self._run, name="dropbox-outbox", daemon=True)
+                self.thread.start()
+
+    def notify(self):
+        self.start()
+        self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait(timeout=dropbox_settings()["poll_interval"])
+            self.wake.clear()
+            try:
+                with self.app.app_context():
+                    process_outbox()
+            except Exception:
+                self.app.logger.exception("Dropbox outbox drain failed")
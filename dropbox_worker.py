@@ -0,0 +1,43 @@
+import argparse
+import time
+
+from app import create_cli_app
+from db import db
+from dropbox_folders import close_client, dropbox_settings, process_outbox
+from models import DropboxFolderJob
+
+app = create_cli_app()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create queued Dropbox folders for new equipment.")
+    parser.add_argument("--once", action="store_true", help="Drain the outbox once and exit instead of polling.")
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue jobs that previously gave up.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    settings = dropbox_settings()
+    if not settings["token"]:
+        raise SystemExit("DROPBOX_ACCESS_TOKEN must be set.")
+    try:
+        with app.app_context():
+            db.create_all()
+            if args.retry_failed:
+                requeued = DropboxFolderJob.query.filter_by(status="failed").update({"status": "pending", "attempts": 0})
+                db.session.commit()
+                print(f"Requeued {requeued} failed job(s).")
+            while True:
+                counts = process_outbox(settings)
+                if any(counts.values()):
+                    print(f"{counts['created']} created, {counts['retrying']} retrying, {counts['failed']} failed.")
+                if args.once:
+                    break
+                time.sleep(settings["poll_interval"])
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    main()
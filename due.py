@@ -0,0 +1,233 @@
+import datetime as dt
+import math
+import os
+import re
+
+from sqlalchemy import select
+
+from db import db
+from models import Equipment, EquipmentCheckIn, EquipmentDue, Service
+
+DUE_SOON_DAYS = int(os.environ.get("DUE_SOON_DAYS", "14"))
+
+_EPOCH = dt.datetime(2000, 1, 1)
+
+
+def _days(moment):
+    if isinstance(moment, dt.date) and not isinstance(moment, dt.datetime):
+        moment = dt.datetime.combine(moment, dt.time())
+    return (moment.replace(tzinfo=None) - _EPOCH).total_seconds() / 86400
+
+
+# A number only counts as a mileage interval with a distance unit after it; "500-hour check"
+# or "every 6 months" are not distances and must not be projected from check-in mileage.
+_MILEAGE_INTERVAL = re.compile(r"(\d[\d,]*)\s*(?:km|kms|kilomet(?:er|re)s?|mi|miles?)\b", re.IGNORECASE)
+
+
+def parse_service_interval(text):
+    """Read the mileage interval out of free text like "every 5,000 km"; None unless it names a distance."""
+    match = _MILEAGE_INTERVAL.search(text or "")
+    if not match:
+        return None
+    value = int(match.group(1).replace(",", ""))
+    return value or None
+
+
+def mileage_rate(due):
+    """Mileage per day from the running least-squares fit, or None if unknown."""
+    n = due.reading_count
+    if n < 2:
+        return None
+    denominator = n * due.sum_days_sq - due.sum_days ** 2
+    if denominator <= 0:
+        return None
+    return (n * due.sum_days_mileage - due.sum_days * due.sum_mileage) / denominator
+
+
+def recompute_due(due):
+    due.projected_due_date = None
+    if due.due_mileage is not None and due.last_mileage is not None and due.last_reading_at is not None:
+        remaining = due.due_mileage - due.last_mileage
+        reading_day = due.last_reading_at.date()
+        if remaining <= 0:
+            due.projected_due_date = reading_day
+        else:
+            rate = mileage_rate(due)
+            if rate and rate > 0:
+                days = remaining / rate
+                # Rates near zero would project centuries ahead; those fall outside any window anyway.
+                if days < 3650:
+                    due.projected_due_date = reading_day + dt.timedelta(days=math.ceil(days))
+    candidates = [day for day in (due.next_service_date, due.projected_due_date) if day is not None]
+    due.due_date = min(candidates) if candidates else None
+
+
+def add_reading(due, mileage, at):
+    days = _days(at)
+    due.reading_count += 1
+    due.sum_days += days
+    due.sum_mileage += mileage
+    due.sum_days_sq += days * days
+    due.sum_days_mileage += days * mileage
+    if due.last_reading_at is None or at.replace(tzinfo=None) >= due.last_reading_at.replace(tzinfo=None):
+        due.last_mileage = mileage
+        due.last_reading_at = at
+
+
+def _new_due(equipment):
+    return EquipmentDue(
+        equipment_id=equipment.id,
+        admin_user_id=equipment.admin_user_id,
+        service_interval=parse_service_interval(equipment.service_required),
+        last_service_on=equipment.last_service_date,
+        reading_count=0,
+        sum_days=0.0,
+        sum_mileage=0.0,
+        sum_days_sq=0.0,
+        sum_days_mileage=0.0,
+    )
+
+
+def _set_baseline(due, mileage, at):
+    """Without a logged service, count the interval from the first known mileage."""
+    if due.last_mileage is None:
+        due.last_mileage = mileage
+        due.last_reading_at = at
+    if due.service_interval:
+        due.due_mileage = mileage + due.service_interval
+
+
+def _get_due(equipment):
+    due = db.session.get(EquipmentDue, equipment.id)
+    if due is None:
+        due = rebuild_equipment_due(equipment)
+    return due
+
+
+def record_equipment(equipment):
+    """Start tracking a newly added machine."""
+    due = _new_due(equipment)
+    if equipment.mileage is not None:
+        _set_baseline(due, equipment.mileage, dt.datetime.utcnow())
+    recompute_due(due)
+    db.session.add(due)
+    return due
+
+
+def record_checkin(equipment, mileage, at):
+    """Fold one check-in reading into the fit and reproject the due date."""
+    if mileage is None:
+        return None
+    due = _get_due(equipment)
+    add_reading(due, mileage, at)
+    recompute_due(due)
+    return due
+
+
+def record_checkins(readings):
+    """Fold a batch of ``(equipment, mileage, at)`` readings in, loading the due rows in one query.
+
+    Must run before the batch's check-in rows are inserted, since a missing
+    due row is rebuilt from the stored history.
+    """
+    equipment_by_id = {equipment.id: equipment for equipment, _, _ in readings}
+    dues = {
+        due.equipment_id: due
+        for due in db.session.scalars(select(EquipmentDue).where(EquipmentDue.equipment_id.in_(equipment_by_id)))
+    }
+    for equipment_id, equipment in equipment_by_id.items():
+        if equipment_id not in dues:
+            dues[equipment_id] = rebuild_equipment_due(equipment)
+    for equipment, mileage, at in sorted(readings, key=lambda reading: reading[2].replace(tzinfo=None)):
+        add_reading(dues[equipment.id], mileage, at)
+    for due in dues.values():
+        recompute_due(due)
+    return dues
+
+
+def record_service(equipment, service):
+    """Reset the date- and mileage-based due points if this is the latest service."""
+    due = _get_due(equipment)
+    if due.last_service_on is not None and service.date < due.last_service_on:
+        return due
+    due.last_service_on = service.date
+    due.next_service_date = service.next_service
+    baseline = service.mileage if service.mileage is not None else due.last_mileage
+    due.due_mileage = baseline + due.service_interval if baseline is not None and due.service_interval else None
+    if service.mileage is not None and (due.last_mileage is None or service.mileage >= due.last_mileage):
+        due.last_mileage = service.mileage
+        due.last_reading_at = dt.datetime.combine(service.date, dt.time())
+    recompute_due(due)
+    return due
+
+
+def rebuild_equipment_due(equipment):
+    """Build a machine's due row from its full history (backfill and drift repair only)."""
+    due = db.session.get(EquipmentDue, equipment.id)
+    if due is not None:
+        db.session.delete(due)
+        db.session.flush()
+    due = _new_due(equipment)
+    db.session.add(due)
+    first_reading = None
+    readings = db.session.execute(
+        select(EquipmentCheckIn.mileage, EquipmentCheckIn.created_at)
+        .where(EquipmentCheckIn.equipment_id == equipment.id, EquipmentCheckIn.mileage.is_not(None))
+        .order_by(EquipmentCheckIn.created_at)
+        .execution_options(yield_per=1000)
+    )
+    for mileage, created_at in readings:
+        if first_reading is None:
+            first_reading = (mileage, created_at)
+        add_reading(due, mileage, created_at)
+    latest = (
+        Service.query.filter_by(equipment_id=equipment.id)
+        .order_by(Service.date.desc(), Service.id.desc())
+        .first()
+    )
+    if latest is not None:
+        due.last_service_on = None
+        return record_service(equipment, latest)
+    if first_reading is not None:
+        _set_baseline(due, *first_reading)
+    elif equipment.mileage is not None:
+        _set_baseline(due, equipment.mileage, dt.datetime.utcnow())
+    recompute_due(due)
+    return due
+
+
+def rebuild_due_index(only_missing=False, batch_size=500):
+    """Rebuild due rows for every machine, or only for machines that have none."""
+    last_id = 0
+    count = 0
+    while True:
+        query = Equipment.query.filter(Equipment.id > last_id)
+        if only_missing:
+            query = query.outerjoin(EquipmentDue, EquipmentDue.equipment_id == Equipment.id).filter(
+                EquipmentDue.equipment_id.is_(None)
+            )
+        batch = query.order_by(Equipment.id).limit(batch_size).all()
+        if not batch:
+            return count
+        for equipment in batch:
+            rebuild_equipment_due(equipment)
+        db.session.commit()
+        count += len(batch)
+        last_id = batch[-1].id
+
+
+def due_equipment_query(cutoff, admin_user_id=None):
+    """Machines due on or before ``cutoff``, soonest first, as one indexed range scan."""
+    query = (
+        select(Equipment, EquipmentDue)
+        .join(EquipmentDue, EquipmentDue.equipment_id == Equipment.id)
+        .where(EquipmentDue.due_date <= cutoff)
+    )
+    if admin_user_id is not None:
+        query = query.where(EquipmentDue.admin_user_id == admin_user_id)
+    return query.order_by(EquipmentDue.due_date, Equipment.id)
+
+
+def due_soon(admin_user_id, days=DUE_SOON_DAYS, limit=10):
+    cutoff = dt.datetime.utcnow().date() + dt.timedelta(days=days)
+    return db.session.execute(due_equipment_query(cutoff, admin_user_id).limit(limit)).all()
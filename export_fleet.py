@@ -0,0 +1,31 @@
+import argparse
+import os
+
+from app import create_cli_app
+from reports import FLEET_CHUNK_SIZE, iter_fleet_export
+
+app = create_cli_app()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export service and repair reports for a whole fleet.")
+    parser.add_argument("admin_user_id", type=int, help="Owner whose equipment should be exported.")
+    parser.add_argument("--format", choices=("zip", "csv"), default="zip", help="One ZIP of per-machine CSVs, or one combined CSV.")
+    parser.add_argument("--output", help="Destination file (default: fleet_<id>.<format>).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes used to render reports.")
+    parser.add_argument("--chunk-size", type=int, default=FLEET_CHUNK_SIZE, help="Machines loaded per batch of queries.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    output = args.output or f"fleet_{args.admin_user_id}.{args.format}"
+    with app.app_context():
+        with open(output, "wb") as handle:
+            for chunk in iter_fleet_export(args.admin_user_id, args.format, args.workers, args.chunk_size):
+                handle.write(chunk)
+    print(f"Fleet export written to {output}.")
+
+
+if __name__ == "__main__":
+    main()
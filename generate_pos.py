@@ -0,0 +1,68 @@
+import argparse
+import os
+import time
+
+from sqlalchemy import select
+
+from app import create_cli_app
+from db import db
+from models import Equipment, Repair, RepairCostItem, Service, ServiceCostItem
+from purchase_orders import DEFAULT_PO_TEMPLATE, PO_TEMPLATES, PO_WORKERS, po_data, po_filename, write_pos
+from reports import cost_items_by_parent
+
+app = create_cli_app()
+
+KINDS = {
+    "repair": (Repair, RepairCostItem, RepairCostItem.repair_id),
+    "service": (Service, ServiceCostItem, ServiceCostItem.service_id),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate purchase-order workbooks for many services or repairs.")
+    parser.add_argument("--kind", choices=tuple(KINDS), default="repair")
+    parser.add_argument("--ids", type=int, nargs="+", help="Record ids (default: every record with cost items).")
+    parser.add_argument("--equipment-id", type=int, help="Only records for this machine.")
+    parser.add_argument("--template", choices=tuple(PO_TEMPLATES), default=os.environ.get("PO_TEMPLATE", DEFAULT_PO_TEMPLATE))
+    parser.add_argument("--output-dir", default="purchase_orders")
+    parser.add_argument("--workers", type=int, default=min(PO_WORKERS, os.cpu_count() or 1),
+                        help="Worker processes used to write workbooks.")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Records loaded per batch of queries.")
+    return parser.parse_args()
+
+
+def iter_jobs(args):
+    model, item_model, parent_column = KINDS[args.kind]
+    query = select(model, Equipment).join(Equipment, Equipment.id == model.equipment_id)
+    if args.ids:
+        query = query.where(model.id.in_(args.ids))
+    if args.equipment_id:
+        query = query.where(model.equipment_id == args.equipment_id)
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            query.where(model.id > last_id).order_by(model.id).limit(args.chunk_size)
+        ).all()
+        if not rows:
+            return
+        items = cost_items_by_parent(item_model, parent_column, [record.id for record, _ in rows])
+        for record, equipment in rows:
+            if args.ids or items.get(record.id):
+                path = os.path.join(args.output_dir, po_filename(args.kind, record, equipment))
+                yield args.template, po_data(args.kind, record, equipment, items.get(record.id, [])), path
+        last_id = rows[-1][0].id
+
+
+def main():
+    args = parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+    started = time.perf_counter()
+    with app.app_context():
+        jobs = list(iter_jobs(args))
+    written = sum(1 for _ in write_pos(jobs, args.workers))
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} purchase order(s) to {args.output_dir} in {elapsed:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
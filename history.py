@@ -0,0 +1,59 @@
+import datetime as dt
+
+from sqlalchemy import and_, or_
+
+from models import EquipmentCheckIn, Repair, Service
+
+HISTORY_PAGE_SIZE = 25
+
+# Column each history is ordered by, newest first, with the id as tiebreaker.
+# Every one is covered by an (equipment_id, <column>) index, whose implicit
+# trailing rowid makes the keyset an index range scan.
+HISTORY_KEYS = {
+    Service: (Service.date, dt.date.fromisoformat),
+    Repair: (Repair.date, dt.date.fromisoformat),
+    EquipmentCheckIn: (EquipmentCheckIn.created_at, dt.datetime.fromisoformat),
+}
+
+
+def encode_cursor(value, row_id):
+    return f"{value.isoformat()}|{row_id}"
+
+
+def decode_cursor(model, cursor):
+    """The (key, id) a page starts after; raises ValueError for a malformed cursor."""
+    value, _, row_id = cursor.rpartition("|")
+    return HISTORY_KEYS[model][1](value), int(row_id)
+
+
+def history_page(model, equipment_id, cursor=None, page_size=HISTORY_PAGE_SIZE):
+    """One page of a machine's history and the cursor of the next page, or None on the last one.
+
+    The page costs the same however long the history is: it seeks past the
+    cursor instead of counting through an offset.
+    """
+    column = HISTORY_KEYS[model][0]
+    query = model.query.filter_by(equipment_id=equipment_id)
+    if cursor:
+        value, row_id = decode_cursor(model, cursor)
+        query = query.filter(or_(column < value, and_(column == value, model.id < row_id)))
+    rows = query.order_by(column.desc(), model.id.desc()).limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(getattr(rows[-1], column.key), rows[-1].id)
+
+
+def attachments_by_parent(attachment_model, parent_column, parent_ids):
+    grouped = {}
+    if not parent_ids:
+        return grouped
+    attachments = (
+        attachment_model.query
+        .filter(parent_column.in_(parent_ids))
+        .order_by(attachment_model.uploaded_at.desc())
+        .all()
+    )
+    for attachment in attachments:
+        grouped.setdefault(getattr(attachment, parent_column.key), []).append(attachment)
+    return grouped
@@ -0,0 +1,71 @@
+import argparse
+import datetime as dt
+import os
+import time
+
+from app import create_cli_app
+from db import db
+from models import Equipment
+from quotes import QUOTE_WORKERS, find_quote_files, iter_parsed_quotes, store_quotes
+from response_cache import invalidate_owner_cache
+
+app = create_cli_app()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import PO and quote line items as service or repair cost items.")
+    parser.add_argument("paths", nargs="+", help="Quote files (.xlsx or .pdf) or directories to search.")
+    parser.add_argument("--equipment-id", type=int, required=True, help="Machine the records are added to.")
+    parser.add_argument("--kind", choices=("repair", "service"), default="repair", help="Record type created per file.")
+    parser.add_argument("--date", type=dt.date.fromisoformat, help="Record date, YYYY-MM-DD (default: today, UTC).")
+    parser.add_argument("--workers", type=int, default=min(QUOTE_WORKERS, os.cpu_count() or 1),
+                        help="Worker processes used to parse files.")
+    parser.add_argument("--batch-size", type=int, default=200, help="Files stored per transaction.")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and report without storing anything.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    paths = find_quote_files(args.paths)
+    started = time.perf_counter()
+    imported = items = failed = 0
+    with app.app_context():
+        equipment = db.session.get(Equipment, args.equipment_id)
+        if equipment is None:
+            raise SystemExit(f"Equipment {args.equipment_id} was not found.")
+        owner_id = equipment.admin_user_id
+        batch = []
+        for quote in iter_parsed_quotes(paths, args.workers):
+            if "error" in quote:
+                failed += 1
+                print(f"Skipped {quote['source']}: {quote['error']}")
+                continue
+            mismatched = sum(item["mismatch"] for item in quote["items"])
+            if mismatched:
+                print(f"Check {quote['source']}: quantity x unit price is not the line total "
+                      f"on {mismatched} line(s).")
+            batch.append(quote)
+            if len(batch) >= args.batch_size:
+                items += sum(len(quote["items"]) for quote in batch)
+                imported += len(batch)
+                if not args.dry_run:
+                    store_quotes(batch, equipment, args.kind, args.date)
+                    db.session.commit()
+                    invalidate_owner_cache(owner_id)
+                batch = []
+        if batch:
+            items += sum(len(quote["items"]) for quote in batch)
+            imported += len(batch)
+            if not args.dry_run:
+                store_quotes(batch, equipment, args.kind, args.date)
+                db.session.commit()
+                invalidate_owner_cache(owner_id)
+    elapsed = time.perf_counter() - started
+    action = "Parsed" if args.dry_run else "Imported"
+    print(f"{action} {items} line item(s) from {imported} file(s), {failed} skipped, "
+          f"in {elapsed:.1f}s ({len(paths) / elapsed if elapsed else 0:.1f} files/s).")
+
+
+if __name__ == "__main__":
+    main()
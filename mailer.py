@@ -0,0 +1,170 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from collections import namedtuple
+from email.message import EmailMessage
+
+# One outcome per message handed to deliver().
+DeliveryResult = namedtuple("DeliveryResult", ["key", "recipient", "ok", "attempts", "error"])
+
+_STOP = object()
+
+
+def smtp_settings():
+    settings = {
+        "host": os.environ.get("SMTP_HOST"),
+        "port": int(os.environ.get("SMTP_PORT", "587")),
+        "username": os.environ.get("SMTP_USER"),
+        "password": os.environ.get("SMTP_PASSWORD"),
+        "use_tls": os.environ.get("SMTP_TLS", "true").lower() == "true",
+        "timeout": float(os.environ.get("SMTP_TIMEOUT", "30")),
+    }
+    settings["sender"] = os.environ.get("SMTP_FROM") or settings["username"]
+    if not settings["host"] or not settings["sender"]:
+        raise RuntimeError("SMTP_HOST and SMTP_FROM (or SMTP_USER) must be set.")
+    return settings
+
+
+def build_message(settings, to_address, subject, body):
+    message = EmailMessage()
+    message["From"] = settings["sender"]
+    message["To"] = to_address
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+def is_transient(exc):
+    """4xx replies and dropped connections are worth retrying; 5xx replies are not."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    return isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+
+class SMTPConnection:
+    """A lazily opened, authenticated SMTP session reused across messages."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.server = None
+
+    def _open(self):
+        server = smtplib.SMTP(self.settings["host"], self.settings["port"], timeout=self.settings["timeout"])
+        try:
+            if self.settings["use_tls"]:
+                server.starttls()
+            if self.settings["username"] and self.settings["password"]:
+                server.login(self.settings["username"], self.settings["password"])
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+
+    def send(self, message):
+        if self.server is None:
+            self._open()
+        try:
+            self.server.send_message(message)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self.reset()
+            raise
+
+    def reset(self):
+        if self.server is not None:
+            try:
+                self.server.close()
+            finally:
+                self.server = None
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.reset()
+
+
+def _send_with_retry(connection, message, retries, backoff):
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            connection.send(message)
+            return attempts, None
+        except Exception as exc:
+            if attempts > retries or not is_transient(exc):
+                return attempts, f"{type(exc).__name__}: {exc}"
+            connection.reset()
+            time.sleep(backoff * 2 ** (attempts - 1))
+
+
+def _worker(settings, jobs, results, retries, backoff):
+    connection = SMTPConnection(settings)
+    try:
+        while True:
+            job = jobs.get()
+            if job is _STOP:
+                return
+            key, message = job
+            attempts, error = _send_with_retry(connection, message, retries, backoff)
+            results.put(DeliveryResult(key, message["To"], error is None, attempts, error))
+    finally:
+        connection.close()
+        results.put(_STOP)
+
+
+def deliver(messages, settings=None, workers=None, retries=None, backoff=None):
+    """Send ``(key, EmailMessage)`` pairs over a small pool of persistent connections.
+
+    Yields a DeliveryResult for every message as soon as it is known, so the
+    caller can record outcomes while the rest are still being sent.
+    """
+    settings = settings or smtp_settings()
+    workers = workers or int(os.environ.get("SMTP_POOL_SIZE", "4"))
+    retries = int(os.environ.get("SMTP_MAX_RETRIES", "3")) if retries is None else retries
+    backoff = float(os.environ.get("SMTP_RETRY_BACKOFF", "1.0")) if backoff is None else backoff
+
+    jobs = queue.Queue(maxsize=workers * 4)
+    results = queue.Queue()
+    threads = [
+        threading.Thread(target=_worker, args=(settings, jobs, results, retries, backoff), daemon=True)
+        for _ in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    def drain(block=False):
+        nonlocal finished
+        while True:
+            try:
+                result = results.get(block=block)
+            except queue.Empty:
+                return
+            if result is _STOP:
+                finished += 1
+                if finished == len(threads):
+                    return
+                continue
+            yield result
+            block = False
+
+    # Jobs are fed from the caller's thread so ``messages`` may be a generator
+    # that reads from the database inside the caller's app context.
+    finished = 0
+    for job in messages:
+        while True:
+            try:
+                jobs.put(job, timeout=0.05)
+                break
+            except queue.Full:
+                yield from drain()
+        yield from drain()
+    for _ in threads:
+        jobs.put(_STOP)
+    while finished < len(threads):
+        yield from drain(block=True)
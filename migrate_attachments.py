@@ -0,0 +1,57 @@
+import os
+
+from app import create_cli_app
+from db import db
+from attachments import add_blob_reference, blob_path, save_blob
+from models import ServiceAttachment, RepairAttachment
+
+app = create_cli_app()
+
+
+def rehome(attachment_model, root, batch_size=500):
+    """Move flat ``stored_name`` files into the content-addressed store."""
+    moved = missing = 0
+    last_id = 0
+    while True:
+        batch = (
+            attachment_model.query.filter(
+                attachment_model.id > last_id,
+                ~attachment_model.stored_name.contains("/"),
+            )
+            .order_by(attachment_model.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return moved, missing
+        legacy_paths = []
+        for attachment in batch:
+            legacy_path = os.path.join(root, attachment.stored_name)
+            if not os.path.exists(legacy_path):
+                print(f"Missing file for {attachment_model.__tablename__} {attachment.id}: {attachment.stored_name}")
+                missing += 1
+                continue
+            with open(legacy_path, "rb") as handle:
+                sha256, size = save_blob(handle, root)
+            add_blob_reference(sha256, size)
+            attachment.stored_name = blob_path(sha256)
+            legacy_paths.append(legacy_path)
+            moved += 1
+        db.session.commit()
+        # Flat files go only once their rows point at the new blobs.
+        for legacy_path in legacy_paths:
+            os.remove(legacy_path)
+        last_id = batch[-1].id
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        root = app.config["UPLOAD_FOLDER"]
+        for attachment_model in (ServiceAttachment, RepairAttachment):
+            moved, missing = rehome(attachment_model, root)
+            print(f"{attachment_model.__tablename__}: rehomed {moved} file(s), {missing} missing.")
+
+
+if __name__ == "__main__":
+    main()
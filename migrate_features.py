@@ -1,9 +1,12 @@
-﻿import os
-import secrets
+﻿import secrets
 import sqlite3
 
-from app import app, db
-from db import basedir
+from app import create_cli_app
+from db import db
+from due import rebuild_due_index
+from search import rebuild_search_index, search_available, search_index_exists
+
+app = create_cli_app()
 
 
 def table_exists(conn, table_name):
@@ -24,8 +27,28 @@ def add_column(conn, table_name, column_sql):
     conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_sql}")
 
 
+def ensure_indexes():
+    """Create any model index missing from an existing database."""
+    created = []
+    with db.engine.begin() as connection:
+        existing = {
+            row[0]
+            for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='index'")
+        }
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                index.create(connection)
+                created.append(index.name)
+        if created:
+            connection.exec_driver_sql("ANALYZE")
+    return created
+
+
 def migrate():
-    db_path = os.path.join(basedir, "db.db")
+    with app.app_context():
+        db_path = db.engine.url.database
     conn = sqlite3.connect(db_path)
     try:
         if table_exists(conn, "admin_user") and not column_exists(conn, "admin_user", "role"):
@@ -36,6 +59,33 @@ def migrate():
             add_column(conn, "equipment", "qr_token TEXT")
             conn.execute("UPDATE equipment SET qr_token=NULL")
 
+        if table_exists(conn, "equipment_check_in") and not column_exists(conn, "equipment_check_in", "client_id"):
+            add_column(conn, "equipment_check_in", "client_id TEXT")
+
+        if table_exists(conn, "audit_log") and not column_exists(conn, "audit_log", "owner_id"):
+            add_column(conn, "audit_log", "owner_id INTEGER REFERENCES admin_user(id)")
+            # Entries about a machine or its records belong to its owner; everything else to whoever acted.
+            conn.execute(
+                """
+                UPDATE audit_log SET owner_id = COALESCE(
+                    CASE entity
+                        WHEN 'equipment' THEN (SELECT admin_user_id FROM equipment WHERE equipment.id = audit_log.entity_id)
+                        WHEN 'service' THEN (
+                            SELECT equipment.admin_user_id FROM service JOIN equipment ON equipment.id = service.equipment_id
+                            WHERE service.id = audit_log.entity_id
+                        )
+                        WHEN 'repair' THEN (
+                            SELECT equipment.admin_user_id FROM repair JOIN equipment ON equipment.id = repair.equipment_id
+                            WHERE repair.id = audit_log.entity_id
+                        )
+                    END,
+                    user_id
+                )
+                """
+            )
+            # Superseded by (owner_id, user_id, created_at).
+            conn.execute("DROP INDEX IF EXISTS ix_audit_log_user_id_created_at")
+
         if table_exists(conn, "equipment"):
             cursor = conn.execute("SELECT id FROM equipment WHERE qr_token IS NULL")
             rows = cursor.fetchall()
@@ -48,7 +98,16 @@ def migrate():
         conn.close()
 
     with app.app_context():
+        with db.engine.connect() as connection:
+            had_search_index = search_available() and search_index_exists(connection)
         db.create_all()
+        for index_name in ensure_indexes():
+            print(f"Created index {index_name}.")
+        backfilled = rebuild_due_index(only_missing=True)
+        if backfilled:
+            print(f"Backfilled due dates for {backfilled} machine(s).")
+        if search_available() and not had_search_index:
+            print(f"Indexed {rebuild_search_index()} document(s) for search.")
 
     print("Migration completed.")
 
@@ -2,7 +2,7 @@ from typing import Optional
 
 import datetime as dt
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import DateTime, ForeignKey, Date, Time
+from sqlalchemy import DateTime, ForeignKey, Date, Time, Index, UniqueConstraint
 from db import db
 
 class AdminUser(db.Model):
@@ -14,6 +14,10 @@ class AdminUser(db.Model):
     registration_date: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
 
 class Equipment(db.Model):
+    __table_args__ = (
+        Index("ix_equipment_admin_user_id_type_code", "admin_user_id", "type", "code"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     admin_user_id: Mapped[int] = mapped_column(ForeignKey("admin_user.id"), nullable=False)
     type: Mapped[str] = mapped_column(nullable=False)
@@ -27,6 +31,12 @@ class Equipment(db.Model):
     last_service_date: Mapped[Optional[dt.date]] = mapped_column(Date, nullable=True)
 
 class Service(db.Model):
+    # Ascending on purpose: SQLite walks the index backwards for newest-first
+    # history, and the implicit trailing rowid keeps (date, id) keyset order.
+    __table_args__ = (
+        Index("ix_service_equipment_id_date", "equipment_id", "date"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     equipment_id: Mapped[int] = mapped_column(ForeignKey("equipment.id"), nullable=False)
     date: Mapped[dt.date] = mapped_column(Date, nullable=False)
@@ -43,6 +53,10 @@ class Service_records(db.Model):
     issue_found: Mapped[Optional[str]] = mapped_column(nullable=True)
 
 class Repair(db.Model):
+    __table_args__ = (
+        Index("ix_repair_equipment_id_date", "equipment_id", "date"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     equipment_id: Mapped[int] = mapped_column(ForeignKey("equipment.id"), nullable=False)
     date: Mapped[dt.date] = mapped_column(Date, nullable=False)
@@ -60,18 +74,30 @@ class Repair_records(db.Model):
     comments: Mapped[Optional[str]] = mapped_column(nullable=True)
 
 class ServiceCostItem(db.Model):
+    __table_args__ = (
+        Index("ix_service_cost_item_service_id", "service_id"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     service_id: Mapped[int] = mapped_column(ForeignKey("service.id"), nullable=False)
     description: Mapped[str] = mapped_column(nullable=False)
     amount: Mapped[float] = mapped_column(nullable=False)
 
 class RepairCostItem(db.Model):
+    __table_args__ = (
+        Index("ix_repair_cost_item_repair_id", "repair_id"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     repair_id: Mapped[int] = mapped_column(ForeignKey("repair.id"), nullable=False)
     description: Mapped[str] = mapped_column(nullable=False)
     amount: Mapped[float] = mapped_column(nullable=False)
 
 class ServiceAttachment(db.Model):
+    __table_args__ = (
+        Index("ix_service_attachment_service_id_uploaded_at", "service_id", "uploaded_at"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     service_id: Mapped[int] = mapped_column(ForeignKey("service.id"), nullable=False)
     original_name: Mapped[str] = mapped_column(nullable=False)
@@ -79,6 +105,10 @@ class ServiceAttachment(db.Model):
     uploaded_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
 
 class RepairAttachment(db.Model):
+    __table_args__ = (
+        Index("ix_repair_attachment_repair_id_uploaded_at", "repair_id", "uploaded_at"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     repair_id: Mapped[int] = mapped_column(ForeignKey("repair.id"), nullable=False)
     original_name: Mapped[str] = mapped_column(nullable=False)
@@ -86,19 +116,109 @@ class RepairAttachment(db.Model):
     uploaded_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
 
 class EquipmentCheckIn(db.Model):
+    __table_args__ = (
+        Index("ix_equipment_check_in_equipment_id_created_at", "equipment_id", "created_at"),
+        # Device-generated id of an API check-in, so re-sent batches are not stored twice.
+        Index("ux_equipment_check_in_client_id_equipment_id", "client_id", "equipment_id", unique=True),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     equipment_id: Mapped[int] = mapped_column(ForeignKey("equipment.id"), nullable=False)
     mileage: Mapped[Optional[int]] = mapped_column(nullable=True)
     issues: Mapped[Optional[str]] = mapped_column(nullable=True)
+    client_id: Mapped[Optional[str]] = mapped_column(nullable=True)
     created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
 
 class AuditLog(db.Model):
+    __table_args__ = (
+        Index("ix_audit_log_created_at", "created_at"),
+        Index("ix_audit_log_entity_entity_id_created_at", "entity", "entity_id", "created_at"),
+        Index("ix_audit_log_owner_id_created_at_id", "owner_id", "created_at", "id"),
+        Index("ix_audit_log_owner_id_user_id_created_at", "owner_id", "user_id", "created_at"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
     user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("admin_user.id"), nullable=True)
+    # Account whose data the entry is about, so each owner's log is one index range.
+    owner_id: Mapped[Optional[int]] = mapped_column(ForeignKey("admin_user.id"), nullable=True)
     action: Mapped[str] = mapped_column(nullable=False)
     entity: Mapped[str] = mapped_column(nullable=False)
     entity_id: Mapped[Optional[int]] = mapped_column(nullable=True)
     details: Mapped[Optional[str]] = mapped_column(nullable=True)
     created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
 
+class OwnerStats(db.Model):
+    __tablename__ = "owner_stats"
 
+    admin_user_id: Mapped[int] = mapped_column(ForeignKey("admin_user.id"), primary_key=True, nullable=False)
+    equipment_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    service_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    repair_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    service_cost_total: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    repair_cost_total: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    overdue_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    overdue_as_of: Mapped[Optional[dt.date]] = mapped_column(Date, nullable=True)
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow, nullable=False)
+
+class ReminderDelivery(db.Model):
+    __table_args__ = (
+        UniqueConstraint("recipient", "send_date", name="uq_reminder_delivery_recipient_send_date"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
+    recipient: Mapped[str] = mapped_column(nullable=False)
+    send_date: Mapped[dt.date] = mapped_column(Date, nullable=False)
+    status: Mapped[str] = mapped_column(nullable=False)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    error: Mapped[Optional[str]] = mapped_column(nullable=True)
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow, nullable=False)
+
+class EquipmentDue(db.Model):
+    __tablename__ = "equipment_due"
+    __table_args__ = (
+        Index("ix_equipment_due_due_date", "due_date"),
+        Index("ix_equipment_due_admin_user_id_due_date", "admin_user_id", "due_date"),
+    )
+
+    equipment_id: Mapped[int] = mapped_column(ForeignKey("equipment.id"), primary_key=True, nullable=False)
+    admin_user_id: Mapped[int] = mapped_column(ForeignKey("admin_user.id"), nullable=False)
+    due_date: Mapped[Optional[dt.date]] = mapped_column(Date, nullable=True)
+    next_service_date: Mapped[Optional[dt.date]] = mapped_column(Date, nullable=True)
+    projected_due_date: Mapped[Optional[dt.date]] = mapped_column(Date, nullable=True)
+    service_interval: Mapped[Optional[int]] = mapped_column(nullable=True)
+    due_mileage: Mapped[Optional[int]] = mapped_column(nullable=True)
+    last_service_on: Mapped[Optional[dt.date]] = mapped_column(Date, nullable=True)
+    last_mileage: Mapped[Optional[int]] = mapped_column(nullable=True)
+    last_reading_at: Mapped[Optional[dt.datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Running sums for a least-squares fit of mileage against days, so each
+    # check-in updates the growth rate without rereading earlier readings.
+    reading_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    sum_days: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    sum_mileage: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    sum_days_sq: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    sum_days_mileage: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow, nullable=False)
+
+class DropboxFolderJob(db.Model):
+    __tablename__ = "dropbox_folder_job"
+    __table_args__ = (
+        Index("ix_dropbox_folder_job_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, nullable=False)
+    equipment_id: Mapped[int] = mapped_column(ForeignKey("equipment.id"), nullable=False)
+    path: Mapped[str] = mapped_column(nullable=False)
+    status: Mapped[str] = mapped_column(nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    error: Mapped[Optional[str]] = mapped_column(nullable=True)
+    next_attempt_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow, nullable=False)
+
+class AttachmentBlob(db.Model):
+    __tablename__ = "attachment_blob"
+
+    sha256: Mapped[str] = mapped_column(primary_key=True, nullable=False)
+    size: Mapped[int] = mapped_column(nullable=False)
+    ref_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
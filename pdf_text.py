@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from db import basedir
+
+# Bump when extraction changes so cached text from older code is not reused.
+PDF_TEXT_VERSION = 1
+PDF_TEXT_WORKERS = 2
+# Below this many pages starting worker processes costs more than it saves.
+PARALLEL_MIN_PAGES = 40
+PAGES_PER_TASK = 10
+
+_worker_reader = None
+
+
+def pdf_text_settings():
+    return {
+        "cache_dir": os.environ.get("PDF_TEXT_CACHE_FOLDER") or os.path.join(basedir, "instance", "pdf-text"),
+        # A pool only pays off with a spare core; on one CPU it just adds start-up time.
+        "workers": int(os.environ.get("PDF_TEXT_WORKERS", min(PDF_TEXT_WORKERS, os.cpu_count() or 1))),
+    }
+
+
+def read_pdf_bytes(source):
+    """The document's bytes from a path, bytes, or a file-like object such as an upload."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as handle:
+            return handle.read()
+    return source.read()
+
+
+def pdf_text_key(data):
+    return f"{hashlib.sha256(data).hexdigest()}-v{PDF_TEXT_VERSION}"
+
+
+def pdf_text_cache_path(root, key):
+    return os.path.join(root, key[:2], f"{key}.ndjson.gz")
+
+
+def _page_text(page):
+    # extract_text() returns None for pages without a text layer, such as scans.
+    return page.extract_text() or ""
+
+
+def _open_worker_document(data):
+    from pypdf import PdfReader
+
+    global _worker_reader
+    _worker_reader = PdfReader(io.BytesIO(data))
+
+
+def _extract_range(bounds):
+    """Text of pages [start, stop) of the document this pool worker opened."""
+    start, stop = bounds
+    return [_page_text(_worker_reader.pages[number]) for number in range(start, stop)]
+
+
+def _extract(data, workers):
+    # pypdf takes a while to import; only callers that parse a document pay for it.
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    count = len(reader.pages)
+    if workers <= 1 or count < PARALLEL_MIN_PAGES:
+        for page in reader.pages:
+            yield _page_text(page)
+        return
+    # Each worker parses the document once, then takes page ranges;
+    # map() hands the ranges back in order as they finish.
+    ranges = [(start, min(count, start + PAGES_PER_TASK)) for start in range(0, count, PAGES_PER_TASK)]
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(ranges)), initializer=_open_worker_document, initargs=(data,)
+    ) as executor:
+        for texts in executor.map(_extract_range, ranges):
+            yield from texts
+
+
+def _read_cached(path):
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            yield json.loads(line)
+
+
+def _write_cache(path, texts):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as handle:
+            handle.writelines(json.dumps(text) + "\n" for text in texts)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def iter_page_text(source, workers=1, cache_dir=None):
+    """Yield the text of each page in order; pages without text yield "".
+
+    Documents of PARALLEL_MIN_PAGES or more are split across ``workers``
+    processes. With ``cache_dir`` the result is stored under the content
+    hash once every page has been read, and the same bytes later stream
+    straight from the cache without parsing.
+    """
+    data = read_pdf_bytes(source)
+    path = pdf_text_cache_path(cache_dir, pdf_text_key(data)) if cache_dir else None
+    if path and os.path.exists(path):
+        yield from _read_cached(path)
+        return
+    texts = []
+    for text in _extract(data, workers):
+        if path:
+            texts.append(text)
+        yield text
+    if path:
+        _write_cache(path, texts)
+
+
+def extract_text(source, workers=1, cache_dir=None):
+    """The whole document's text, one line break after each page."""
+    return "".join(text + "\n" for text in iter_page_text(source, workers, cache_dir))
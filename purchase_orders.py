@@ -0,0 +1,212 @@
+import datetime as dt
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from db import basedir
+
+PO_TEMPLATE_DIR = os.path.join(basedir, "static")
+DEFAULT_PO_TEMPLATE = "ipac-subcontractor"
+PO_WORKERS = 2
+HST_RATE = 0.13
+
+# Where each kind of PO form takes its values. "equipment" is optional; forms
+# without a field for it get the machine as an unpriced first line instead.
+PO_LAYOUTS = {
+    "subcontractor": {
+        "fields": {"equipment": "C8", "date": "I8", "po_number": "I9", "vendor": "C14"},
+        "columns": {"quantity": "A", "unit": "B", "description": "C", "unit_price": "I", "amount": "J"},
+        "totals": ("J40", "J41", "J42"),
+    },
+    "supplier": {
+        "fields": {"vendor": "H8", "po_number": "C13", "date": "C14"},
+        "columns": {"quantity": "B", "description": "D", "unit_price": "I", "amount": "J"},
+        "totals": ("J31", "J32", "J33"),
+    },
+}
+
+# name: (file under static/, layout, line-item rows)
+PO_TEMPLATES = {
+    "ipac-subcontractor": ("IPAC_PO_Sub.xlsx", "subcontractor", range(19, 38)),
+    "ipac-supplier": ("IPAC_PO_Supplier.xlsx", "supplier", range(20, 31)),
+    "pave1-subcontractor": ("Pave-1 Purchase Order Form (Subcontractor).xlsx", "subcontractor", range(19, 40)),
+    "pave1-supplier": ("Pave-1 Purchase order ( Supplier).xlsx", "supplier", range(20, 31)),
+}
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_STYLE = re.compile(r'\ss="(\d+)"')
+_FORMULA = re.compile(r"<f\b[^>]*/>|<f\b[^>]*>.*?</f>", re.S)
+
+
+def _cell_pattern(refs):
+    return re.compile(r'<c r="(%s)"(?:\s[^>]*?)?(?:/>|>.*?</c>)' % "|".join(refs), re.S)
+
+
+def _first_sheet_path(members):
+    workbook = members["xl/workbook.xml"].decode()
+    rel_id = re.search(r'<sheet\b[^>]*\br:id="([^"]+)"', workbook).group(1)
+    rels = members["xl/_rels/workbook.xml.rels"].decode()
+    for relationship in re.findall(r"<Relationship\b[^>]*>", rels):
+        if f'Id="{rel_id}"' in relationship:
+            target = re.search(r'Target="([^"]+)"', relationship).group(1)
+            return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+    raise ValueError("Workbook has no first worksheet.")
+
+
+class POTemplate:
+    """A PO workbook parsed once: its zip members in memory and its worksheet split around the fillable cells.
+
+    ``render`` only joins strings and writes a new zip, so no workbook is
+    opened or parsed per PO. Formulas are kept and their cached results are
+    written alongside, so the file shows correct totals wherever it is opened.
+    """
+
+    def __init__(self, path, layout, rows):
+        self.layout = PO_LAYOUTS[layout]
+        self.rows = list(rows)
+        with zipfile.ZipFile(path) as archive:
+            self.infos = archive.infolist()
+            members = {info.filename: archive.read(info) for info in self.infos}
+        self.sheet_path = _first_sheet_path(members)
+        # Ask Excel to recalculate on open as well, in case a reader ignores cached values.
+        members["xl/workbook.xml"] = re.sub(
+            rb"<calcPr\b(?![^>]*fullCalcOnLoad)", b'<calcPr fullCalcOnLoad="1"', members["xl/workbook.xml"]
+        )
+        self.members = members
+
+        refs = list(self.layout["fields"].values()) + list(self.layout["totals"])
+        refs += [f"{column}{row}" for row in self.rows for column in self.layout["columns"].values()]
+        sheet = members[self.sheet_path].decode("utf-8")
+        self.literals = []
+        self.slots = []
+        self.cells = {}
+        position = 0
+        for match in _cell_pattern(refs).finditer(sheet):
+            ref, original = match.group(1), match.group(0)
+            style = _STYLE.search(original.split(">", 1)[0])
+            formula = _FORMULA.search(original)
+            self.cells[ref] = (original, style.group(1) if style else None, formula.group(0) if formula else None)
+            self.literals.append(sheet[position : match.start()])
+            self.slots.append(ref)
+            position = match.end()
+        self.literals.append(sheet[position:])
+        missing = set(refs) - set(self.cells)
+        if missing:
+            raise ValueError(f"PO template {os.path.basename(path)} has no cells {', '.join(sorted(missing))}.")
+
+    def _cell(self, ref, value):
+        original, style, formula = self.cells[ref]
+        if value is None:
+            return original
+        style_attr = f' s="{style}"' if style else ""
+        if isinstance(value, (int, float)):
+            return f'<c r="{ref}"{style_attr}>{formula or ""}<v>{round(value, 2)!r}</v></c>'
+        text = escape(_CONTROL_CHARS.sub("", str(value)))
+        return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+    def values(self, po):
+        """Cell values for ``po``: a dict with vendor, equipment, po_number, date and (description, amount) lines."""
+        fields = self.layout["fields"]
+        columns = self.layout["columns"]
+        values = {fields[name]: po.get(name) for name in fields}
+        lines = [(description, 1, amount) for description, amount in po["lines"]]
+        if "equipment" not in fields and po.get("equipment"):
+            lines.insert(0, (po["equipment"], None, None))
+        if len(lines) > len(self.rows):
+            # Fold what does not fit into the last row rather than lose it.
+            keep = len(self.rows) - 1
+            extra = lines[keep:]
+            lines = lines[:keep] + [
+                (f"Additional items ({len(extra)})", 1, sum(amount or 0 for _, _, amount in extra))
+            ]
+        subtotal = 0.0
+        for row, (description, quantity, amount) in zip(self.rows, lines):
+            values[f"{columns['description']}{row}"] = description
+            if amount is not None:
+                values[f"{columns['quantity']}{row}"] = quantity
+                values[f"{columns['unit_price']}{row}"] = amount
+                values[f"{columns['amount']}{row}"] = amount * quantity
+                subtotal += amount * quantity
+        subtotal_ref, tax_ref, total_ref = self.layout["totals"]
+        tax = round(subtotal * HST_RATE, 2)
+        values.update({subtotal_ref: subtotal, tax_ref: tax, total_ref: subtotal + tax})
+        return values
+
+    def render(self, po):
+        """The filled-in workbook as .xlsx bytes."""
+        values = self.values(po)
+        parts = [self.literals[0]]
+        for ref, literal in zip(self.slots, self.literals[1:]):
+            parts.append(self._cell(ref, values.get(ref)))
+            parts.append(literal)
+        sheet = "".join(parts).encode("utf-8")
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for info in self.infos:
+                data = sheet if info.filename == self.sheet_path else self.members[info.filename]
+                # Images are already compressed; deflating them again only costs time.
+                stored = info.filename.startswith("xl/media/")
+                archive.writestr(
+                    info, data, compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED,
+                    compresslevel=None if stored else 1,
+                )
+        return buffer.getvalue()
+
+
+@lru_cache(maxsize=None)
+def get_po_template(name):
+    """The parsed template, loaded from disk the first time each process asks for it."""
+    filename, layout, rows = PO_TEMPLATES[name]
+    return POTemplate(os.path.join(PO_TEMPLATE_DIR, filename), layout, rows)
+
+
+def equipment_label(equipment):
+    return f"{equipment.code} - {equipment.make} {equipment.model} (VIN {equipment.vin_number})"
+
+
+def po_number(kind, record_id):
+    return f"{kind[0].upper()}-{record_id:06d}"
+
+
+def po_data(kind, record, equipment, items, date=None):
+    """What a PO is filled from, as plain values that can be sent to pool workers."""
+    return {
+        "vendor": record.performed_by,
+        "equipment": equipment_label(equipment),
+        "po_number": po_number(kind, record.id),
+        "date": (date or dt.date.today()).isoformat(),
+        "lines": [(item.description, item.amount) for item in items],
+    }
+
+
+def po_filename(kind, record, equipment):
+    return f"PO_{po_number(kind, record.id)}_{equipment.code}.xlsx".replace(" ", "_").replace("/", "-")
+
+
+def render_po(template_name, po):
+    return get_po_template(template_name).render(po)
+
+
+def _write_po(job):
+    template_name, po, path = job
+    with open(path, "wb") as handle:
+        handle.write(render_po(template_name, po))
+    return path
+
+
+def write_pos(jobs, workers=PO_WORKERS):
+    """Render (template, po, path) jobs into files, across ``workers`` processes; yields paths in order.
+
+    Each worker parses a template once and reuses it for every PO it writes.
+    """
+    if workers <= 1:
+        yield from map(_write_po, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_write_po, jobs, chunksize=32)
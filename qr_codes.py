@@ -0,0 +1,127 @@
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# qrcode and Pillow are imported by the functions that draw, so importing this
+# module (the web app does at start-up) stays cheap.
+
+QR_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+# Pixels per QR module; the qrcode default is 10.
+DEFAULT_BOX_SIZE = 10
+MIN_BOX_SIZE = 2
+MAX_BOX_SIZE = 40
+
+# A4 at 150 dpi, three labels across and four down.
+SHEET_DPI = 150
+SHEET_SIZE = (1240, 1754)
+SHEET_COLUMNS = 3
+SHEET_ROWS = 4
+SHEET_MARGIN = 60
+CAPTION_HEIGHT = 70
+
+
+def qr_key(url, box_size):
+    """Cache key and ETag for one rendering of a check-in URL."""
+    return hashlib.sha256(f"{url}|{box_size}".encode()).hexdigest()[:32]
+
+
+def qr_cache_path(root, key, fmt):
+    return os.path.join(root, key[:2], f"{key}.{fmt}")
+
+
+def render_qr(url, box_size, fmt):
+    import qrcode
+    import qrcode.image.svg
+
+    buffer = io.BytesIO()
+    if fmt == "svg":
+        qrcode.make(url, image_factory=qrcode.image.svg.SvgPathImage, box_size=box_size).save(buffer)
+    else:
+        qrcode.make(url, box_size=box_size).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def cached_qr(root, url, box_size, fmt):
+    """Path of a QR image, rendering it into the cache on first use."""
+    path = qr_cache_path(root, qr_key(url, box_size), fmt)
+    if not os.path.exists(path):
+        data = render_qr(url, box_size, fmt)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return path
+
+
+def _caption_font():
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=26)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def render_sheet_page(labels):
+    """One bilevel A4 page of (url, caption) labels as PNG bytes; runs in a pool worker."""
+    import qrcode
+    from PIL import Image, ImageDraw
+
+    page = Image.new("1", SHEET_SIZE, 1)
+    draw = ImageDraw.Draw(page)
+    font = _caption_font()
+    cell_width = (SHEET_SIZE[0] - 2 * SHEET_MARGIN) // SHEET_COLUMNS
+    cell_height = (SHEET_SIZE[1] - 2 * SHEET_MARGIN) // SHEET_ROWS
+    for index, (url, caption) in enumerate(labels):
+        left = SHEET_MARGIN + (index % SHEET_COLUMNS) * cell_width
+        top = SHEET_MARGIN + (index // SHEET_COLUMNS) * cell_height
+        qr = qrcode.QRCode(border=2)
+        qr.add_data(url)
+        qr.make(fit=True)
+        modules = qr.modules_count + 2 * qr.border
+        qr.box_size = max(1, min(cell_width - 20, cell_height - CAPTION_HEIGHT) // modules)
+        image = qr.make_image().get_image()
+        page.paste(image, (left + (cell_width - image.width) // 2, top))
+        draw.text(
+            (left + cell_width // 2, top + image.height + 8), caption, fill=0, font=font, anchor="ma"
+        )
+        draw.rectangle((left, top - 10, left + cell_width - 1, top + cell_height - 11), outline=0)
+    buffer = io.BytesIO()
+    page.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def sheet_pages(labels):
+    per_page = SHEET_COLUMNS * SHEET_ROWS
+    return [labels[start : start + per_page] for start in range(0, len(labels), per_page)] or [[]]
+
+
+def render_sheet_pages(labels, workers=1):
+    """PNG bytes for every page, rendered across ``workers`` processes."""
+    pages = sheet_pages(labels)
+    if workers > 1 and len(pages) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pages))) as executor:
+            return list(executor.map(render_sheet_page, pages))
+    return [render_sheet_page(page) for page in pages]
+
+
+def render_sheet_pdf(labels, workers=1):
+    """A multi-page printable PDF of QR labels."""
+    from PIL import Image
+
+    images = [Image.open(io.BytesIO(data)) for data in render_sheet_pages(labels, workers)]
+    buffer = io.BytesIO()
+    images[0].save(buffer, "PDF", save_all=True, append_images=images[1:], resolution=SHEET_DPI)
+    return buffer.getvalue()
@@ -0,0 +1,266 @@
+import datetime as dt
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import insert
+
+from db import db
+from due import record_service
+from models import Repair, RepairCostItem, Service, ServiceCostItem
+from pdf_text import iter_page_text
+from stats import apply_owner_stats_delta, refresh_overdue_count
+
+QUOTE_EXTENSIONS = (".xlsx", ".pdf")
+QUOTE_WORKERS = 2
+QUOTE_CHUNK_SIZE = 16
+# Header rows sit near the top of every PO form; give up on sheets without one.
+HEADER_SEARCH_ROWS = 60
+MAX_UNIT_LENGTH = 8
+
+# Column headings used by the supplier and subcontractor PO forms under static/.
+HEADER_FIELDS = {
+    "qty": "quantity",
+    "quantity": "quantity",
+    "unit": "unit",
+    "description": "description",
+    "unit price": "unit_price",
+    "contract price": "amount",
+    "line total": "amount",
+    "amount": "amount",
+}
+VENDOR_LABELS = ("attention to:", "vendor:")
+REFERENCE_LABELS = ("po #", "po#", "quote #", "quote#")
+TOTAL_LABELS = ("subtotal", "total", "hst", "tax")
+
+_MONEY = r"\$?\s?(\d[\d,]*\.\d{2})"
+# A totals line is the label and figures only, so "Total station rental" stays a line item.
+_TOTAL_LINE = re.compile(r"^(?:%s)\b[^a-z]*$" % "|".join(TOTAL_LABELS))
+# "<qty> <description> <unit price> [<line total>]", the layout text extraction gives quote tables.
+_PDF_LINE = re.compile(
+    rf"^(?:(?P<quantity>\d+(?:\.\d+)?)\s+)?(?P<description>.*?[A-Za-z].*?)\s+{_MONEY}(?:\s+{_MONEY})?$"
+)
+
+KIND_MODELS = {
+    "service": (Service, ServiceCostItem, "service_id", "service_cost"),
+    "repair": (Repair, RepairCostItem, "repair_id", "repair_cost"),
+}
+
+
+def parse_number(value):
+    """A float from a cell or text such as "$ 93,840.00"; None when there is no number."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if text.startswith("="):
+        # A formula whose cached result was never saved.
+        return None
+    text = text.replace("$", "").replace(",", "").strip()
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _label(value):
+    return " ".join(str(value).split()).lower() if isinstance(value, str) else ""
+
+
+def _unit(value):
+    # Some vendors type a short description into the Unit column; keep only real units such as "LS" or "EA".
+    unit = " ".join(str(value or "").split())
+    if not unit or len(unit) > MAX_UNIT_LENGTH or _label(unit) in HEADER_FIELDS:
+        return None
+    return unit
+
+
+def line_item(description, quantity=None, unit=None, unit_price=None, amount=None):
+    """A normalized line item, or None for rows without a description or a price."""
+    description = " ".join(str(description or "").split())
+    quantity = parse_number(quantity)
+    unit_price = parse_number(unit_price)
+    amount = parse_number(amount)
+    if amount is None and unit_price is not None:
+        amount = unit_price * (quantity if quantity is not None else 1)
+    if not description or amount is None:
+        return None
+    # The line total is what gets recorded; a quantity that does not multiply out to it (a line
+    # number typed into Qty, a rounded unit price) is kept as written and flagged for review.
+    mismatch = quantity is not None and unit_price is not None and abs(quantity * unit_price - amount) >= 0.01
+    return {
+        "description": description,
+        "quantity": quantity,
+        "unit": _unit(unit),
+        "unit_price": unit_price,
+        "amount": round(amount, 2),
+        "mismatch": mismatch,
+    }
+
+
+def _value_after(row, index):
+    for value in row[index + 1 :]:
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def parse_xlsx_quote(path):
+    """Line items of a PO/quote workbook, read row by row in read-only mode."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        vendor = reference = None
+        columns = None
+        items = []
+        for number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            labels = [_label(value) for value in row]
+            if columns is None:
+                for index, label in enumerate(labels):
+                    if label in VENDOR_LABELS and vendor is None:
+                        vendor = _value_after(row, index)
+                    elif label in REFERENCE_LABELS and reference is None:
+                        reference = _value_after(row, index)
+                headings = {index: HEADER_FIELDS[label] for index, label in enumerate(labels) if label in HEADER_FIELDS}
+                if "description" in headings.values() and "amount" in headings.values():
+                    columns = headings
+                elif number >= HEADER_SEARCH_ROWS:
+                    break
+                continue
+            if any(
+                label.startswith(TOTAL_LABELS) for index, label in enumerate(labels) if columns.get(index) != "description"
+            ):
+                break
+            fields = {field: row[index] for index, field in columns.items() if index < len(row)}
+            item = line_item(**fields)
+            if item:
+                items.append(item)
+    finally:
+        workbook.close()
+    return {"vendor": vendor, "reference": reference, "items": items}
+
+
+def parse_pdf_quote(path):
+    """Line items from a PDF quote's text: lines that end in a price, up to the totals."""
+    items = []
+    reference = None
+    for text in iter_page_text(path):
+        for line in text.splitlines():
+            line = line.strip()
+            label = _label(line)
+            if reference is None:
+                match = re.match(r"^(?:po|quote)\s*#:?\s*(\S+)", label)
+                if match:
+                    reference = match.group(1).upper()
+                    continue
+            if _TOTAL_LINE.match(label):
+                if items:
+                    return {"vendor": None, "reference": reference, "items": items}
+                continue
+            match = _PDF_LINE.match(line)
+            if match:
+                item = line_item(
+                    match.group("description"),
+                    match.group("quantity"),
+                    unit_price=match.group(3),
+                    amount=match.group(4),
+                )
+                if item:
+                    items.append(item)
+    return {"vendor": None, "reference": reference, "items": items}
+
+
+def parse_quote_file(path):
+    """Parse one file into {"source", "vendor", "reference", "items"} or {"source", "error"}; runs in pool workers."""
+    source = os.path.basename(path)
+    try:
+        if path.lower().endswith(".pdf"):
+            quote = parse_pdf_quote(path)
+        else:
+            quote = parse_xlsx_quote(path)
+    except Exception as exc:
+        return {"source": source, "error": f"{type(exc).__name__}: {exc}"}
+    if not quote["items"]:
+        return {"source": source, "error": "No line items found."}
+    return dict(quote, source=source)
+
+
+def find_quote_files(paths):
+    """Quote files among ``paths``, walking directories; sorted so runs are repeatable."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found.extend(os.path.join(root, name) for name in names)
+        else:
+            found.append(path)
+    return sorted(
+        path for path in found
+        if path.lower().endswith(QUOTE_EXTENSIONS) and not os.path.basename(path).startswith("~$")
+    )
+
+
+def iter_parsed_quotes(paths, workers=QUOTE_WORKERS):
+    """Parsed quotes in the order of ``paths``, spread over ``workers`` processes in chunks."""
+    if workers <= 1 or len(paths) < 2:
+        yield from map(parse_quote_file, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(parse_quote_file, paths, chunksize=QUOTE_CHUNK_SIZE)
+
+
+def cost_item_description(item):
+    if item["quantity"] is None or (item["quantity"] == 1 and not item["unit"]):
+        return item["description"]
+    quantity = f"{item['quantity']:g} {item['unit'] or ''}".strip()
+    return f"{item['description']} ({quantity})"
+
+
+def store_quotes(quotes, equipment, kind, date=None):
+    """Record each parsed quote as a service or repair on ``equipment``, with its line items as cost items.
+
+    Parents go in as one multi-row INSERT ... RETURNING and the cost items
+    as one executemany; owner stats move once per call. Does not commit.
+    Returns the new record ids.
+    """
+    if not quotes:
+        return []
+    parent_model, item_model, parent_key, cost_column = KIND_MODELS[kind]
+    date = date or dt.datetime.utcnow().date()
+    parents = []
+    for quote in quotes:
+        label = quote["source"] + (f" (PO {quote['reference']})" if quote.get("reference") else "")
+        parents.append(
+            {
+                "equipment_id": equipment.id,
+                "date": date,
+                "performed_by": quote.get("vendor") or os.path.splitext(quote["source"])[0],
+                "mileage": None,
+                cost_column: round(sum(item["amount"] for item in quote["items"]), 2),
+                "notes": f"Imported from {label}",
+            }
+        )
+    ids = db.session.scalars(
+        insert(parent_model).returning(parent_model.id, sort_by_parameter_order=True), parents
+    ).all()
+    db.session.execute(
+        insert(item_model),
+        [
+            {parent_key: parent_id, "description": cost_item_description(item), "amount": item["amount"]}
+            for parent_id, quote in zip(ids, quotes)
+            for item in quote["items"]
+        ],
+    )
+    total = sum(parent[cost_column] for parent in parents)
+    if kind == "service":
+        if equipment.last_service_date is None or equipment.last_service_date < date:
+            equipment.last_service_date = date
+        record_service(equipment, db.session.get(Service, ids[-1]))
+        apply_owner_stats_delta(equipment.admin_user_id, service_count=len(ids), service_cost_total=total)
+        refresh_overdue_count(equipment.admin_user_id)
+    else:
+        apply_owner_stats_delta(equipment.admin_user_id, repair_count=len(ids), repair_cost_total=total)
+    return ids
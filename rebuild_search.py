@@ -0,0 +1,20 @@
+from app import create_cli_app
+from db import db
+from search import rebuild_search_index, search_available
+
+app = create_cli_app()
+
+
+def main():
+    """Rebuild the full-text search index from the base tables."""
+    with app.app_context():
+        if not search_available():
+            print("Full-text search needs SQLite; the equipment list falls back to LIKE matching.")
+            return
+        db.create_all()
+        documents = rebuild_search_index()
+        print(f"Indexed {documents} document(s).")
+
+
+if __name__ == "__main__":
+    main()
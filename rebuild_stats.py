@@ -0,0 +1,20 @@
+from app import create_cli_app
+from db import db
+from due import rebuild_due_index
+from stats import rebuild_owner_stats
+
+app = create_cli_app()
+
+
+def main():
+    """Reconcile equipment_due and owner_stats with the base tables."""
+    with app.app_context():
+        db.create_all()
+        machines = rebuild_due_index()
+        print(f"Rebuilt due dates for {machines} machine(s).")
+        count = rebuild_owner_stats()
+        print(f"Rebuilt dashboard stats for {count} owner(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import csv
+import io
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+from sqlalchemy import and_, or_, select
+from werkzeug.utils import secure_filename
+
+from db import db
+from models import Equipment, Service, Repair, ServiceCostItem, RepairCostItem
+
+REPORT_PAGE_SIZE = 500
+FLEET_CHUNK_SIZE = 100
+
+SERVICE_COLUMNS = ["Date", "Performed By", "Mileage", "Next Service", "Cost", "Cost Items", "Notes"]
+REPAIR_COLUMNS = ["Date", "Performed By", "Mileage", "Cost", "Cost Items", "Notes"]
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def sanitize_csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value)
+    if text and text[0] in ("=", "+", "-", "@"):
+        return "'" + text
+    return text
+
+
+def format_cost_items(items):
+    return "; ".join([f"{item.description} (${item.amount:.2f})" for item in items])
+
+
+def equipment_rows(equipment):
+    return [
+        ["Equipment Report"],
+        [],
+        ["Code", sanitize_csv_value(equipment.code)],
+        ["Type", sanitize_csv_value(equipment.type)],
+        ["VIN", sanitize_csv_value(equipment.vin_number)],
+        ["Make", sanitize_csv_value(equipment.make)],
+        ["Model", sanitize_csv_value(equipment.model)],
+        ["Mileage", sanitize_csv_value(equipment.mileage or "")],
+        ["Service Required", sanitize_csv_value(equipment.service_required or "")],
+        ["Last Service Date", sanitize_csv_value(equipment.last_service_date or "")],
+        [],
+    ]
+
+
+def service_row(service, items):
+    return [
+        sanitize_csv_value(service.date),
+        sanitize_csv_value(service.performed_by),
+        sanitize_csv_value(service.mileage or ""),
+        sanitize_csv_value(service.next_service or ""),
+        sanitize_csv_value(service.service_cost or ""),
+        sanitize_csv_value(format_cost_items(items)),
+        sanitize_csv_value(service.notes or ""),
+    ]
+
+
+def repair_row(repair, items):
+    return [
+        sanitize_csv_value(repair.date),
+        sanitize_csv_value(repair.performed_by),
+        sanitize_csv_value(repair.mileage or ""),
+        sanitize_csv_value(repair.repair_cost or ""),
+        sanitize_csv_value(format_cost_items(items)),
+        sanitize_csv_value(repair.notes or ""),
+    ]
+
+
+def iter_keyset_pages(model, equipment_id, page_size=REPORT_PAGE_SIZE):
+    """Yield pages of a service/repair history, newest first, keyed on (date, id)."""
+    last_date = last_id = None
+    while True:
+        query = model.query.filter_by(equipment_id=equipment_id)
+        if last_id is not None:
+            query = query.filter(
+                or_(
+                    model.date < last_date,
+                    and_(model.date == last_date, model.id < last_id),
+                )
+            )
+        rows = query.order_by(model.date.desc(), model.id.desc()).limit(page_size).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last_date, last_id = rows[-1].date, rows[-1].id
+
+
+def cost_items_by_parent(item_model, parent_column, parent_ids):
+    grouped = {}
+    if not parent_ids:
+        return grouped
+    items = (
+        item_model.query
+        .filter(parent_column.in_(parent_ids))
+        .order_by(item_model.id.asc())
+        .all()
+    )
+    for item in items:
+        grouped.setdefault(getattr(item, parent_column.key), []).append(item)
+    return grouped
+
+
+def iter_report_rows(equipment, service_batches, repair_batches):
+    """Yield the report rows for one machine.
+
+    ``service_batches`` and ``repair_batches`` are iterables of
+    ``(rows, cost_items_by_id)`` pairs, so callers can feed either paged
+    queries or data that was prefetched for a whole fleet.
+    """
+    yield from equipment_rows(equipment)
+
+    yield ["Services"]
+    yield SERVICE_COLUMNS
+    for services, items_by_id in service_batches:
+        for service in services:
+            yield service_row(service, items_by_id.get(service.id, []))
+    yield []
+
+    yield ["Repairs"]
+    yield REPAIR_COLUMNS
+    for repairs, items_by_id in repair_batches:
+        for repair in repairs:
+            yield repair_row(repair, items_by_id.get(repair.id, []))
+
+
+def _paged_batches(model, item_model, parent_column, equipment_id, page_size):
+    for rows in iter_keyset_pages(model, equipment_id, page_size):
+        yield rows, cost_items_by_parent(item_model, parent_column, [row.id for row in rows])
+
+
+def iter_equipment_report(equipment, page_size=REPORT_PAGE_SIZE):
+    """Stream the per-equipment CSV report one line at a time.
+
+    Services and repairs are read a page at a time, along with the cost items
+    for just that page, so memory use does not grow with the history length.
+    """
+    writer = csv.writer(_Echo())
+    rows = iter_report_rows(
+        equipment,
+        _paged_batches(Service, ServiceCostItem, ServiceCostItem.service_id, equipment.id, page_size),
+        _paged_batches(Repair, RepairCostItem, RepairCostItem.repair_id, equipment.id, page_size),
+    )
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target that lets a ZipFile be drained as it is built."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def render_equipment_report(job):
+    """Render one machine's report from prefetched rows; runs in worker processes."""
+    equipment, services, repairs, service_items, repair_items = job
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(iter_report_rows(equipment, [(services, service_items)], [(repairs, repair_items)]))
+    return buffer.getvalue()
+
+
+def report_filename(equipment):
+    code = secure_filename(equipment.code or "") or "equipment"
+    return f"{equipment.id}_{code}_report.csv"
+
+
+def _plain_rows(statement):
+    return [SimpleNamespace(**row._asdict()) for row in db.session.execute(statement)]
+
+
+def _group(rows, key):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(getattr(row, key), []).append(row)
+    return grouped
+
+
+def _fleet_chunk_jobs(equipment_chunk):
+    """Build render jobs for a chunk of machines with four set-based queries."""
+    equipment_ids = [equipment.id for equipment in equipment_chunk]
+    services = _plain_rows(
+        select(Service.__table__)
+        .where(Service.equipment_id.in_(equipment_ids))
+        .order_by(Service.equipment_id, Service.date.desc(), Service.id.desc())
+    )
+    repairs = _plain_rows(
+        select(Repair.__table__)
+        .where(Repair.equipment_id.in_(equipment_ids))
+        .order_by(Repair.equipment_id, Repair.date.desc(), Repair.id.desc())
+    )
+    service_items = _plain_rows(
+        select(ServiceCostItem.__table__)
+        .join(Service, ServiceCostItem.service_id == Service.id)
+        .where(Service.equipment_id.in_(equipment_ids))
+        .order_by(ServiceCostItem.id)
+    )
+    repair_items = _plain_rows(
+        select(RepairCostItem.__table__)
+        .join(Repair, RepairCostItem.repair_id == Repair.id)
+        .where(Repair.equipment_id.in_(equipment_ids))
+        .order_by(RepairCostItem.id)
+    )
+    services_by_equipment = _group(services, "equipment_id")
+    repairs_by_equipment = _group(repairs, "equipment_id")
+    service_items_by_id = _group(service_items, "service_id")
+    repair_items_by_id = _group(repair_items, "repair_id")
+    jobs = []
+    for equipment in equipment_chunk:
+        equipment_services = services_by_equipment.get(equipment.id, [])
+        equipment_repairs = repairs_by_equipment.get(equipment.id, [])
+        # Each job is pickled on its own for the pool, so it carries only its own machine's cost items.
+        jobs.append((
+            equipment,
+            equipment_services,
+            equipment_repairs,
+            {service.id: service_items_by_id.get(service.id, []) for service in equipment_services},
+            {repair.id: repair_items_by_id.get(repair.id, []) for repair in equipment_repairs},
+        ))
+    return jobs
+
+
+def iter_fleet_chunks(admin_user_id, chunk_size=FLEET_CHUNK_SIZE):
+    """Yield an owner's equipment in id order, ``chunk_size`` machines at a time."""
+    last_id = 0
+    while True:
+        chunk = _plain_rows(
+            select(Equipment.__table__)
+            .where(Equipment.admin_user_id == admin_user_id, Equipment.id > last_id)
+            .order_by(Equipment.id)
+            .limit(chunk_size)
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def _iter_rendered_reports(admin_user_id, workers, chunk_size):
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk in iter_fleet_chunks(admin_user_id, chunk_size):
+                jobs = _fleet_chunk_jobs(chunk)
+                yield from zip(chunk, executor.map(render_equipment_report, jobs))
+    else:
+        for chunk in iter_fleet_chunks(admin_user_id, chunk_size):
+            for job in _fleet_chunk_jobs(chunk):
+                yield job[0], render_equipment_report(job)
+
+
+def iter_fleet_export(admin_user_id, fmt="zip", workers=1, chunk_size=FLEET_CHUNK_SIZE):
+    """Stream the reports for every machine an owner has, as a ZIP or one CSV.
+
+    Machines are loaded in chunks; each chunk costs a fixed number of queries
+    and its reports are rendered across ``workers`` processes before being
+    written out, so only one chunk is ever held in memory.
+    """
+    reports = _iter_rendered_reports(admin_user_id, workers, chunk_size)
+    if fmt == "csv":
+        for index, (_, report) in enumerate(reports):
+            if index:
+                yield b"\r\n"
+            yield report.encode("utf-8")
+        return
+
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for equipment, report in reports:
+            archive.writestr(report_filename(equipment), report)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import current_app
+
+from db import basedir
+
+RESPONSE_CACHE_TTL = 300
+RESPONSE_CACHE_MAX_ENTRIES = 2048
+# Latencies kept per cached fragment for the percentiles in the stats.
+LATENCY_SAMPLES = 1000
+
+_MISSING = object()
+
+
+def response_cache_settings():
+    return {
+        # "memory" (per process), "disk" (shared by every worker on the host) or "off".
+        "backend": os.environ.get("RESPONSE_CACHE", "memory").lower(),
+        "ttl": float(os.environ.get("RESPONSE_CACHE_TTL", RESPONSE_CACHE_TTL)),
+        "max_entries": int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", RESPONSE_CACHE_MAX_ENTRIES)),
+        # Point this at /dev/shm to keep the shared cache in memory.
+        "dir": os.environ.get("RESPONSE_CACHE_DIR") or os.path.join(basedir, "instance", "response-cache"),
+    }
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry; owner versions are kept apart so eviction never resets them."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.time():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.time() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def version(self, owner_id):
+        with self.lock:
+            return self.versions.get(owner_id, 0)
+
+    def bump(self, owner_id):
+        with self.lock:
+            self.versions[owner_id] = self.versions.get(owner_id, 0) + 1
+
+
+class DiskBackend:
+    """JSON files under a directory that every worker process on the host shares.
+
+    An owner's version is the time of its last bump in nanoseconds, written
+    atomically, so bumps from different processes never settle on the same
+    value. Expired files are swept at most once per TTL.
+    """
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        self.next_sweep = time.time() + ttl
+
+    def _entry_path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "entries", digest[:2], f"{digest}.json")
+
+    def _version_path(self, owner_id):
+        return os.path.join(self.directory, "versions", str(int(owner_id)))
+
+    def _write(self, path, text):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, encoding="utf-8") as handle:
+                expires, value = json.load(handle)
+        except (OSError, ValueError):
+            return _MISSING
+        if expires <= time.time():
+            return _MISSING
+        return value
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        self._write(self._entry_path(key), json.dumps([now + ttl, value]))
+        if now >= self.next_sweep:
+            self.next_sweep = now + self.ttl
+            self.sweep(now)
+
+    def sweep(self, now=None):
+        """Remove expired entries, including those left behind by version bumps; returns how many."""
+        now = now or time.time()
+        removed = 0
+        for root, _, names in os.walk(os.path.join(self.directory, "entries")):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    with open(path, encoding="utf-8") as handle:
+                        expires = json.load(handle)[0]
+                    if expires <= now:
+                        os.remove(path)
+                        removed += 1
+                except (OSError, ValueError):
+                    continue
+        return removed
+
+    def version(self, owner_id):
+        try:
+            with open(self._version_path(owner_id), encoding="utf-8") as handle:
+                return int(handle.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump(self, owner_id):
+        self._write(self._version_path(owner_id), str(time.time_ns()))
+
+
+class NullBackend:
+    def get(self, key):
+        return _MISSING
+
+    def set(self, key, value, ttl):
+        pass
+
+    def version(self, owner_id):
+        return 0
+
+    def bump(self, owner_id):
+        pass
+
+
+def create_backend(settings):
+    if settings["backend"] == "disk":
+        return DiskBackend(settings["dir"], settings["ttl"])
+    if settings["backend"] == "off":
+        return NullBackend()
+    return MemoryBackend(settings["max_entries"])
+
+
+class ResponseCache:
+    """Rendered fragments and small query results per owner, dropped together when the owner's data changes.
+
+    Keys carry the owner's current version, so ``invalidate`` is a single
+    version bump: entries under older versions are never read again and
+    age out. Values must be JSON-serialisable. Hit and miss counts and
+    latencies are kept per fragment name, for this process.
+    """
+
+    def __init__(self, backend, ttl=RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def key(self, owner_id, name, parts):
+        digest = hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+        return f"{int(owner_id)}:{self.backend.version(owner_id)}:{name}:{digest}"
+
+    def fetch(self, owner_id, name, parts, produce):
+        """``(value, hit)``: the cached value for these parts, or ``produce()`` stored for next time."""
+        started = time.perf_counter()
+        key = self.key(owner_id, name, parts)
+        value = self.backend.get(key)
+        hit = value is not _MISSING
+        if not hit:
+            value = produce()
+            self.backend.set(key, value, self.ttl)
+        self._record(name, hit, time.perf_counter() - started)
+        return value, hit
+
+    def invalidate(self, owner_id):
+        self.backend.bump(owner_id)
+
+    def _record(self, name, hit, elapsed):
+        with self.lock:
+            metrics = self.metrics.setdefault(
+                name,
+                {"hits": 0, "misses": 0, "hit_latency": deque(maxlen=LATENCY_SAMPLES),
+                 "miss_latency": deque(maxlen=LATENCY_SAMPLES)},
+            )
+            metrics["hits" if hit else "misses"] += 1
+            metrics["hit_latency" if hit else "miss_latency"].append(elapsed * 1000)
+
+    def stats(self):
+        """Per fragment: hits, misses, hit rate, and p50/p95 latency in ms of recent hits and misses."""
+
+        def percentiles(samples):
+            ordered = sorted(samples)
+            if not ordered:
+                return {"p50_ms": None, "p95_ms": None}
+            return {
+                "p50_ms": round(ordered[len(ordered) // 2], 3),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            }
+
+        with self.lock:
+            result = {}
+            for name, metrics in self.metrics.items():
+                lookups = metrics["hits"] + metrics["misses"]
+                result[name] = {
+                    "hits": metrics["hits"],
+                    "misses": metrics["misses"],
+                    "hit_rate": round(metrics["hits"] / lookups, 4) if lookups else None,
+                    "hit": percentiles(metrics["hit_latency"]),
+                    "miss": percentiles(metrics["miss_latency"]),
+                }
+            return result
+
+
+def create_response_cache(settings=None):
+    settings = settings or response_cache_settings()
+    return ResponseCache(create_backend(settings), settings["ttl"])
+
+
+def invalidate_owner_cache(admin_user_id):
+    """Drop everything cached for the owner's pages; call once the write has committed."""
+    current_app.extensions["response_cache"].invalidate(admin_user_id)
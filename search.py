@@ -0,0 +1,237 @@
+import re
+
+from sqlalchemy import Integer, column, event, or_, text
+
+from db import db
+from models import Equipment
+
+# Each indexed row gets rowid = source id * 8 + kind, so triggers can
+# replace or drop its document by rowid instead of scanning the index.
+SEARCH_KINDS = {
+    1: "equipment",
+    2: "service",
+    3: "repair",
+    4: "service_item",
+    5: "repair_item",
+    6: "checkin",
+}
+
+_OWNER_OF_SERVICE = "(SELECT admin_user_id FROM equipment WHERE id = {row}.equipment_id)"
+_OWNER_OF_ITEM = (
+    "(SELECT e.admin_user_id FROM {parent} p JOIN equipment e ON e.id = p.equipment_id WHERE p.id = {row}.{parent}_id)"
+)
+_EQUIPMENT_OF_ITEM = "(SELECT equipment_id FROM {parent} WHERE id = {row}.{parent}_id)"
+
+# Per source table: kind; the SELECT list (owner, equipment_id, title, body)
+# written against a row alias so it serves the triggers and the rebuild; an
+# optional row filter; and the columns whose updates change the document, so
+# frequent writes such as check-in mileage updates leave the index alone.
+SOURCES = {
+    "equipment": (
+        1,
+        "'u' || {row}.admin_user_id, {row}.id, {row}.code, "
+        "{row}.type || ' ' || {row}.make || ' ' || {row}.model || ' ' || {row}.vin_number"
+        " || ' ' || coalesce({row}.service_required, '')",
+        None,
+        "code, type, make, model, vin_number, service_required",
+    ),
+    "service": (
+        2,
+        "'u' || " + _OWNER_OF_SERVICE + ", {row}.equipment_id, {row}.performed_by, {row}.notes",
+        None,
+        "performed_by, notes",
+    ),
+    "repair": (
+        3,
+        "'u' || " + _OWNER_OF_SERVICE + ", {row}.equipment_id, {row}.performed_by, {row}.notes",
+        None,
+        "performed_by, notes",
+    ),
+    "service_cost_item": (
+        4,
+        "'u' || " + _OWNER_OF_ITEM.replace("{parent}", "service") + ", "
+        + _EQUIPMENT_OF_ITEM.replace("{parent}", "service") + ", NULL, {row}.description",
+        None,
+        "description",
+    ),
+    "repair_cost_item": (
+        5,
+        "'u' || " + _OWNER_OF_ITEM.replace("{parent}", "repair") + ", "
+        + _EQUIPMENT_OF_ITEM.replace("{parent}", "repair") + ", NULL, {row}.description",
+        None,
+        "description",
+    ),
+    "equipment_check_in": (
+        6,
+        "'u' || " + _OWNER_OF_SERVICE + ", {row}.equipment_id, NULL, {row}.issues",
+        # Most check-ins are mileage only; they have nothing to search.
+        "coalesce({row}.issues, '') != ''",
+        "issues",
+    ),
+}
+
+# Control characters mark matched terms in snippets; templates turn them into <mark> after escaping.
+HIGHLIGHT_OPEN = "\x02"
+HIGHLIGHT_CLOSE = "\x03"
+
+# FTS matches from the start of a word only; a single short token may also be the
+# middle or tail of a VIN or machine code (the last digits read off a plate).
+CODE_FRAGMENT_MAX = 17
+
+SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "owner, equipment_id UNINDEXED, title, body, "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+)
+
+
+def _trigger_ddl(table, kind, columns, condition, watched):
+    def document(row):
+        where = f" WHERE {condition.format(row=row)}" if condition else ""
+        return (
+            f"INSERT INTO search_index(rowid, owner, equipment_id, title, body) "
+            f"SELECT {row}.id * 8 + {kind}, {columns.format(row=row)}{where};"
+        )
+
+    delete = f"DELETE FROM search_index WHERE rowid = old.id * 8 + {kind};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {document('new')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {watched} ON {table} "
+        f"BEGIN {delete} {document('new')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END",
+    ]
+
+
+def search_available(bind=None):
+    bind = bind if bind is not None else db.engine
+    return bind.dialect.name == "sqlite"
+
+
+def install_search_index(connection):
+    """Create the FTS table and the triggers that keep it in step with the base tables."""
+    connection.exec_driver_sql(SEARCH_INDEX_DDL)
+    for table, source in SOURCES.items():
+        for statement in _trigger_ddl(table, *source):
+            connection.exec_driver_sql(statement)
+
+
+def search_index_exists(connection):
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='search_index'"
+    ).first() is not None
+
+
+@event.listens_for(db.metadata, "after_create")
+def _create_search_index(metadata, connection, **kw):
+    if search_available(connection):
+        install_search_index(connection)
+
+
+@event.listens_for(db.metadata, "before_drop")
+def _drop_search_index(metadata, connection, **kw):
+    if search_available(connection):
+        connection.exec_driver_sql("DROP TABLE IF EXISTS search_index")
+
+
+def rebuild_search_index():
+    """Re-index every searchable row from scratch; returns the number of documents."""
+    with db.engine.begin() as connection:
+        install_search_index(connection)
+        connection.exec_driver_sql("DELETE FROM search_index")
+        for table, (kind, columns, condition, _) in SOURCES.items():
+            where = f" WHERE {condition.format(row='src')}" if condition else ""
+            connection.exec_driver_sql(
+                f"INSERT INTO search_index(rowid, owner, equipment_id, title, body) "
+                f"SELECT src.id * 8 + {kind}, {columns.format(row='src')} FROM {table} AS src{where}"
+            )
+        connection.exec_driver_sql("INSERT INTO search_index(search_index) VALUES ('optimize')")
+        return connection.exec_driver_sql("SELECT count(*) FROM search_index").scalar()
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query or "")
+
+
+def fts_query(admin_user_id, query):
+    """An FTS5 query for every term as a prefix, in the owner's documents only; None without terms."""
+    terms = search_terms(query)
+    if not terms:
+        return None
+    phrases = " ".join(f'"{term}"*' for term in terms)
+    return f"owner:u{int(admin_user_id)} AND {{title body}}: ({phrases})"
+
+
+def code_fragment(query):
+    """The query when it is one short token that may sit inside a VIN or code; otherwise None."""
+    query = (query or "").strip()
+    if not query or len(query) > CODE_FRAGMENT_MAX or re.search(r"\s", query) or not re.search(r"\w", query):
+        return None
+    return query
+
+
+def search_hits(admin_user_id, query, limit=10):
+    """Best-ranked matches across equipment and history, with a highlighted snippet of each."""
+    match = fts_query(admin_user_id, query)
+    if match is None or not search_available():
+        return []
+    # Cost items and check-ins are not removed with their machine, so their documents can
+    # outlive it; the join keeps those out of the LIMIT.
+    rows = db.session.execute(
+        text(
+            "SELECT search_index.rowid AS rowid, search_index.equipment_id AS equipment_id, "
+            "search_index.title AS title, "
+            "snippet(search_index, 3, :open, :close, '...', 12) AS snippet "
+            "FROM search_index JOIN equipment ON equipment.id = search_index.equipment_id "
+            "WHERE search_index MATCH :match "
+            "ORDER BY bm25(search_index, 0.0, 0.0, 4.0, 1.0) LIMIT :limit"
+        ),
+        {"match": match, "limit": limit, "open": HIGHLIGHT_OPEN, "close": HIGHLIGHT_CLOSE},
+    )
+    return [
+        {
+            "kind": SEARCH_KINDS[row.rowid % 8],
+            "id": row.rowid // 8,
+            "equipment_id": row.equipment_id,
+            "title": row.title,
+            "snippet": row.snippet,
+        }
+        for row in rows
+    ]
+
+
+def matching_equipment_ids(admin_user_id, query):
+    """Ids of the owner's machines whose details or history match, as a subquery."""
+    match = fts_query(admin_user_id, query)
+    if match is None:
+        return None
+    return (
+        text("SELECT equipment_id FROM search_index WHERE search_index MATCH :match")
+        .bindparams(match=match)
+        .columns(column("equipment_id", Integer))
+    )
+
+
+def equipment_search_filter(admin_user_id, query):
+    """Filter for the equipment list: the FTS index on SQLite, a LIKE scan elsewhere.
+
+    On SQLite a single short token is also matched anywhere in the code and VIN,
+    which only scans the owner's machines the list is already limited to.
+    """
+    if search_available():
+        conditions = []
+        subquery = matching_equipment_ids(admin_user_id, query)
+        if subquery is not None:
+            conditions.append(Equipment.id.in_(subquery))
+        fragment = code_fragment(query)
+        if fragment is not None:
+            conditions.append(Equipment.code.icontains(fragment, autoescape=True))
+            conditions.append(Equipment.vin_number.icontains(fragment, autoescape=True))
+        return or_(*conditions) if conditions else None
+    like = f"%{query}%"
+    return or_(
+        Equipment.type.ilike(like),
+        Equipment.code.ilike(like),
+        Equipment.make.ilike(like),
+        Equipment.model.ilike(like),
+        Equipment.vin_number.ilike(like),
+    )
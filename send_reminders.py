@@ -1,87 +1,162 @@
-﻿import os
-import smtplib
+﻿import itertools
+import os
+import time
 from datetime import datetime, timedelta
-from email.message import EmailMessage
 
-from app import app
-from db import db
-from models import AdminUser, Equipment, Service
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 
+from app import create_cli_app
+from db import db
+from mailer import build_message, deliver, smtp_settings
+from models import AdminUser, Equipment, EquipmentDue, ReminderDelivery
 
-def send_email(to_address, subject, body):
-    host = os.environ.get("SMTP_HOST")
-    port = int(os.environ.get("SMTP_PORT", "587"))
-    username = os.environ.get("SMTP_USER")
-    password = os.environ.get("SMTP_PASSWORD")
-    sender = os.environ.get("SMTP_FROM") or username
-    use_tls = os.environ.get("SMTP_TLS", "true").lower() == "true"
+app = create_cli_app()
 
-    if not host or not sender:
-        raise RuntimeError("SMTP_HOST and SMTP_FROM (or SMTP_USER) must be set.")
+REMINDER_BATCH_SIZE = 1000
+REMINDER_SUBJECT = "ConComply service reminders"
 
-    message = EmailMessage()
-    message["From"] = sender
-    message["To"] = to_address
-    message["Subject"] = subject
-    message.set_content(body)
 
-    with smtplib.SMTP(host, port) as server:
-        if use_tls:
-            server.starttls()
-        if username and password:
-            server.login(username, password)
-        server.send_message(message)
+def reminder_cutoff():
+    days = int(os.environ.get("REMINDER_DAYS", "7"))
+    return datetime.utcnow().date() + timedelta(days=days)
 
 
-def build_reminders():
-    days = int(os.environ.get("REMINDER_DAYS", "7"))
-    cutoff = datetime.utcnow().date() + timedelta(days=days)
-    reminders = {}
-
-    equipment_list = Equipment.query.all()
-    for equipment in equipment_list:
-        latest_service = (
-            Service.query.filter_by(equipment_id=equipment.id)
-            .order_by(Service.date.desc())
-            .first()
+def due_services_query(cutoff):
+    """Machines due on or before ``cutoff`` by date or projected mileage, joined to their owner."""
+    return (
+        select(
+            Equipment.admin_user_id,
+            AdminUser.email,
+            Equipment.code,
+            Equipment.type,
+            Equipment.mileage,
+            EquipmentDue.due_date,
+            EquipmentDue.next_service_date,
         )
-        if not latest_service or not latest_service.next_service:
-            continue
-        if latest_service.next_service > cutoff:
-            continue
-        reminders.setdefault(equipment.admin_user_id, []).append(
+        .join(EquipmentDue, EquipmentDue.equipment_id == Equipment.id)
+        .join(AdminUser, AdminUser.id == Equipment.admin_user_id)
+        .where(EquipmentDue.due_date <= cutoff)
+        .order_by(Equipment.admin_user_id, EquipmentDue.due_date, Equipment.id)
+    )
+
+
+def iter_reminders(cutoff=None, batch_size=REMINDER_BATCH_SIZE):
+    """Yield ``(email, items)`` per owner from one streamed query.
+
+    Rows arrive ordered by owner and are fetched ``batch_size`` at a time, so
+    memory is bounded by the largest single owner's list.
+    """
+    result = db.session.execute(
+        due_services_query(cutoff or reminder_cutoff()),
+        execution_options={"yield_per": batch_size},
+    )
+    current_user_id = current_email = None
+    items = []
+    for row in result:
+        if row.admin_user_id != current_user_id:
+            if items:
+                yield current_email, items
+            current_user_id, current_email, items = row.admin_user_id, row.email, []
+        items.append(
             {
-                "code": equipment.code,
-                "type": equipment.type,
-                "next_service": latest_service.next_service,
-                "mileage": equipment.mileage,
+                "code": row.code,
+                "type": row.type,
+                "next_service": row.due_date,
+                "projected": row.due_date != row.next_service_date,
+                "mileage": row.mileage,
             }
         )
+    if items:
+        yield current_email, items
+
+
+def reminder_body(items):
+    lines = [
+        "Upcoming service reminders:",
+        "",
+    ]
+    for item in items:
+        mileage = item["mileage"] if item["mileage"] is not None else "N/A"
+        line = f"- {item['code']} ({item['type']}) | Next service: {item['next_service']} | Mileage: {mileage}"
+        if item.get("projected"):
+            line += " (projected from mileage)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def sent_recipients(send_date):
+    return {
+        row[0]
+        for row in db.session.execute(
+            select(ReminderDelivery.recipient).where(
+                ReminderDelivery.send_date == send_date,
+                ReminderDelivery.status == "sent",
+            )
+        )
+    }
 
-    return reminders
+
+def record_delivery(session, result, send_date):
+    delivery = session.execute(
+        select(ReminderDelivery).where(
+            ReminderDelivery.recipient == result.recipient,
+            ReminderDelivery.send_date == send_date,
+        )
+    ).scalar_one_or_none()
+    if delivery is None:
+        delivery = ReminderDelivery(recipient=result.recipient, send_date=send_date, attempts=0)
+        session.add(delivery)
+    delivery.status = "sent" if result.ok else "failed"
+    delivery.attempts += result.attempts
+    delivery.error = result.error
+    session.commit()
 
 
 def main():
+    send_date = datetime.utcnow().date()
+    counts = {"sent": 0, "failed": 0, "skipped": 0}
+
     with app.app_context():
-        reminders = build_reminders()
-        if not reminders:
-            print("No upcoming services within the reminder window.")
-            return
-
-        for user_id, items in reminders.items():
-            user = AdminUser.query.filter_by(id=user_id).first()
-            if not user:
-                continue
-            lines = [
-                "Upcoming service reminders:",
-                "",
-            ]
-            for item in items:
-                mileage = item["mileage"] if item["mileage"] is not None else "N/A"
-                lines.append(f"- {item['code']} ({item['type']}) | Next service: {item['next_service']} | Mileage: {mileage}")
-            body = "\n".join(lines)
-            send_email(user.email, "ConComply service reminders", body)
-            print(f"Sent reminder to {user.email}")
+        already_sent = sent_recipients(send_date)
+
+        def pending():
+            for email, items in iter_reminders():
+                if email in already_sent:
+                    counts["skipped"] += 1
+                    continue
+                yield email, items
+
+        reminders = pending()
+        first = next(reminders, None)
+        started = time.perf_counter()
+        if first is not None:
+            # Only a run with something to send needs SMTP configured.
+            settings = smtp_settings()
+            messages = (
+                (email, build_message(settings, email, REMINDER_SUBJECT, reminder_body(items)))
+                for email, items in itertools.chain([first], reminders)
+            )
+            # Outcomes are committed on their own session while the reminder query is still streaming.
+            with Session(db.engine) as outcomes:
+                for result in deliver(messages, settings):
+                    record_delivery(outcomes, result, send_date)
+                    if result.ok:
+                        counts["sent"] += 1
+                        print(f"Sent reminder to {result.recipient}")
+                    else:
+                        counts["failed"] += 1
+                        print(f"Failed to send reminder to {result.recipient}: {result.error}")
+        elapsed = time.perf_counter() - started
+
+    if not any(counts.values()):
+        print("No upcoming services within the reminder window.")
+        return
+    rate = counts["sent"] / elapsed if elapsed else 0.0
+    print(
+        f"{counts['sent']} sent, {counts['failed']} failed, {counts['skipped']} already sent today "
+        f"({rate:.1f} messages/s)."
+    )
 
 
 if __name__ == "__main__":
@@ -97,4 +97,33 @@
 
         updateRemoveButtons();
     }
+
+    document.querySelectorAll("[data-load-more]").forEach((button) => {
+        const target = document.querySelector(button.dataset.target);
+        button.addEventListener("click", async (event) => {
+            event.preventDefault();
+            if (button.classList.contains("is-loading")) {
+                return;
+            }
+            button.classList.add("is-loading");
+            try {
+                const response = await fetch(button.dataset.loadMore, { credentials: "same-origin" });
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                target.insertAdjacentHTML("beforeend", await response.text());
+                const nextFragment = response.headers.get("X-Next-Fragment");
+                if (nextFragment) {
+                    button.dataset.loadMore = nextFragment;
+                    button.href = response.headers.get("X-Next-Page");
+                } else {
+                    button.remove();
+                }
+            } catch (error) {
+                window.location.href = button.href;
+            } finally {
+                button.classList.remove("is-loading");
+            }
+        });
+    });
 });
@@ -0,0 +1,136 @@
+import datetime as dt
+
+from sqlalchemy import func, select, true, update
+
+from db import db
+from models import Equipment, EquipmentDue, Service, Repair, OwnerStats
+
+
+def _today():
+    return dt.datetime.utcnow().date()
+
+
+def overdue_count_query(admin_user_id, today):
+    """Machines whose date- or mileage-based due date is before ``today``."""
+    return (
+        select(func.count(EquipmentDue.equipment_id))
+        .where(EquipmentDue.admin_user_id == admin_user_id, EquipmentDue.due_date < today)
+        .scalar_subquery()
+    )
+
+
+def compute_owner_stats(admin_user_id, today=None):
+    """Aggregate every dashboard figure for one owner in a single query."""
+    today = today or _today()
+    services = (
+        select(
+            func.count(Service.id).label("service_count"),
+            func.coalesce(func.sum(Service.service_cost), 0.0).label("service_cost_total"),
+        )
+        .join(Equipment, Service.equipment_id == Equipment.id)
+        .where(Equipment.admin_user_id == admin_user_id)
+        .subquery()
+    )
+    repairs = (
+        select(
+            func.count(Repair.id).label("repair_count"),
+            func.coalesce(func.sum(Repair.repair_cost), 0.0).label("repair_cost_total"),
+        )
+        .join(Equipment, Repair.equipment_id == Equipment.id)
+        .where(Equipment.admin_user_id == admin_user_id)
+        .subquery()
+    )
+    row = db.session.execute(
+        select(
+            select(func.count(Equipment.id))
+            .where(Equipment.admin_user_id == admin_user_id)
+            .scalar_subquery()
+            .label("equipment_count"),
+            services.c.service_count,
+            services.c.service_cost_total,
+            repairs.c.repair_count,
+            repairs.c.repair_cost_total,
+            overdue_count_query(admin_user_id, today).label("overdue_count"),
+        ).select_from(services.join(repairs, true()))
+    ).one()
+    return {**row._asdict(), "overdue_as_of": today}
+
+
+def _insert_owner_stats(admin_user_id):
+    stats = OwnerStats(admin_user_id=admin_user_id, **compute_owner_stats(admin_user_id))
+    db.session.add(stats)
+    return stats
+
+
+def apply_owner_stats_delta(admin_user_id, **deltas):
+    """Adjust the summary row inside the caller's transaction.
+
+    Deltas are applied as ``column = column + delta`` so concurrent writers do
+    not overwrite each other. If the owner has no row yet it is built from the
+    base tables, which already include the caller's flushed changes.
+    """
+    values = {name: getattr(OwnerStats, name) + delta for name, delta in deltas.items()}
+    values["updated_at"] = dt.datetime.utcnow()
+    result = db.session.execute(
+        update(OwnerStats).where(OwnerStats.admin_user_id == admin_user_id).values(**values),
+        execution_options={"synchronize_session": False},
+    )
+    if result.rowcount == 0:
+        _insert_owner_stats(admin_user_id)
+
+
+def refresh_overdue_count(admin_user_id, today=None):
+    today = today or _today()
+    db.session.execute(
+        update(OwnerStats)
+        .where(OwnerStats.admin_user_id == admin_user_id)
+        .values(overdue_count=overdue_count_query(admin_user_id, today), overdue_as_of=today),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def equipment_totals(equipment_id):
+    """Counts and costs one machine contributes, read before it is deleted."""
+    service_count, service_cost = db.session.execute(
+        select(func.count(Service.id), func.coalesce(func.sum(Service.service_cost), 0.0))
+        .where(Service.equipment_id == equipment_id)
+    ).one()
+    repair_count, repair_cost = db.session.execute(
+        select(func.count(Repair.id), func.coalesce(func.sum(Repair.repair_cost), 0.0))
+        .where(Repair.equipment_id == equipment_id)
+    ).one()
+    return {
+        "service_count": service_count,
+        "service_cost_total": float(service_cost),
+        "repair_count": repair_count,
+        "repair_cost_total": float(repair_cost),
+    }
+
+
+def get_owner_stats(admin_user_id):
+    """Read the dashboard summary; overdue counts are refreshed once per day."""
+    stats = db.session.get(OwnerStats, admin_user_id)
+    if stats is None:
+        stats = _insert_owner_stats(admin_user_id)
+        db.session.commit()
+    elif stats.overdue_as_of != _today():
+        refresh_overdue_count(admin_user_id)
+        db.session.commit()
+        db.session.refresh(stats)
+    return stats
+
+
+def rebuild_owner_stats():
+    """Recompute every owner's summary from the base tables."""
+    owner_ids = {row[0] for row in db.session.execute(select(Equipment.admin_user_id).distinct())}
+    owner_ids.update(row[0] for row in db.session.execute(select(OwnerStats.admin_user_id)))
+    for admin_user_id in sorted(owner_ids):
+        values = compute_owner_stats(admin_user_id)
+        stats = db.session.get(OwnerStats, admin_user_id)
+        if stats is None:
+            db.session.add(OwnerStats(admin_user_id=admin_user_id, **values))
+        else:
+            for name, value in values.items():
+                setattr(stats, name, value)
+    db.session.commit()
+    return len(owner_ids)
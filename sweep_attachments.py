@@ -0,0 +1,35 @@
+import argparse
+
+from app import create_cli_app
+from attachments import BLOB_GRACE_SECONDS, sweep_blobs
+from db import db
+
+app = create_cli_app()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Delete released attachment blobs, blob files no attachment refers to, and abandoned uploads."
+    )
+    parser.add_argument(
+        "--grace",
+        type=int,
+        default=BLOB_GRACE_SECONDS,
+        help="Leave files written within this many seconds, in case their upload is still in progress.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with app.app_context():
+        db.create_all()
+        counts = sweep_blobs(app.config["UPLOAD_FOLDER"], args.grace)
+    print(
+        f"Deleted {counts['released']} released blob(s), {counts['unreferenced']} unreferenced blob file(s) "
+        f"and {counts['temporary']} abandoned upload(s)."
+    )
+
+
+if __name__ == "__main__":
+    main()
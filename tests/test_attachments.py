@@ -0,0 +1,20 @@
+from attachments import content_matches_extension
+
+
+def test_text_in_single_byte_encodings_is_accepted():
+    assert content_matches_extension("Café receipt – total".encode("cp1252"), "txt")
+    assert content_matches_extension("Café receipt – total".encode("latin-1", "replace"), "txt")
+
+
+def test_utf16_text_is_accepted():
+    assert content_matches_extension("Café receipt – total".encode("utf-16"), "txt")
+    assert content_matches_extension(b"\xfe\xff" + "notes".encode("utf-16-be"), "txt")
+
+
+def test_utf8_text_is_accepted():
+    assert content_matches_extension("Café receipt – total".encode("utf-8"), "txt")
+
+
+def test_binary_renamed_to_txt_is_rejected():
+    assert not content_matches_extension(b"MZ\x90\x00\x03\x00\x00\x00", "txt")
+    assert not content_matches_extension(b"\x89PNG\r\n\x1a\n\x00\x00", "txt")
@@ -0,0 +1,129 @@
+import atexit
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from attachments import blob_key
+
+# Longest edge in pixels for each rendition served by the thumbnail routes.
+THUMBNAIL_SIZES = {
+    "thumb": 320,
+    "preview": 1280,
+}
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Attachments with these extensions get thumbnails and previews.
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def is_image_filename(filename):
+    if "." not in filename:
+        return False
+    ext = filename.rsplit(".", 1)[1].lower()
+    return ext in IMAGE_EXTENSIONS
+
+
+def thumbnail_format():
+    name = os.environ.get("THUMBNAIL_FORMAT", "webp").lower()
+    return name if name in FORMATS else "webp"
+
+
+def thumbnail_key(stored_name):
+    """Blob hash for content-addressed files, the random stored name for older uploads."""
+    return blob_key(stored_name) or stored_name.replace(".", "_")
+
+
+def thumbnail_path(root, stored_name, size, fmt):
+    key = thumbnail_key(stored_name)
+    return os.path.join(root, "thumbs", size, key[:2], key[2:4], f"{key}.{fmt}")
+
+
+def _render(source_path, target_path, edge, fmt):
+    # Pillow is only loaded by processes that actually render.
+    from PIL import Image, ImageOps
+
+    pil_format, _, options = FORMATS[fmt]
+    with Image.open(source_path) as image:
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale, which skips most of the work for phone photos.
+        image.draft("RGB", (edge, edge))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "RGBA") or (fmt == "jpeg" and image.mode == "RGBA"):
+            image = image.convert("RGBA" if fmt == "webp" and "A" in image.getbands() else "RGB")
+        directory = os.path.dirname(target_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                image.save(handle, pil_format, **options)
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def render_thumbnails(root, stored_name, fmt):
+    """Build every missing rendition of one image; runs in a pool worker."""
+    source_path = os.path.join(root, stored_name)
+    for size, edge in THUMBNAIL_SIZES.items():
+        target_path = thumbnail_path(root, stored_name, size, fmt)
+        if not os.path.exists(target_path):
+            _render(source_path, target_path, edge, fmt)
+
+
+def ensure_thumbnail(root, stored_name, size, fmt):
+    """Path of a rendition, rendering it inline if the pool has not produced it yet."""
+    target_path = thumbnail_path(root, stored_name, size, fmt)
+    if not os.path.exists(target_path):
+        _render(os.path.join(root, stored_name), target_path, THUMBNAIL_SIZES[size], fmt)
+    return target_path
+
+
+def remove_thumbnails(root, stored_name):
+    """Delete every rendition of an attachment, in every size and format."""
+    for size in THUMBNAIL_SIZES:
+        for fmt in FORMATS:
+            try:
+                os.remove(thumbnail_path(root, stored_name, size, fmt))
+            except FileNotFoundError:
+                pass
+
+
+def prune_thumbnails(root, stored_names):
+    """Delete renditions that belong to none of ``stored_names``; returns how many were removed."""
+    keys = {thumbnail_key(stored_name) for stored_name in stored_names}
+    removed = 0
+    for size in THUMBNAIL_SIZES:
+        for directory, _, names in os.walk(os.path.join(root, "thumbs", size)):
+            for name in names:
+                key, _, fmt = name.rpartition(".")
+                if fmt in FORMATS and key not in keys:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+    return removed
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=int(os.environ.get("THUMBNAIL_WORKERS", "2")))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def queue_thumbnails(root, stored_names, fmt=None):
+    """Render thumbnails for freshly committed image uploads in the background."""
+    fmt = fmt or thumbnail_format()
+    return [_get_pool().submit(render_thumbnails, root, stored_name, fmt) for stored_name in stored_names]
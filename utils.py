@@ -1,5 +1,5 @@
 from werkzeug.security import generate_password_hash, check_password_hash
-from pypdf import PdfReader
+from pdf_text import extract_text, pdf_text_settings
 
 # hashing password
 def hash_password(password:str) -> str:
@@ -9,9 +9,7 @@ def hash_password(password:str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return check_password_hash(hashed, password)
 
+# extracts a PDF's text, cached by content hash; use pdf_text.iter_page_text to stream pages
 def pdfs(pdf_file):
-    reader = PdfReader(pdf_file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
\ No newline at end of file
+    settings = pdf_text_settings()
+    return extract_text(pdf_file, settings["workers"], settings["cache_dir"])
\ No newline at end of file
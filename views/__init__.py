@@ -0,0 +1,25 @@
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from views import accounts, audit_log, checkins, equipment, maintenance
+from views.common import (
+    csrf_protect,
+    discard_uploads,
+    highlight_filter,
+    inject_csrf_token,
+    inject_current_user,
+    upload_too_large,
+)
+
+BLUEPRINTS = (accounts.bp, audit_log.bp, equipment.bp, maintenance.bp, checkins.bp)
+
+
+def register_views(app):
+    """Attach the request hooks, template helpers and every blueprint to ``app``."""
+    app.context_processor(inject_csrf_token)
+    app.context_processor(inject_current_user)
+    app.add_template_filter(highlight_filter, "highlight")
+    app.teardown_request(discard_uploads)
+    app.register_error_handler(RequestEntityTooLarge, upload_too_large)
+    app.before_request(csrf_protect)
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
@@ -0,0 +1,133 @@
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+
+from audit import log_action
+from db import db
+from due import due_soon
+from models import AdminUser
+from stats import get_owner_stats
+from utils import hash_password, verify_password
+from views.common import admin_required, invalidate_user_cache, login_required
+
+bp = Blueprint("accounts", __name__)
+
+
+@bp.route("/dashboard", methods=["GET", "POST"])
+@login_required
+def dashboard(user):
+    if request.method == "GET":
+        stats = get_owner_stats(user.id)
+        return render_template(
+            "dashboard.html",
+            user=user,
+            equipment_count=stats.equipment_count,
+            service_count=stats.service_count,
+            repair_count=stats.repair_count,
+            total_cost=stats.service_cost_total + stats.repair_cost_total,
+            overdue_count=stats.overdue_count,
+            due_soon=due_soon(user.id),
+        )
+    return redirect(url_for("accounts.dashboard"))
+
+
+@bp.route("/")
+def index():
+    return render_template("index.html")
+
+
+@bp.route("/login", methods=["GET", "POST"])
+def login():
+    if request.method == "GET":
+        return render_template("login.html")
+    else:
+        email = request.form.get("email")
+        password = request.form.get("password")
+
+        user = AdminUser.query.filter_by(email=email).first()
+        if not user:
+            flash("User not found!", "error")
+            return redirect(url_for("accounts.login"))
+
+        if user and verify_password(password, user.password_hash):
+            session["user_id"] = user.id
+            invalidate_user_cache(user.id)
+            log_action(user, "login", "admin_user", user.id)
+            db.session.commit()
+            return redirect(url_for("accounts.dashboard"))
+        else:
+            flash("Wrong password!", "error")
+            return redirect(url_for("accounts.login"))
+
+
+@bp.route("/logout")
+def logout():
+    session.pop("user_id", None)
+    flash("Logged out successfully!", "success")
+    return redirect(url_for("accounts.login"))
+
+
+@bp.route("/registration", methods=["GET", "POST"])
+def registration():
+    if request.method == "GET":
+        return render_template("registration.html")
+    else:
+        email = request.form.get("email")
+        password = request.form.get("password")
+        confirm_password = request.form.get("confirm_password")
+
+        if password != confirm_password:
+            flash("Password do not match!", "error")
+            return redirect(url_for("accounts.registration"))
+        if not email or not password:
+            flash("Email and password are required.", "error")
+            return redirect(url_for("accounts.registration"))
+        if len(password) < 8:
+            flash("Password must be at least 8 characters.", "error")
+            return redirect(url_for("accounts.registration"))
+        existing_user = AdminUser.query.filter_by(email=email).first()
+        if existing_user:
+            flash("Account already exists. Please log in.", "error")
+            return redirect(url_for("accounts.login"))
+        else:
+            new_user = AdminUser(email=email, password_hash=hash_password(password), role="admin")
+            db.session.add(new_user)
+            db.session.flush()
+            log_action(new_user, "create", "admin_user", new_user.id, "self-registration")
+            db.session.commit()
+
+    return redirect(url_for("accounts.login"))
+
+
+@bp.route("/team", methods=["GET", "POST"])
+@admin_required
+def team(user):
+    if request.method == "GET":
+        team_members = AdminUser.query.order_by(AdminUser.registration_date.desc()).all()
+        return render_template("team.html", user=user, team_members=team_members)
+
+    email = request.form.get("email")
+    password = request.form.get("password")
+    role = request.form.get("role", "tech")
+
+    if not email or not password:
+        flash("Email and password are required.", "error")
+        return redirect(url_for("accounts.team"))
+    if role not in ("admin", "tech"):
+        flash("Invalid role.", "error")
+        return redirect(url_for("accounts.team"))
+    if len(password) < 8:
+        flash("Password must be at least 8 characters.", "error")
+        return redirect(url_for("accounts.team"))
+
+    existing_user = AdminUser.query.filter_by(email=email).first()
+    if existing_user:
+        flash("User already exists.", "error")
+        return redirect(url_for("accounts.team"))
+
+    new_user = AdminUser(email=email, password_hash=hash_password(password), role=role)
+    db.session.add(new_user)
+    db.session.flush()
+    log_action(user, "create", "admin_user", new_user.id, f"role={role}")
+    db.session.commit()
+    invalidate_user_cache(new_user.id)
+    flash("Team member created.", "success")
+    return redirect(url_for("accounts.team"))
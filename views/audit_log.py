@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, flash, redirect, render_template, request, stream_with_context, url_for
+
+from audit import (
+    AUDIT_ACTIONS,
+    AUDIT_ENTITIES,
+    audit_page,
+    audit_users,
+    iter_audit_export,
+    log_action,
+    parse_audit_filters,
+    user_emails,
+)
+from db import db
+from views.common import admin_required
+
+bp = Blueprint("audit", __name__)
+
+
+@bp.route("/audit", methods=["GET"])
+@admin_required
+def audit_log(user):
+    try:
+        filters = parse_audit_filters(request.args)
+    except ValueError as exc:
+        flash(str(exc), "error")
+        return redirect(url_for("audit.audit_log"))
+    try:
+        entries, next_cursor = audit_page(filters, user.id, request.args.get("after"))
+    except ValueError:
+        flash("Invalid audit log page.", "error")
+        return redirect(url_for("audit.audit_log"))
+    query_args = {key: value for key, value in request.args.items() if key != "after" and value}
+    return render_template(
+        "audit_log.html",
+        entries=entries,
+        emails=user_emails(entry.user_id for entry in entries),
+        next_cursor=next_cursor,
+        filters=filters,
+        query_args=query_args,
+        team_members=audit_users(user.id),
+        entities=AUDIT_ENTITIES,
+        actions=AUDIT_ACTIONS,
+    )
+
+
+@bp.route("/audit/export", methods=["GET"])
+@admin_required
+def audit_export(user):
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        flash("Unsupported export format.", "error")
+        return redirect(url_for("audit.audit_log"))
+    try:
+        filters = parse_audit_filters(request.args)
+    except ValueError as exc:
+        flash(str(exc), "error")
+        return redirect(url_for("audit.audit_log"))
+    log_action(user, "export", "audit_log", None, f"audit_{fmt}")
+    db.session.commit()
+    filename = f"audit_log_{datetime.utcnow():%Y%m%d}.{fmt}"
+    response = Response(
+        stream_with_context(iter_audit_export(filters, user.id, fmt, current_app.config["AUDIT_EXPORT_BATCH_SIZE"])),
+        mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
@@ -0,0 +1,125 @@
+from collections import Counter
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
+from sqlalchemy.exc import IntegrityError
+
+from audit import log_action
+from checkins import ingest_checkins
+from db import db
+from due import record_checkin
+from history import history_page
+from models import Equipment, EquipmentCheckIn
+from response_cache import invalidate_owner_cache
+from stats import refresh_overdue_count
+from views.common import history_fragment, login_required
+
+bp = Blueprint("checkins", __name__)
+
+
+@bp.route("/equipment/<int:equipment_id>/checkins", methods=["GET"])
+@login_required
+def equipment_checkins(user, equipment_id):
+    equipment = Equipment.query.filter_by(id=equipment_id, admin_user_id=user.id).first()
+    if not equipment:
+        flash("Equipment not found.", "error")
+        return redirect(url_for("equipment.add_equipment"))
+    try:
+        checkins, next_cursor = history_page(EquipmentCheckIn, equipment_id, request.args.get("after"))
+    except ValueError:
+        flash("Invalid history page.", "error")
+        return redirect(url_for("checkins.equipment_checkins", equipment_id=equipment_id))
+    return render_template("checkins.html", equipment=equipment, checkins=checkins, next_cursor=next_cursor)
+
+
+@bp.route("/equipment/<int:equipment_id>/checkins/page", methods=["GET"])
+@login_required
+def checkin_history_page(user, equipment_id):
+    equipment = Equipment.query.filter_by(id=equipment_id, admin_user_id=user.id).first()
+    if not equipment:
+        abort(404)
+    try:
+        checkins, next_cursor = history_page(EquipmentCheckIn, equipment_id, request.args.get("after"))
+    except ValueError:
+        abort(400)
+    return history_fragment(
+        "_checkin_rows.html", "checkins.equipment_checkins", "checkins.checkin_history_page", equipment, next_cursor, checkins=checkins
+    )
+
+
+@bp.route("/checkin/<token>", methods=["GET", "POST"])
+def equipment_checkin(token):
+    equipment = Equipment.query.filter_by(qr_token=token).first()
+    if not equipment:
+        flash("Invalid or expired check-in link.", "error")
+        return redirect(url_for("accounts.index"))
+    if request.method == "GET":
+        return render_template("checkin.html", equipment=equipment)
+
+    mileage = request.form.get("mileage")
+    issues = request.form.get("issues")
+    try:
+        checkin = EquipmentCheckIn(
+            equipment_id=equipment.id,
+            mileage=int(mileage) if mileage else None,
+            issues=issues,
+            created_at=datetime.utcnow(),
+        )
+        db.session.add(checkin)
+        if mileage:
+            equipment.mileage = int(mileage)
+            record_checkin(equipment, checkin.mileage, checkin.created_at)
+            refresh_overdue_count(equipment.admin_user_id)
+        log_action(None, "checkin", "equipment", equipment.id, "qr", owner_id=equipment.admin_user_id)
+        owner_id = equipment.admin_user_id
+        db.session.commit()
+        invalidate_owner_cache(owner_id)
+        flash("Check-in submitted. Thank you!", "success")
+        return redirect(url_for("checkins.equipment_checkin", token=token))
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Error saving check-in")
+        flash("Error submitting check-in. Please try again.", "error")
+        return redirect(url_for("checkins.equipment_checkin", token=token))
+
+
+@bp.route("/api/checkins", methods=["POST"])
+def api_checkins():
+    payload = request.get_json(silent=True)
+    items = payload.get("checkins") if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        return jsonify(error='Expected a JSON object with a "checkins" list.'), 400
+    limit = current_app.config["CHECKIN_BATCH_LIMIT"]
+    if len(items) > limit:
+        return jsonify(error=f"At most {limit} check-ins per request."), 413
+
+    # A concurrent retry of the same batch can win the insert; the second pass sees its rows as duplicates.
+    for attempt in range(2):
+        try:
+            results, created = ingest_checkins(items)
+            for equipment, count in created.items():
+                log_action(None, "checkin", "equipment", equipment.id, f"api:{count}", owner_id=equipment.admin_user_id)
+            owner_ids = {equipment.admin_user_id for equipment in created}
+            for admin_user_id in owner_ids:
+                refresh_overdue_count(admin_user_id)
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                current_app.logger.exception("Error saving check-in batch")
+                return jsonify(error="Error saving check-ins. Please retry."), 500
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Error saving check-in batch")
+            return jsonify(error="Error saving check-ins. Please retry."), 500
+    for admin_user_id in owner_ids:
+        invalidate_owner_cache(admin_user_id)
+
+    counts = Counter(result["status"] for result in results)
+    return jsonify(
+        created=counts["created"],
+        duplicate=counts["duplicate"],
+        rejected=counts["rejected"],
+        results=results,
+    )
@@ -0,0 +1,144 @@
+import secrets
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import current_app, flash, g, make_response, redirect, render_template, request, session, url_for
+from markupsafe import Markup, escape
+
+from attachments import FileTooLarge
+from db import db
+from models import AdminUser
+from search import HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN
+
+
+def generate_csrf_token():
+    token = session.get("_csrf_token")
+    if not token:
+        token = secrets.token_urlsafe(32)
+        session["_csrf_token"] = token
+    return token
+
+
+def inject_csrf_token():
+    return {"csrf_token": generate_csrf_token()}
+
+
+def inject_current_user():
+    return {"current_user": load_current_user()}
+
+
+def highlight_filter(snippet):
+    """Escape a search snippet and mark the matched terms."""
+    escaped = str(escape(snippet or ""))
+    return Markup(escaped.replace(HIGHLIGHT_OPEN, "<mark>").replace(HIGHLIGHT_CLOSE, "</mark>"))
+
+
+def discard_uploads(exc=None):
+    # Parts that were not committed into the store (rejected, or a failed request) are removed.
+    for upload in request.__dict__.get("upload_blobs", ()):
+        upload.discard()
+
+
+def upload_too_large(exc):
+    if isinstance(exc, FileTooLarge):
+        flash(exc.description, "error")
+    else:
+        flash(f"Uploads must total at most {current_app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB per request.", "error")
+    return redirect(request.referrer or url_for("accounts.dashboard"))
+
+
+# JSON endpoints authenticated by QR tokens in the body rather than the session cookie.
+CSRF_EXEMPT_ENDPOINTS = {"checkins.api_checkins"}
+
+
+def csrf_protect():
+    if request.method == "POST" and request.endpoint not in CSRF_EXEMPT_ENDPOINTS:
+        session_token = session.get("_csrf_token")
+        form_token = request.form.get("csrf_token")
+        if not session_token or not form_token or session_token != form_token:
+            flash("Invalid CSRF token. Please try again.", "error")
+            return redirect(request.referrer or url_for("accounts.login"))
+
+
+def history_fragment(template, page_endpoint, fragment_endpoint, equipment, next_cursor, **context):
+    """Table rows for a "load more" request; the headers point at the page after it."""
+    response = make_response(render_template(template, equipment=equipment, **context))
+    if next_cursor:
+        response.headers["X-Next-Page"] = url_for(page_endpoint, equipment_id=equipment.id, after=next_cursor)
+        response.headers["X-Next-Fragment"] = url_for(fragment_endpoint, equipment_id=equipment.id, after=next_cursor)
+    return response
+
+
+# Snapshot of the fields views and templates read from the logged-in user.
+SessionUser = namedtuple("SessionUser", ["id", "email", "role"])
+
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+
+def invalidate_user_cache(user_id=None):
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(user_id, None)
+
+
+def _load_user(user_id):
+    ttl = current_app.config["USER_CACHE_TTL"]
+    if ttl <= 0:
+        record = db.session.get(AdminUser, user_id)
+        return SessionUser(record.id, record.email, record.role) if record else None
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+    if entry and entry[0] > now:
+        return entry[1]
+    record = db.session.get(AdminUser, user_id)
+    if not record:
+        return None
+    user = SessionUser(record.id, record.email, record.role)
+    with _user_cache_lock:
+        _user_cache[user_id] = (now + ttl, user)
+    return user
+
+
+def load_current_user():
+    """Resolve the session user once per request; decorators and templates share it.
+
+    Views get a read-only SessionUser (id, email, role), not the AdminUser model,
+    whatever USER_CACHE_TTL is; anything else about the account has to be queried.
+    With USER_CACHE_TTL > 0 the snapshot is also kept in-process for that many
+    seconds, so most requests skip the lookup entirely.
+    """
+    if "current_user" not in g:
+        user_id = session.get("user_id")
+        g.current_user = _load_user(user_id) if user_id else None
+    return g.current_user
+
+
+def login_required(view_func):
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        user = load_current_user()
+        if not user:
+            flash("Please log in!", "error")
+            return redirect(url_for("accounts.login"))
+        return view_func(user, *args, **kwargs)
+    return wrapper
+
+
+def admin_required(view_func):
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        user = load_current_user()
+        if not user:
+            flash("Please log in!", "error")
+            return redirect(url_for("accounts.login"))
+        if user.role != "admin":
+            flash("Admin access required.", "error")
+            return redirect(url_for("accounts.dashboard"))
+        return view_func(user, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,323 @@
+from datetime import datetime
+import os
+import secrets
+import time
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    flash,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    stream_with_context,
+    url_for,
+)
+from markupsafe import Markup
+from sqlalchemy.exc import IntegrityError
+
+from attachments import delete_equipment_attachments, remove_files
+from audit import log_action
+from db import db
+from dropbox_folders import enqueue_folder
+from due import record_equipment
+from models import DropboxFolderJob, Equipment, EquipmentDue, Repair, Service
+from qr_codes import (
+    DEFAULT_BOX_SIZE,
+    MAX_BOX_SIZE,
+    MIN_BOX_SIZE,
+    QR_FORMATS,
+    cached_qr,
+    qr_key,
+    render_sheet_pages,
+    render_sheet_pdf,
+    sheet_pages,
+)
+from reports import iter_equipment_report, iter_fleet_export
+from response_cache import invalidate_owner_cache
+from search import equipment_search_filter, search_hits
+from stats import apply_owner_stats_delta, equipment_totals, refresh_overdue_count
+from views.common import admin_required, generate_csrf_token, login_required
+
+bp = Blueprint("equipment", __name__)
+
+QR_MAX_AGE = 7 * 24 * 3600
+# Cached list fragments are shared by all of an owner's sessions; each response fills in its own token.
+CSRF_PLACEHOLDER = "__csrf_token__"
+
+
+def equipment_list_query(user, search, equipment_type, sort):
+    """The owner's equipment with the search, type filter and sort of the equipment list."""
+    query = Equipment.query.filter_by(admin_user_id=user.id)
+    if search:
+        condition = equipment_search_filter(user.id, search)
+        if condition is not None:
+            query = query.filter(condition)
+    if equipment_type:
+        query = query.filter(Equipment.type == equipment_type)
+
+    if sort == "code":
+        return query.order_by(Equipment.code.asc())
+    if sort == "make":
+        return query.order_by(Equipment.make.asc())
+    return query.order_by(Equipment.type.asc(), Equipment.code.asc())
+
+
+def equipment_types_of(user):
+    return [
+        row[0]
+        for row in db.session.query(Equipment.type)
+        .filter_by(admin_user_id=user.id)
+        .distinct()
+        .order_by(Equipment.type.asc())
+        .all()
+    ]
+
+
+def render_equipment_list(user, search, equipment_type, sort):
+    """The search matches and equipment table, with a placeholder where the session's CSRF token goes."""
+    equipment_list = equipment_list_query(user, search, equipment_type, sort).all()
+    codes = {equipment.id: equipment.code for equipment in equipment_list}
+    matches = [
+        dict(hit, code=codes[hit["equipment_id"]])
+        for hit in (search_hits(user.id, search) if search else [])
+        if hit["equipment_id"] in codes
+    ]
+    return render_template(
+        "_equipment_list.html", equipment_list=equipment_list, matches=matches, csrf_token=CSRF_PLACEHOLDER
+    )
+
+
+@bp.route("/add_equipment", methods=["GET", "POST"])
+@login_required
+def add_equipment(user):
+    if request.method == "POST" and user.role != "admin":
+        flash("Admin access required.", "error")
+        return redirect(url_for("equipment.add_equipment"))
+    if request.method == "GET":
+        search = request.args.get("search", "").strip()
+        equipment_type = request.args.get("type", "").strip()
+        sort = request.args.get("sort", "type")
+
+        cache = current_app.extensions["response_cache"]
+        started = time.perf_counter()
+        equipment_types, types_hit = cache.fetch(user.id, "equipment_types", [], lambda: equipment_types_of(user))
+        list_html, list_hit = cache.fetch(
+            user.id,
+            "equipment_list",
+            [search, equipment_type, sort, user.role],
+            lambda: render_equipment_list(user, search, equipment_type, sort),
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        response = make_response(
+            render_template(
+                "add_equipment.html",
+                equipment_list_html=Markup(list_html.replace(CSRF_PLACEHOLDER, generate_csrf_token())),
+                equipment_types=equipment_types,
+                search=search,
+                equipment_type=equipment_type,
+                sort=sort,
+            )
+        )
+        response.headers["X-Cache"] = "hit" if types_hit and list_hit else "miss"
+        response.headers["Server-Timing"] = f"cache;dur={elapsed:.2f}"
+        return response
+    elif request.method == "POST":
+        code = request.form.get("code")
+        equipment_type = request.form.get("type")
+        vin_number = request.form.get("vin_number")
+        make = request.form.get("make")
+        model = request.form.get("model")
+        mileage = request.form.get("mileage")
+        service_required = request.form.get("service_required")
+        last_service_date = request.form.get("last_service_date")
+
+        try:
+            new_equipment = Equipment(
+                admin_user_id=user.id,
+                type=equipment_type,
+                vin_number=vin_number,
+                code=code,
+                make=make,
+                model=model,
+                qr_token=secrets.token_urlsafe(16),
+                mileage=int(mileage) if mileage else None,
+                service_required=service_required,
+                last_service_date=datetime.strptime(last_service_date, "%Y-%m-%d") if last_service_date else None
+            )
+            db.session.add(new_equipment)
+            db.session.flush()
+            record_equipment(new_equipment)
+            apply_owner_stats_delta(user.id, equipment_count=1)
+            dropbox_enabled = bool(os.environ.get("DROPBOX_ACCESS_TOKEN"))
+            if dropbox_enabled:
+                enqueue_folder(new_equipment)
+            log_action(user, "create", "equipment", new_equipment.id)
+            db.session.commit()
+            invalidate_owner_cache(user.id)
+            if not dropbox_enabled:
+                current_app.logger.warning("Dropbox folder not created for equipment %s: missing_access_token", new_equipment.id)
+                flash("Equipment added, but Dropbox folder could not be created.", "warning")
+            else:
+                if current_app.config["DROPBOX_WORKER"] == "thread":
+                    current_app.extensions["dropbox_worker"].notify()
+                flash("Equipment added successfully!", "success")
+            return redirect(url_for("equipment.add_equipment"))
+        except IntegrityError:
+            db.session.rollback()
+            flash("VIN number must be unique.", "error")
+            return redirect(url_for("equipment.add_equipment"))
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Error adding equipment")
+            flash("Error adding equipment. Please try again.", "error")
+            return redirect(url_for("equipment.add_equipment"))
+
+
+@bp.route("/delete_equipment/<int:equipment_id>", methods=["POST"])
+@admin_required
+def delete_equipment(user, equipment_id):
+    try:
+        equipment = Equipment.query.filter_by(id=equipment_id, admin_user_id=user.id).first()
+        if not equipment:
+            flash("Equipment not found!", "error")
+        else:
+            removed = equipment_totals(equipment_id)
+            released = delete_equipment_attachments(equipment_id)
+            Service.query.filter_by(equipment_id=equipment_id).delete()
+            Repair.query.filter_by(equipment_id=equipment_id).delete()
+            EquipmentDue.query.filter_by(equipment_id=equipment_id).delete()
+            DropboxFolderJob.query.filter_by(equipment_id=equipment_id).delete()
+            db.session.delete(equipment)
+            db.session.flush()
+            apply_owner_stats_delta(
+                user.id,
+                equipment_count=-1,
+                **{name: -value for name, value in removed.items()},
+            )
+            refresh_overdue_count(user.id)
+            log_action(user, "delete", "equipment", equipment.id)
+            db.session.commit()
+            invalidate_owner_cache(user.id)
+            remove_files(current_app.config["UPLOAD_FOLDER"], released)
+            flash("Equipment deleted successfully!", "success")
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Error deleting equipment")
+        flash("Error deleting equipment. Please try again.", "error")
+
+    return redirect(url_for("equipment.add_equipment"))
+
+
+@bp.route("/equipment/<int:equipment_id>/qr.png", defaults={"fmt": "png"})
+@bp.route("/equipment/<int:equipment_id>/qr.svg", defaults={"fmt": "svg"})
+@login_required
+def equipment_qr(user, equipment_id, fmt):
+    equipment = Equipment.query.filter_by(id=equipment_id, admin_user_id=user.id).first()
+    if not equipment:
+        flash("Equipment not found.", "error")
+        return redirect(url_for("equipment.add_equipment"))
+    if not equipment.qr_token:
+        equipment.qr_token = secrets.token_urlsafe(16)
+        log_action(user, "update", "equipment", equipment.id, "generated_qr")
+        db.session.commit()
+    box_size = request.args.get("size", DEFAULT_BOX_SIZE, type=int)
+    box_size = min(max(box_size, MIN_BOX_SIZE), MAX_BOX_SIZE)
+    checkin_url = url_for("checkins.equipment_checkin", token=equipment.qr_token, _external=True)
+    etag = f"{qr_key(checkin_url, box_size)}-{fmt}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        path = cached_qr(current_app.config["QR_CACHE_FOLDER"], checkin_url, box_size, fmt)
+        response = send_file(path, mimetype=QR_FORMATS[fmt], etag=False, max_age=QR_MAX_AGE)
+    response.set_etag(etag)
+    response.cache_control.max_age = QR_MAX_AGE
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+
+@bp.route("/equipment/qr-sheet", methods=["GET"])
+@login_required
+def equipment_qr_sheet(user):
+    fmt = request.args.get("format", "pdf")
+    if fmt not in ("pdf", "png"):
+        flash("Unsupported label sheet format.", "error")
+        return redirect(url_for("equipment.add_equipment"))
+    equipment_list = equipment_list_query(
+        user,
+        request.args.get("search", "").strip(),
+        request.args.get("type", "").strip(),
+        request.args.get("sort", "type"),
+    ).all()
+
+    # A GET must not write: tokens are set by add_equipment and migrate_features.py, and any machine
+    # still without one is left off the sheet.
+    labels = [
+        (
+            url_for("checkins.equipment_checkin", token=equipment.qr_token, _external=True),
+            f"{equipment.code} - {equipment.type}" if equipment.code else equipment.type,
+        )
+        for equipment in equipment_list
+        if equipment.qr_token
+    ]
+    if fmt == "png":
+        # A tiled PNG is a single printable page; ?page= picks which one.
+        pages = sheet_pages(labels)
+        page = min(max(request.args.get("page", 1, type=int), 1), len(pages))
+        body = render_sheet_pages(pages[page - 1])[0]
+        response = Response(body, mimetype="image/png")
+        response.headers["X-Page-Count"] = str(len(pages))
+    else:
+        body = render_sheet_pdf(labels, current_app.config["QR_SHEET_WORKERS"])
+        response = Response(body, mimetype="application/pdf")
+    filename = f"qr_labels_{datetime.utcnow():%Y%m%d}.{fmt}"
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+@bp.route("/equipment/<int:equipment_id>/report.csv", methods=["GET"])
+@login_required
+def equipment_report(user, equipment_id):
+    equipment = Equipment.query.filter_by(id=equipment_id, admin_user_id=user.id).first()
+    if not equipment:
+        flash("Equipment was not found!", "error")
+        return redirect(url_for("equipment.add_equipment"))
+
+    filename = f"{equipment.code}_report.csv".replace(" ", "_")
+    response = Response(
+        stream_with_context(iter_equipment_report(equipment, current_app.config["REPORT_PAGE_SIZE"])),
+        mimetype="text/csv",
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+@bp.route("/equipment/export", methods=["GET"])
+@login_required
+def fleet_export(user):
+    fmt = request.args.get("format", "zip")
+    if fmt not in ("zip", "csv"):
+        flash("Unsupported export format.", "error")
+        return redirect(url_for("equipment.add_equipment"))
+    log_action(user, "export", "equipment", None, f"fleet_{fmt}")
+    db.session.commit()
+    filename = f"fleet_report_{datetime.utcnow():%Y%m%d}.{fmt}"
+    response = Response(
+        stream_with_context(iter_fleet_export(user.id, fmt, current_app.config["FLEET_EXPORT_WORKERS"])),
+        mimetype="application/zip" if fmt == "zip" else "text/csv",
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+@bp.route("/equipment/cache-stats", methods=["GET"])
+@admin_required
+def response_cache_stats(user):
+    """Hit rates and latencies of this worker's response cache."""
+    cache = current_app.extensions["response_cache"]
+    return jsonify(backend=current_app.config["RESPONSE_CACHE"], ttl=cache.ttl, fragments=cache.stats())
@@ -0,0 +1,503 @@
+from datetime import datetime
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Blueprint, Response, abort, current_app, flash, redirect, render_template, request, send_file, send_from_directory, url_for
+from sqlalchemy import select
+from werkzeug.utils import secure_filename
+
+from attachments import SNIFF_BYTES, UploadBlob, add_blob_reference, blob_key, blob_path, content_matches_extension, save_blob
+from audit import log_action
+from db import db
+from due import record_service
+from history import attachments_by_parent, history_page
+from models import (
+    Equipment,
+    EquipmentCheckIn,
+    Repair,
+    RepairAttachment,
+    RepairCostItem,
+    Service,
+    ServiceAttachment,
+    ServiceCostItem,
+)
+from purchase_orders import PO_TEMPLATES, XLSX_MIMETYPE, po_data, po_filename, render_po
+from reports import cost_items_by_parent
+from response_cache import invalidate_owner_cache
+from stats import apply_owner_stats_delta, refresh_overdue_count
+from thumbnails import FORMATS, ensure_thumbnail, is_image_filename, queue_thumbnails, thumbnail_format, thumbnail_key
+from views.common import history_fragment, login_required
+
+bp = Blueprint("maintenance", __name__)
+
+ALLOWED_EXTENSIONS = {
+    "pdf", "png", "jpg", "jpeg", "gif",
+    "doc", "docx", "xls", "xlsx", "txt"
+}
+
+# Renditions are keyed by content, so clients may keep them for a year.
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+ATTACHMENT_MAX_AGE = 24 * 3600
+
+
+def allowed_file(filename):
+    if "." not in filename:
+        return False
+    ext = filename.rsplit(".", 1)[1].lower()
+    return ext in ALLOWED_EXTENSIONS
+
+
+def store_attachments(files, owner_id, attachment_model):
+    attachments = []
+    for upload in files:
+        if not upload or not upload.filename:
+            continue
+        if not allowed_file(upload.filename):
+            raise ValueError("Invalid attachment type.")
+        ext = upload.filename.rsplit(".", 1)[1].lower()
+        streamed = isinstance(upload.stream, UploadBlob)
+        if streamed:
+            head = upload.stream.head
+        else:
+            head = upload.stream.read(SNIFF_BYTES)
+            upload.stream.seek(0)
+        if not content_matches_extension(head, ext):
+            raise ValueError("Invalid attachment type.")
+        safe_name = secure_filename(upload.filename)
+        if streamed:
+            sha256, size = upload.stream.commit()
+        else:
+            sha256, size = save_blob(upload.stream, current_app.config["UPLOAD_FOLDER"])
+        add_blob_reference(sha256, size)
+        attachments.append(
+            attachment_model(
+                **owner_id,
+                original_name=safe_name,
+                stored_name=blob_path(sha256),
+            )
+        )
+    return attachments
+
+
+def queue_image_thumbnails(attachments):
+    stored_names = [attachment.stored_name for attachment in attachments if is_image_filename(attachment.original_name)]
+    if not stored_names:
+        return
+    try:
+        queue_thumbnails(current_app.config["UPLOAD_FOLDER"], stored_names)
+    except Exception:
+        # The thumbnail routes render on demand, so a failed hand-off only costs the first view.
+        current_app.logger.exception("Could not queue thumbnails")
+
+
+def owned_attachment(attachment_model, user, attachment_id):
+    """Load an attachment only if its service or repair belongs to ``user``, in one query."""
+    if attachment_model is ServiceAttachment:
+        parent, parent_id = Service, ServiceAttachment.service_id
+    else:
+        parent, parent_id = Repair, RepairAttachment.repair_id
+    return db.session.execute(
+        select(attachment_model)
+        .join(parent, parent.id == parent_id)
+        .join(Equipment, Equipment.id == parent.equipment_id)
+        .where(attachment_model.id == attachment_id, Equipment.admin_user_id == user.id)
+    ).scalar_one_or_none()
+
+
+def _attachment_cache_headers(response, etag):
+    if etag:
+        response.set_etag(etag)
+    response.cache_control.no_cache = None
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = ATTACHMENT_MAX_AGE
+    return response
+
+
+def send_attachment(attachment, as_attachment):
+    """Send an attachment, or hand the transfer to the front proxy when offload is configured.
+
+    Blob-backed attachments use their content hash as ETag, so a revalidation
+    is answered with 304 without touching the disk.
+    """
+    etag = blob_key(attachment.stored_name)
+    if etag and request.if_none_match.contains(etag):
+        return _attachment_cache_headers(Response(status=304), etag)
+    offload = current_app.config["ATTACHMENT_OFFLOAD"]
+    if offload in ("x-accel", "x-sendfile"):
+        response = Response(mimetype=mimetypes.guess_type(attachment.original_name)[0] or "application/octet-stream")
+        if offload == "x-accel":
+            prefix = current_app.config["ATTACHMENT_ACCEL_PREFIX"].rstrip("/")
+            response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(attachment.stored_name)}"
+        else:
+            response.headers["X-Sendfile"] = os.path.join(current_app.config["UPLOAD_FOLDER"], attachment.stored_name)
+        response.headers.set(
+            "Content-Disposition",
+            "attachment" if as_attachment else "inline",
+            filename=attachment.original_name,
+        )
+        response.last_modified = attachment.uploaded_at
+    else:
+        response = send_from_directory(
+            current_app.config["UPLOAD_FOLDER"],
+            attachment.stored_name,
+            as_attachment=as_attachment,
+            download_name=attachment.original_name,
+            etag=etag or True,
+            last_modified=attachment.uploaded_at,
+        )
+    return _attachment_cache_headers(response, etag)
+
+
+def send_thumbnail(attachment, size):
+    if not is_image_filename(attachment.original_name):
+        abort(404)
+    fmt = thumbnail_format()
+    etag = f"{thumbnail_key(attachment.stored_name)}-{size}-{fmt}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        try:
+            path = ensure_thumbnail(current_app.config["UPLOAD_FOLDER"], attachment.stored_name, size, fmt)
+        except (OSError, ValueError):
+            current_app.logger.warning("Thumbnail not available for %s", attachment.stored_name)
+            abort(404)
+        response = send_file(path, mimetype=FORMATS[fmt][1], etag=False, max_age=THUMBNAIL_MAX_AGE, conditional=True)
+    response.set_etag(etag)
+    response.cache_control.max_age = THUMBNAIL_MAX_AGE
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
+
+def service_history(equipment_id, cursor=None):
+    """One page of service history with the cost items and attachments of just those services."""
+    services, next_cursor = history_page(Service, equipment_id, cursor)
+    service_ids = [service.id for service in services]
+    return {
+        "services": services,
+        "attachments_by_service": attachments_by_parent(ServiceAttachment, ServiceAttachment.service_id, service_ids),
+        "cost_items_by_service": cost_items_by_parent(ServiceCostItem, ServiceCostItem.service_id, service_ids),
+        "next_cursor": next_cursor,
+    }
+
+
+def repair_history(equipment_id, cursor=None):
+    repairs, next_cursor = history_page(Repair, equipment_id, cursor)
+    repair_ids = [repair.id for repair in repairs]
+    return {
+        "repairs": repairs,
+        "attachments_by_repair": attachments_by_parent(RepairAttachment, RepairAttachment.repair_id, repair_ids),
+        "cost_items_by_repair": cost_items_by_parent(RepairCostItem, RepairCostItem.repair_id, repair_ids),
+        "next_cursor": next_cursor,
+    }
+
+
+def parse_cost_items(descriptions, amounts):
+    items = []
+    total = 0.0
+    for desc, amount in zip(descriptions, amounts):
+        desc = (desc or "").strip()
+        amount = (amount or "").strip()
+        if not desc and not amount:
+            continue
+        if not desc:
+            raise ValueError("Each cost item needs a description.")
+        if not amount:
+            raise ValueError("Each cost item needs an amount.")
+        try:
+            value = float(amount)
+        except ValueError as exc:
+            raise ValueError("Cost item amounts must be numbers.") from exc
+        items.append((desc, value))
+        total += value
+    return items, total
+
+
+@bp.route("/new_service/<int:equipment_id>", methods=["GET", "POST"])
+@login_required
+def new_service(user, equipment_id):
+    equipment = Equipment.query.filter_by(id=equipment_id, admin_user_id=user.id).first()
+    if not equipment:
+        flash("Equipment not found!", "error")
+        return redirect(url_for("equipment.add_equipment"))
+
+    if request.method == "GET":
+        try:
+            history = service_history(equipment_id, request.args.get("after"))
+        except ValueError:
+            flash("Invalid history page.", "error")
+            return redirect(url_for("maintenance.new_service", equipment_id=equipment_id))
+        recent_checkins = (
+            EquipmentCheckIn.query
+            .filter_by(equipment_id=equipment_id)
+            .order_by(EquipmentCheckIn.created_at.desc())
+            .limit(5)
+            .all()
+        )
+        return render_template(
+            "new_service.html",
+            equipment=equipment,
+            recent_checkins=recent_checkins,
+            **history,
+        )
+    elif request.method == "POST":
+        date = request.form.get("date")
+        performed_by = request.form.get("performed_by")
+        mileage = request.form.get("mileage")
+        next_service = request.form.get("next_service")
+        notes = request.form.get("notes")
+        item_descriptions = request.form.getlist("cost_item_desc")
+        item_amounts = request.form.getlist("cost_item_amount")
+
+        try:
+            cost_items, total_cost = parse_cost_items(item_descriptions, item_amounts)
+            new_service_record = Service(
+                equipment_id=equipment_id,
+                date=datetime.strptime(date, "%Y-%m-%d").date() if date else None,
+                performed_by=performed_by,
+                mileage=int(mileage) if mileage else None,
+                next_service=datetime.strptime(next_service, "%Y-%m-%d").date() if next_service else None,
+                service_cost=total_cost if cost_items else None,
+                notes=notes
+            )
+            db.session.add(new_service_record)
+            db.session.flush()
+            for desc, amount in cost_items:
+                db.session.add(ServiceCostItem(service_id=new_service_record.id, description=desc, amount=amount))
+            attachments = store_attachments(
+                request.files.getlist("attachments"),
+                {"service_id": new_service_record.id},
+                ServiceAttachment,
+            )
+            for attachment in attachments:
+                db.session.add(attachment)
+            if date:
+                equipment.last_service_date = datetime.strptime(date, "%Y-%m-%d").date()
+            if mileage:
+                equipment.mileage = int(mileage)
+            record_service(equipment, new_service_record)
+            apply_owner_stats_delta(
+                equipment.admin_user_id,
+                service_count=1,
+                service_cost_total=new_service_record.service_cost or 0.0,
+            )
+            refresh_overdue_count(equipment.admin_user_id)
+            log_action(user, "create", "service", new_service_record.id, f"equipment_id={equipment_id}")
+            db.session.commit()
+            invalidate_owner_cache(user.id)
+            queue_image_thumbnails(attachments)
+            flash("Service recorded successfully!", "success")
+            return redirect(url_for("maintenance.new_service", equipment_id=equipment_id))
+        except ValueError as exc:
+            db.session.rollback()
+            flash(str(exc), "error")
+            return redirect(url_for("maintenance.new_service", equipment_id=equipment_id))
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Error recording service")
+            flash("Error recording service. Please try again.", "error")
+            return redirect(url_for("maintenance.new_service", equipment_id=equipment_id))
+
+
+@bp.route("/new_service/<int:equipment_id>/page", methods=["GET"])
+@login_required
+def service_history_page(user, equipment_id):
+    equipment = Equipment.query.filter_by(id=equipment_id, admin_user_id=user.id).first()
+    if not equipment:
+        abort(404)
+    try:
+        history = service_history(equipment_id, request.args.get("after"))
+    except ValueError:
+        abort(400)
+    return history_fragment("_service_rows.html", "maintenance.new_service", "maintenance.service_history_page", equipment, **history)
+
+
+@bp.route("/new_repair/<int:equipment_id>", methods=["GET", "POST"])
+@login_required
+def new_repair(user, equipment_id):
+    equipment = Equipment.query.filter_by(id=equipment_id, admin_user_id=user.id).first()
+    if not equipment:
+        flash("Equipment was not found!", "error")
+        return redirect(url_for("equipment.add_equipment"))
+    if request.method == "GET":
+        try:
+            history = repair_history(equipment_id, request.args.get("after"))
+        except ValueError:
+            flash("Invalid history page.", "error")
+            return redirect(url_for("maintenance.new_repair", equipment_id=equipment_id))
+        recent_checkins = (
+            EquipmentCheckIn.query
+            .filter_by(equipment_id=equipment_id)
+            .order_by(EquipmentCheckIn.created_at.desc())
+            .limit(5)
+            .all()
+        )
+        return render_template(
+            "new_repair.html",
+            equipment=equipment,
+            recent_checkins=recent_checkins,
+            **history,
+        )
+    else:
+        date = request.form.get("date")
+        performed_by = request.form.get("performed_by")
+        mileage = request.form.get("mileage")
+        notes = request.form.get("notes")
+        item_descriptions = request.form.getlist("cost_item_desc")
+        item_amounts = request.form.getlist("cost_item_amount")
+        try:
+            cost_items, total_cost = parse_cost_items(item_descriptions, item_amounts)
+            new_repair_record = Repair(
+                equipment_id=equipment_id,
+                date=datetime.strptime(date, "%Y-%m-%d").date() if date else None,
+                performed_by=performed_by,
+                mileage=int(mileage) if mileage else None,
+                repair_cost=total_cost if cost_items else None,
+                notes=notes
+            )
+            db.session.add(new_repair_record)
+            db.session.flush()
+            for desc, amount in cost_items:
+                db.session.add(RepairCostItem(repair_id=new_repair_record.id, description=desc, amount=amount))
+            attachments = store_attachments(
+                request.files.getlist("attachments"),
+                {"repair_id": new_repair_record.id},
+                RepairAttachment,
+            )
+            for attachment in attachments:
+                db.session.add(attachment)
+            if mileage:
+                equipment.mileage = int(mileage)
+            apply_owner_stats_delta(
+                equipment.admin_user_id,
+                repair_count=1,
+                repair_cost_total=new_repair_record.repair_cost or 0.0,
+            )
+            log_action(user, "create", "repair", new_repair_record.id, f"equipment_id={equipment_id}")
+            db.session.commit()
+            invalidate_owner_cache(user.id)
+            queue_image_thumbnails(attachments)
+        except ValueError as exc:
+            db.session.rollback()
+            flash(str(exc), "error")
+            return redirect(url_for("maintenance.new_repair", equipment_id=equipment_id))
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Error recording repair")
+            flash("Error recording repair. Please try again.", "error")
+            return redirect(url_for("maintenance.new_repair", equipment_id=equipment_id))
+        flash("Repair recorded successfully!", "success")
+        return redirect(url_for("maintenance.new_repair", equipment_id=equipment_id))
+
+
+@bp.route("/new_repair/<int:equipment_id>/page", methods=["GET"])
+@login_required
+def repair_history_page(user, equipment_id):
+    equipment = Equipment.query.filter_by(id=equipment_id, admin_user_id=user.id).first()
+    if not equipment:
+        abort(404)
+    try:
+        history = repair_history(equipment_id, request.args.get("after"))
+    except ValueError:
+        abort(400)
+    return history_fragment("_repair_rows.html", "maintenance.new_repair", "maintenance.repair_history_page", equipment, **history)
+
+
+@bp.route("/service-attachment/<int:attachment_id>")
+@login_required
+def download_service_attachment(user, attachment_id):
+    attachment = owned_attachment(ServiceAttachment, user, attachment_id)
+    if not attachment:
+        flash("Attachment not found.", "error")
+        return redirect(url_for("accounts.dashboard"))
+    return send_attachment(attachment, as_attachment=True)
+
+
+@bp.route("/service-attachment/<int:attachment_id>/view")
+@login_required
+def view_service_attachment(user, attachment_id):
+    attachment = owned_attachment(ServiceAttachment, user, attachment_id)
+    if not attachment:
+        flash("Attachment not found.", "error")
+        return redirect(url_for("accounts.dashboard"))
+    return send_attachment(attachment, as_attachment=False)
+
+
+@bp.route("/service-attachment/<int:attachment_id>/<any(thumb, preview):size>")
+@login_required
+def service_attachment_thumbnail(user, attachment_id, size):
+    attachment = owned_attachment(ServiceAttachment, user, attachment_id)
+    if not attachment:
+        abort(404)
+    return send_thumbnail(attachment, size)
+
+
+@bp.route("/repair-attachment/<int:attachment_id>")
+@login_required
+def download_repair_attachment(user, attachment_id):
+    attachment = owned_attachment(RepairAttachment, user, attachment_id)
+    if not attachment:
+        flash("Attachment not found.", "error")
+        return redirect(url_for("accounts.dashboard"))
+    return send_attachment(attachment, as_attachment=True)
+
+
+@bp.route("/repair-attachment/<int:attachment_id>/view")
+@login_required
+def view_repair_attachment(user, attachment_id):
+    attachment = owned_attachment(RepairAttachment, user, attachment_id)
+    if not attachment:
+        flash("Attachment not found.", "error")
+        return redirect(url_for("accounts.dashboard"))
+    return send_attachment(attachment, as_attachment=False)
+
+
+@bp.route("/repair-attachment/<int:attachment_id>/<any(thumb, preview):size>")
+@login_required
+def repair_attachment_thumbnail(user, attachment_id, size):
+    attachment = owned_attachment(RepairAttachment, user, attachment_id)
+    if not attachment:
+        abort(404)
+    return send_thumbnail(attachment, size)
+
+
+def purchase_order_response(user, kind, record_id):
+    """A filled-in PO workbook for one of ``user``'s services or repairs."""
+    model, item_model, parent_column = (
+        (Service, ServiceCostItem, ServiceCostItem.service_id)
+        if kind == "service"
+        else (Repair, RepairCostItem, RepairCostItem.repair_id)
+    )
+    row = db.session.execute(
+        select(model, Equipment)
+        .join(Equipment, Equipment.id == model.equipment_id)
+        .where(model.id == record_id, Equipment.admin_user_id == user.id)
+    ).first()
+    if not row:
+        abort(404)
+    template_name = request.args.get("template", current_app.config["PO_TEMPLATE"])
+    if template_name not in PO_TEMPLATES:
+        abort(400)
+    record, equipment = row
+    items = item_model.query.filter(parent_column == record.id).order_by(item_model.id.asc()).all()
+    body = render_po(template_name, po_data(kind, record, equipment, items))
+    log_action(user, "export", kind, record.id, f"po_{template_name}")
+    db.session.commit()
+    response = Response(body, mimetype=XLSX_MIMETYPE)
+    response.headers["Content-Disposition"] = f"attachment; filename={po_filename(kind, record, equipment)}"
+    return response
+
+
+@bp.route("/service/<int:service_id>/po.xlsx")
+@login_required
+def service_po(user, service_id):
+    return purchase_order_response(user, "service", service_id)
+
+
+@bp.route("/repair/<int:repair_id>/po.xlsx")
+@login_required
+def repair_po(user, repair_id):
+    return purchase_order_response(user, "repair", repair_id)